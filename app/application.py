@@ -1,21 +1,74 @@
 """initiate main application variables.
-create an flask object at the `app` variable, SQLAlchemy object an the `db` variable,
-and flask_restful.api object at `api` variable."""
+create SQLAlchemy object at the `db` variable, flask_restful.api object at `api`
+variable, and `create_app` factory, that creates flask object and binds them to it.
+json responses of the `api` are encoded by `serialization.output_json`, and compressed
+by `response_compression`, if the client accepts it.
 
+importing the package does no database work: tables are created and filled by
+example data by explicit `init-db` command, e.g.:
+    FLASK_APP="app.application:create_app()" flask init-db --with-test-data
+schema changes of existing databases are applied by `migrate` command."""
+
+import click
 from flask import Flask
+from flask.cli import with_appcontext
 from flask_restful import Api
 from flask_sqlalchemy import SQLAlchemy
+from .cache import item_cache
+from .compression import response_compression
+from .metrics import request_metrics
+from .replicas import replica_router
+from .serialization import output_json
 
-app = Flask(__name__)
-app.config.from_object('app.config.Configuration')
-db = SQLAlchemy(app)
-api = Api(app)
+db = SQLAlchemy()
+api = Api()
+api.representation('application/json')(output_json)
 
 
 from . import models
 from . import resources
+from .schema import apply_migrations, filters_check
+
+
+def create_app(config='app.config.Configuration'):
+    """create flask object, configured from `config` object or import string, with
+    initialized `db`, `api`, `item_cache`, `replica_router`,
+    `request_metrics`, `filters_check` and `response_compression`."""
+    app = Flask(__name__)
+    app.config.from_object(config)
+    db.init_app(app)
+    api.init_app(app)
+    item_cache.init_app(app)
+    replica_router.init_app(app)
+    request_metrics.init_app(app)
+    filters_check.init_app(app)
+    response_compression.init_app(app)
+    app.cli.add_command(init_db_command)
+    app.cli.add_command(migrate_command)
+
+    return app
+
+
+@click.command('init-db')
+@click.option('--with-test-data', is_flag=True, help='fill tables by example data.')
+@with_appcontext
+def init_db_command(with_test_data):
+    """create all tables in the database, if they are not, and apply migrations."""
+    db.create_all()
+    apply_migrations(db.engine)
+    if with_test_data:
+        from .create_test_data import create_test_data
+        create_test_data()
+
+
+@click.command('migrate')
+@with_appcontext
+def migrate_command():
+    """apply not applied schema migrations to the database."""
+    for name in apply_migrations(db.engine):
+        click.echo(f'applied {name}')
 
 
 def run_app():
     """run app in the test localhost server."""
-    app.run(host='localhost')
\ No newline at end of file
+    create_app().run(host='localhost')
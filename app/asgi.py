@@ -0,0 +1,270 @@
+"""asynchronous ASGI serving mode of the api.
+
+`create_asgi_app` creates starlette application, that serves GET methods of the item and
+list resources of students, groups and courses on the asyncpg database driver, so the
+worker is not blocked by in-flight database calls. routes and json responses are the
+same as of the flask resources: ETag/Last-Modified validators and 304 responses, keyset
+pages, ndjson streaming, compression and the `item_cache` of the flask application are
+shared with the synchronous mode. all other requests, e.g. POST, PUT and DELETE methods,
+are passed to the flask application, mounted at the root.
+
+the async engine connects to `ASYNC_DATABASE_URI` config value, or to
+`SQLALCHEMY_DATABASE_URI` with the `postgresql+asyncpg` driver, pool is sized by the
+same `SQLALCHEMY_ENGINE_OPTIONS`.
+
+served by any ASGI server, e.g.:
+    uvicorn --factory app.asgi:create_asgi_app --workers 4"""
+from contextlib import asynccontextmanager
+
+from a2wsgi import WSGIMiddleware
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.responses import Response, StreamingResponse
+from starlette.routing import Mount, Route
+from werkzeug.datastructures import MIMEAccept
+from werkzeug.http import parse_accept_header, parse_date, parse_etags
+
+from .application import create_app
+from .cache import item_cache
+from .compression import CompressionMiddleware
+from .models import StudentModel, GroupModel, CourseModel, select_tables_versions, get_tables_versions_dict
+from .resources import make_validators, get_validators_headers, is_not_modified, get_page_params, \
+    get_page_cache_key, make_page, is_ndjson_requested, get_fields_dict, get_batch_ids, make_batch, \
+    make_cached_item, is_cached_item_valid, get_item_load_fields, make_item_validators
+from .serialization import dumps
+
+# options of the synchronous engine, which are also used by the async engine.
+ASYNC_ENGINE_OPTIONS = ('pool_size', 'max_overflow', 'pool_timeout', 'pool_recycle', 'pool_pre_ping')
+
+
+def get_async_database_uri(config):
+    """return database url of the async engine."""
+    if config.get('ASYNC_DATABASE_URI'):
+        return config['ASYNC_DATABASE_URI']
+    return str(make_url(config['SQLALCHEMY_DATABASE_URI']).set(drivername='postgresql+asyncpg'))
+
+
+def create_async_engine_from_config(config):
+    engine_options = config.get('SQLALCHEMY_ENGINE_OPTIONS', {})
+    return create_async_engine(get_async_database_uri(config),
+                               **{name: engine_options[name] for name in ASYNC_ENGINE_OPTIONS
+                                  if name in engine_options})
+
+
+def json_response(data, status_code=200, headers=None):
+    """return response with json in the same format as flask_restful responses."""
+    return Response(dumps(data) + b'\n', status_code, headers, media_type='application/json')
+
+
+def get_args(request):
+    """return dict of the first values of query string parameters."""
+    args = {}
+    for name, value in request.query_params.multi_items():
+        args.setdefault(name, value)
+    return args
+
+
+async def get_tables_versions(connection, model):
+    """return dict of (version, updated_at) tuples of the tables, the model data
+    depends on."""
+    tables_names = model.get_version_tables_names()
+    rows = await connection.execute(select_tables_versions(tables_names))
+    return get_tables_versions_dict(tables_names, rows)
+
+
+async def get_validators(connection, model):
+    """return ETag and last modification datetime of the model data."""
+    return make_validators(await get_tables_versions(connection, model))
+
+
+def get_not_modified_response(request, etag, last_modified):
+    """return 304 response, if the client has the data with `etag`, otherwise None."""
+    if_none_match = request.headers.get('if-none-match')
+    if_modified_since = request.headers.get('if-modified-since')
+    if is_not_modified(etag, last_modified, parse_etags(if_none_match) if if_none_match else None,
+                       parse_date(if_modified_since)):
+        return Response(status_code=304, headers=get_validators_headers(etag, last_modified))
+
+
+class AsyncModelResource(object):
+    model = None
+
+    async def get(self, request):
+        engine, cache = request.app.state.engine, request.app.state.item_cache
+        item_id = request.path_params['item_id']
+
+        async with engine.connect() as connection:
+            try:
+                fields = self.model.get_fields(get_args(request))
+            except AssertionError as e:
+                fields, error = None, 'error during operation: ' + str(e)
+            else:
+                error = None
+
+            if error is None:
+                params_dict, versions = await self.get_item_params_dict_with_versions(cache, connection, item_id,
+                                                                                    fields)
+                etag, last_modified = make_item_validators(versions, params_dict)
+            else:
+                etag, last_modified = await get_validators(connection, self.model)
+
+        headers = get_validators_headers(etag, last_modified)
+        not_modified_response = get_not_modified_response(request, etag, last_modified)
+        if not_modified_response:
+            return not_modified_response
+        if error is not None:
+            return json_response(error, headers=headers)
+        if params_dict is not None and fields is not None:
+            params_dict = get_fields_dict(params_dict, fields)
+        return json_response(params_dict or {}, headers=headers)
+
+    async def get_item_params_dict_with_versions(self, cache, connection, item_id, fields):
+        """return params dict of the item with `fields` and its version, or None if
+        there is no such item, and dict of tables versions. not cached item is selected by the same query as the
+        versions, the cached item is returned only if it was read from the current
+        versions."""
+        loaded, current = {}, {}
+
+        async def is_valid(cached_item):
+            current['versions'] = await get_tables_versions(connection, self.model)
+            return is_cached_item_valid(cached_item, current['versions'])
+
+        async def load():
+            result = await connection.execute(
+                self.model.select_item_params_dict_with_versions(item_id, get_item_load_fields(fields)))
+            loaded['params_dict'], loaded['versions'] = \
+                self.model.split_item_params_dict_with_versions(result.mappings().all())
+            # the cache keeps only full params dicts
+            return make_cached_item(loaded['params_dict'], loaded['versions']) if fields is None else None
+
+        cached_item = await cache.get_async((self.model.__tablename__, item_id), load, is_valid)
+        if 'versions' in loaded:
+            return loaded['params_dict'], loaded['versions']
+        return cached_item['params_dict'], current['versions']
+
+
+class AsyncModelListResource(object):
+    model = None
+
+    async def get(self, request):
+        engine, config, cache = request.app.state.engine, request.app.state.config, request.app.state.item_cache
+        args = get_args(request)
+
+        async with engine.connect() as connection:
+            etag, last_modified = await get_validators(connection, self.model)
+            headers = get_validators_headers(etag, last_modified)
+            not_modified_response = get_not_modified_response(request, etag, last_modified)
+            if not_modified_response:
+                return not_modified_response
+
+            try:
+                after, limit = get_page_params(args, config['LIST_PAGE_SIZE_MAX'])
+                ids = get_batch_ids(args, config['LIST_PAGE_SIZE_MAX'])
+                filters = self.model.get_filters_clauses(args)
+                fields = self.model.get_fields(args)
+            except AssertionError as e:
+                return json_response('error during operation: ' + str(e), headers=headers)
+
+            if ids is not None:
+                cache_key = get_page_cache_key(self.model, etag, request.query_params.multi_items())
+                batch = await cache.get_async(cache_key,
+                                              lambda: self.get_batch(connection, ids, filters, fields))
+                return json_response(batch, headers=headers)
+
+            if is_ndjson_requested(parse_accept_header(request.headers.get('accept'), MIMEAccept)):
+                lines = self.iter_ndjson_lines(engine, config['STREAM_BATCH_SIZE'], after, filters, fields)
+                return StreamingResponse(lines, headers=headers, media_type='application/x-ndjson')
+
+            cache_key = get_page_cache_key(self.model, etag, request.query_params.multi_items())
+            items, page_headers = await cache.get_async(
+                cache_key, lambda: self.get_page(connection, after, limit, filters, fields, request.url.path, args))
+
+        return json_response(items, headers={**headers, **page_headers})
+
+    async def get_all_items_params_dict(self, connection, after=None, limit=None, filters=(), fields=None):
+        result = await connection.execute(self.model.select_params_dicts(after, limit, filters, fields))
+        return [dict(row) for row in result.mappings()]
+
+    async def get_page(self, connection, after, limit, filters, fields, path, args):
+        """return list of page items and dict of page headers."""
+        items = await self.get_all_items_params_dict(connection, after, limit + 1, filters, fields)
+        return make_page(items, limit, path, args)
+
+    async def get_batch(self, connection, ids, filters, fields):
+        """return dict of items with `ids` and of not found ids, selected by one query."""
+        items = await self.get_all_items_params_dict(
+            connection, filters=[*filters, self.model.__table__.c.id.in_(ids)], fields=fields)
+        return make_batch(items, ids)
+
+    async def iter_ndjson_lines(self, engine, batch_size, after, filters, fields):
+        """yield json lines of all items with id greater than `after`, rows are fetched
+        through the server side cursor by `batch_size` rows."""
+        async with engine.connect() as connection:
+            result = await connection.stream(self.model.select_params_dicts(after, filters=filters, fields=fields))
+            async for rows in result.mappings().partitions(batch_size):
+                yield b''.join(dumps(dict(row)) + b'\n' for row in rows)
+
+
+class AsyncStudentResource(AsyncModelResource):
+    model = StudentModel
+
+
+class AsyncCourseResource(AsyncModelResource):
+    model = CourseModel
+
+
+class AsyncGroupResource(AsyncModelResource):
+    model = GroupModel
+
+
+class AsyncStudentListResource(AsyncModelListResource):
+    model = StudentModel
+
+
+class AsyncCourseListResource(AsyncModelListResource):
+    model = CourseModel
+
+
+class AsyncGroupListResource(AsyncModelListResource):
+    model = GroupModel
+
+
+def get_routes(path, resource):
+    """return GET routes of the `path` with and without trailing slash."""
+    return [Route(path, resource.get, methods=['GET']), Route(path + '/', resource.get, methods=['GET'])]
+
+
+def create_asgi_app(config='app.config.Configuration'):
+    """create starlette object, serving GET methods of the resources on the async
+    engine, and all other requests by the flask application, created with `config`."""
+    flask_app = create_app(config)
+
+    @asynccontextmanager
+    async def lifespan(app):
+        yield
+        await app.state.engine.dispose()
+
+    routes = [
+        *get_routes('/students/{item_id:int}', AsyncStudentResource()),
+        *get_routes('/courses/{item_id:int}', AsyncCourseResource()),
+        *get_routes('/groups/{item_id:int}', AsyncGroupResource()),
+        *get_routes('/students', AsyncStudentListResource()),
+        *get_routes('/courses', AsyncCourseListResource()),
+        *get_routes('/groups', AsyncGroupListResource()),
+        Mount('/', WSGIMiddleware(flask_app)),
+    ]
+    app = Starlette(routes=routes, lifespan=lifespan,
+                    middleware=[Middleware(CompressionMiddleware, config=flask_app.config)])
+    app.state.config = flask_app.config
+    app.state.item_cache = item_cache.get_state(flask_app)
+    app.state.engine = create_async_engine_from_config(flask_app.config)
+
+    return app
+
+
+def run_asgi_app():
+    """run app in the uvicorn localhost server."""
+    import uvicorn
+    uvicorn.run(create_asgi_app(), host='localhost')
@@ -0,0 +1,278 @@
+"""read-through cache of items params dicts and list pages.
+
+create `AppItemCache` object at the `item_cache` variable, which keeps `ItemCache` of
+every application in `app.extensions`, bounded cache with time to live, keyed by tuples
+like (table name, item id). items are evicted by the model methods, that change them,
+and related items, e.g. both groups of the student, moved to another group.
+
+values are kept in one of the stores:
+    SqliteStore - sqlite database file, shared by all worker processes of the host,
+        which open the same file, e.g. on the /dev/shm memory file system.
+        invalidation is atomic for all processes.
+    MemoryStore - LRU dict of this process, used if the shared store is not set up.
+calls of the sqlite store by the ASGI mode are made in the threads, so they do not
+block the event loop. errors of the sqlite file are cache misses.
+
+configured by `init_app` from the app config:
+    ITEM_CACHE_SIZE - int, max number of cached values, 0 disables the cache
+    ITEM_CACHE_TTL - float, seconds, cached value is valid for
+    SHARED_CACHE_PATH - str, path of the sqlite file of the shared store, or None"""
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from .extensions import AppExtension
+
+
+class MemoryStore(object):
+    """LRU dict of cached values of this process."""
+    # calls of the store do not wait for IO, so they are made on the event loop
+    blocking = False
+
+    def __init__(self, max_size, ttl):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._items = OrderedDict()
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """return cached value of the `key`, or None."""
+        with self._lock:
+            entry = self._items.get(key)
+            if entry and entry[0] > time.monotonic():
+                self._items.move_to_end(key)
+                return entry[1]
+
+    def get_generation(self):
+        """return number, changed by every invalidation."""
+        return self._generation
+
+    def set(self, key, value, generation):
+        """cache the `value`, if there were no invalidations since `generation`."""
+        with self._lock:
+            if generation != self._generation:
+                return
+
+            self._items[key] = (time.monotonic() + self.ttl, value)
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+
+    def invalidate(self, keys):
+        with self._lock:
+            self._generation += 1
+            for key in keys:
+                self._items.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._items.clear()
+
+    def get_size(self):
+        return len(self._items)
+
+
+class SqliteStore(object):
+    """cached values in the sqlite database file, shared by all processes, which open
+    the same file. values are kept as json, the oldest values are evicted first.
+    connection is opened on the first use in every process, so the store can be created
+    before the fork of workers. errors of the sqlite database, e.g. locked or corrupt
+    file, are cache misses of `get`, and values are not cached by `set`."""
+    blocking = True
+
+    def __init__(self, path, max_size, ttl):
+        self.path = path
+        self.max_size = max_size
+        self.ttl = ttl
+        self._connection = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _get_connection(self):
+        if self._pid != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=10, isolation_level=None, check_same_thread=False)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=OFF')
+            connection.execute('CREATE TABLE IF NOT EXISTS entries '
+                               '(key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)')
+            connection.execute('CREATE INDEX IF NOT EXISTS entries_expires_at_idx ON entries (expires_at)')
+            connection.execute('CREATE TABLE IF NOT EXISTS generation '
+                               '(id INTEGER PRIMARY KEY CHECK (id = 0), value INTEGER NOT NULL)')
+            connection.execute('INSERT OR IGNORE INTO generation VALUES (0, 0)')
+            self._connection, self._pid = connection, os.getpid()
+
+        return self._connection
+
+    def get(self, key):
+        try:
+            with self._lock:
+                row = self._get_connection().execute(
+                    'SELECT value FROM entries WHERE key = ? AND expires_at > ?', (json.dumps(key), time.time())
+                ).fetchone()
+        except sqlite3.Error:
+            return None
+
+        return json.loads(row[0]) if row else None
+
+    def get_generation(self):
+        """return number, changed by every invalidation, or None, if it is not read."""
+        try:
+            with self._lock:
+                return self._get_connection().execute('SELECT value FROM generation').fetchone()[0]
+        except sqlite3.Error:
+            return None
+
+    def set(self, key, value, generation):
+        if generation is None:
+            return
+        try:
+            with self._lock:
+                connection = self._get_connection()
+                connection.execute('BEGIN IMMEDIATE')
+                try:
+                    if connection.execute('SELECT value FROM generation').fetchone()[0] == generation:
+                        connection.execute('INSERT OR REPLACE INTO entries VALUES (?, ?, ?)',
+                                           (json.dumps(key), json.dumps(value), time.time() + self.ttl))
+                        connection.execute('DELETE FROM entries WHERE key IN (SELECT key FROM entries '
+                                           'ORDER BY expires_at LIMIT max(0, (SELECT count(*) FROM entries) - ?))',
+                                           (self.max_size,))
+                    connection.execute('COMMIT')
+                except sqlite3.Error:
+                    if connection.in_transaction:
+                        connection.execute('ROLLBACK')
+                    raise
+        except sqlite3.Error:
+            pass
+
+    def invalidate(self, keys):
+        with self._lock:
+            connection = self._get_connection()
+            connection.execute('BEGIN IMMEDIATE')
+            try:
+                connection.execute('UPDATE generation SET value = value + 1')
+                connection.executemany('DELETE FROM entries WHERE key = ?', ((json.dumps(key),) for key in keys))
+                connection.execute('COMMIT')
+            except sqlite3.Error:
+                connection.execute('ROLLBACK')
+                raise
+
+    def clear(self):
+        with self._lock:
+            connection = self._get_connection()
+            connection.execute('BEGIN IMMEDIATE')
+            connection.execute('UPDATE generation SET value = value + 1')
+            connection.execute('DELETE FROM entries')
+            connection.execute('COMMIT')
+
+    def get_size(self):
+        with self._lock:
+            return self._get_connection().execute('SELECT count(*) FROM entries').fetchone()[0]
+
+
+class ItemCache(object):
+    def __init__(self, app=None):
+        self.store = MemoryStore(0, 0)
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        max_size, ttl = app.config['ITEM_CACHE_SIZE'], app.config['ITEM_CACHE_TTL']
+        if app.config.get('SHARED_CACHE_PATH'):
+            self.store = SqliteStore(app.config['SHARED_CACHE_PATH'], max_size, ttl)
+        else:
+            self.store = MemoryStore(max_size, ttl)
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, load, is_valid=None):
+        """return cached value of the `key`, or value returned by `load` function, which
+        is cached, if it is not None. cached value, for which `is_valid` function returns
+        False, e.g. read from the data, which was changed since, is loaded again. cached
+        values should not be changed."""
+        value = self.store.get(key)
+        if value is not None and is_valid is not None and not is_valid(value):
+            value = None
+        self._count(value)
+        if value is not None:
+            return value
+
+        generation = self.store.get_generation()
+        value = load()
+        self._set_loaded(key, value, generation)
+        return value
+
+    async def get_async(self, key, load, is_valid=None):
+        """the same as `get`, but `load` and `is_valid` are coroutine functions. calls
+        of the blocking store, e.g. of the shared sqlite file, are made in the thread, so
+        they do not block the event loop."""
+        value = await self._call_store(self.store.get, key)
+        if value is not None and is_valid is not None and not await is_valid(value):
+            value = None
+        self._count(value)
+        if value is not None:
+            return value
+
+        generation = await self._call_store(self.store.get_generation)
+        value = await load()
+        await self._call_store(self._set_loaded, key, value, generation)
+        return value
+
+    async def _call_store(self, function, *args):
+        if self.store.blocking:
+            return await asyncio.to_thread(function, *args)
+        return function(*args)
+
+    def get_cached(self, key):
+        """return cached value of the `key`, or None, without loading it."""
+        value = self.store.get(key)
+        self._count(value)
+        return value
+
+    def _count(self, value):
+        with self._lock:
+            if value is not None:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def _set_loaded(self, key, value, generation):
+        # value loaded before the invalidation may be already stale
+        if value is not None and self.store.max_size:
+            self.store.set(key, value, generation)
+
+    def invalidate(self, keys):
+        """evict values of all `keys` from the cache."""
+        self.store.invalidate(keys)
+
+    def clear(self):
+        """evict all values from the cache and reset counters."""
+        self.store.clear()
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
+
+    def get_stats(self):
+        """return dict of this process cache hits and misses counters and size of the
+        store."""
+        return {'hits': self.hits, 'misses': self.misses, 'size': self.store.get_size()}
+
+
+class AppItemCache(AppExtension):
+    """`ItemCache` of every application, configured by `init_app`."""
+    name = 'item_cache'
+
+    def create_state(self, app):
+        return ItemCache(app)
+
+
+item_cache = AppItemCache()
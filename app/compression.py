@@ -0,0 +1,280 @@
+"""compression of the responses, negotiated by the `Accept-Encoding` header.
+
+create `ResponseCompression` object at the `response_compression` variable, which
+compresses json, ndjson and text responses of the flask application by the encoding,
+preferred by the client: `zstd` and `br` if `zstandard` and `brotli` packages are
+installed, and `gzip`. responses, smaller than `COMPRESSION_MIN_SIZE` bytes, e.g. item
+GETs of students, are not compressed, item GETs of groups and courses with many
+students are. streamed responses are compressed chunk by chunk and flushed every
+`STREAM_FLUSH_SIZE` bytes of the body, so the body is never buffered and the client
+receives rows, while the rest of them are read from the database. compressible
+responses have `Vary: Accept-Encoding` header. the encoding is appended to the `ETag`
+of the compressed response, e.g. `"groups.3-gzip"`, so every encoding of the body has
+its own strong ETag, and `strip_etag_encoding` returns the ETag of the data, e.g. to
+check `If-None-Match` and `If-Match` headers by it.
+
+`CompressionMiddleware` compresses responses of the ASGI application by the same
+rules.
+
+configured by `init_app` from the app config:
+    COMPRESSION_ENCODINGS - list of the enabled encodings in order of preference for
+        the same quality of the client, empty list disables compression
+    COMPRESSION_MIN_SIZE - int, bytes, min size of not streamed compressed body
+    COMPRESSION_LEVELS - dict of compression levels by encodings, higher levels trade
+        CPU time for smaller responses"""
+import zlib
+
+from flask import request, current_app
+from werkzeug.datastructures import Accept
+from werkzeug.http import parse_accept_header
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+COMPRESSIBLE_MIMETYPES = ('application/json', 'application/x-ndjson', 'text/plain', 'text/html')
+# uncompressed bytes of the streamed body, after which the compressed data is flushed
+# to the client.
+STREAM_FLUSH_SIZE = 64 * 1024
+DEFAULT_LEVELS = {'gzip': 6, 'br': 4, 'zstd': 3}
+
+
+class Compressor(object):
+    """incremental compressor of the response body."""
+
+    def __init__(self):
+        self._pending_size = 0
+
+    def compress(self, data, finish=False):
+        """return compressed `data`. compressed data is flushed every
+        `STREAM_FLUSH_SIZE` bytes, and finished, if the `data` is the last chunk."""
+        chunks = [self._compress(data)]
+        self._pending_size += len(data)
+        if finish:
+            chunks.append(self._finish())
+        elif self._pending_size >= STREAM_FLUSH_SIZE:
+            chunks.append(self._flush())
+            self._pending_size = 0
+        return b''.join(chunks)
+
+    def _compress(self, data):
+        raise NotImplementedError
+
+    def _flush(self):
+        raise NotImplementedError
+
+    def _finish(self):
+        raise NotImplementedError
+
+
+class GzipCompressor(Compressor):
+    def __init__(self, level):
+        super().__init__()
+        self._compressobj = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def _compress(self, data):
+        return self._compressobj.compress(data)
+
+    def _flush(self):
+        return self._compressobj.flush(zlib.Z_SYNC_FLUSH)
+
+    def _finish(self):
+        return self._compressobj.flush(zlib.Z_FINISH)
+
+
+class BrotliCompressor(Compressor):
+    def __init__(self, level):
+        super().__init__()
+        self._compressobj = brotli.Compressor(quality=level)
+
+    def _compress(self, data):
+        return self._compressobj.process(data)
+
+    def _flush(self):
+        return self._compressobj.flush()
+
+    def _finish(self):
+        return self._compressobj.finish()
+
+
+class ZstdCompressor(Compressor):
+    def __init__(self, level):
+        super().__init__()
+        self._compressobj = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def _compress(self, data):
+        return self._compressobj.compress(data)
+
+    def _flush(self):
+        return self._compressobj.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+    def _finish(self):
+        return self._compressobj.flush(zstandard.COMPRESSOBJ_FLUSH_FINISH)
+
+
+def get_compressors():
+    """return dict of compressor classes by names of the encodings, which packages are
+    installed."""
+    compressors = {'gzip': GzipCompressor}
+    if brotli is not None:
+        compressors['br'] = BrotliCompressor
+    if zstandard is not None:
+        compressors['zstd'] = ZstdCompressor
+    return compressors
+
+
+def get_encoding(accept_encoding, config):
+    """return the enabled encoding, preferred by the `Accept-Encoding` header value, or
+    None, if the response should not be compressed."""
+    compressors = get_compressors()
+    encodings = [encoding for encoding in config['COMPRESSION_ENCODINGS'] if encoding in compressors]
+    return parse_accept_header(accept_encoding, Accept).best_match(encodings)
+
+
+def make_compressor(encoding, config):
+    level = config['COMPRESSION_LEVELS'].get(encoding, DEFAULT_LEVELS[encoding])
+    return get_compressors()[encoding](level)
+
+
+def is_compressible(status_code, mimetype, content_encoding):
+    """return True if the response with the status, mimetype and `Content-Encoding`
+    header value can be compressed."""
+    return (status_code >= 200 and status_code not in (204, 304) and not content_encoding
+            and mimetype in COMPRESSIBLE_MIMETYPES)
+
+
+def iter_compressed(chunks, compressor):
+    """yield compressed chunks of the streamed body, close the `chunks` iterable, e.g.
+    the database cursor, when the response is closed."""
+    try:
+        for chunk in chunks:
+            if isinstance(chunk, str):
+                chunk = chunk.encode('utf-8')
+            compressed_chunk = compressor.compress(chunk)
+            if compressed_chunk:
+                yield compressed_chunk
+        yield compressor.compress(b'', finish=True)
+    finally:
+        if hasattr(chunks, 'close'):
+            chunks.close()
+
+
+class ResponseCompression(object):
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.after_request(compress_response)
+        app.config.setdefault('COMPRESSION_ENCODINGS', ['zstd', 'br', 'gzip'])
+        app.config.setdefault('COMPRESSION_MIN_SIZE', 1024)
+        app.config.setdefault('COMPRESSION_LEVELS', DEFAULT_LEVELS)
+
+
+def compress_response(response):
+    """compress the response by the encoding, accepted by the client."""
+    if response.direct_passthrough or \
+            not is_compressible(response.status_code, response.mimetype, response.content_encoding):
+        return response
+
+    response.vary.add('Accept-Encoding')
+    config = current_app.config
+    encoding = get_encoding(request.headers.get('Accept-Encoding'), config)
+    if encoding is None:
+        return response
+
+    if response.is_streamed:
+        response.response = iter_compressed(response.response, make_compressor(encoding, config))
+    else:
+        data = response.get_data()
+        if len(data) < config['COMPRESSION_MIN_SIZE']:
+            return response
+        response.set_data(make_compressor(encoding, config).compress(data, finish=True))
+    response.content_encoding = encoding
+    etag, is_weak = response.get_etag()
+    if etag:
+        response.set_etag(f'{etag}-{encoding}', weak=is_weak)
+    return response
+
+
+def add_etag_encoding(etag, encoding):
+    """return the `ETag` header value with the encoding, appended to the entity tag."""
+    return etag[:-1] + b'-' + encoding.encode('latin-1') + b'"' if etag.endswith(b'"') else etag
+
+
+def strip_etag_encoding(etag):
+    """return entity tag without the encoding, appended to the ETag of the compressed
+    response."""
+    for encoding in DEFAULT_LEVELS:
+        if etag.endswith(f'-{encoding}'):
+            return etag[:-len(encoding) - 1]
+    return etag
+
+
+class CompressionMiddleware(object):
+    """ASGI middleware, that compresses responses of the `app` by the same rules as
+    the flask application with the `config`. responses, which are already compressed,
+    e.g. by the mounted flask application, are passed as they are."""
+
+    def __init__(self, app, config):
+        self.app = app
+        self.config = config
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            return await self.app(scope, receive, send)
+
+        accept_encoding = dict(scope['headers']).get(b'accept-encoding', b'').decode('latin-1')
+        encoding = get_encoding(accept_encoding, self.config)
+        start_message = None
+        compressor = None
+
+        async def send_compressed(message):
+            nonlocal start_message, compressor
+            if message['type'] == 'http.response.start':
+                # headers are sent with the first chunk of the body, when it is known,
+                # if it is compressed.
+                start_message = message
+                return
+            if message['type'] != 'http.response.body':
+                return await send(message)
+
+            body, more_body = message.get('body', b''), message.get('more_body', False)
+            if start_message is not None:
+                headers = [(name.lower(), value) for name, value in start_message.get('headers', [])]
+                headers_dict = dict(headers)
+                mimetype = headers_dict.get(b'content-type', b'').decode('latin-1').split(';')[0].strip()
+                if is_compressible(start_message['status'], mimetype, headers_dict.get(b'content-encoding')):
+                    if b'accept-encoding' not in headers_dict.get(b'vary', b'').lower():
+                        headers.append((b'vary', b'Accept-Encoding'))
+                    # size of the body of the streamed response is known, if it is sent
+                    # by chunks, e.g. by the mounted WSGI application.
+                    size = int(headers_dict[b'content-length']) if b'content-length' in headers_dict else \
+                        None if more_body else len(body)
+                    if encoding is not None and (size is None or size >= self.config['COMPRESSION_MIN_SIZE']):
+                        compressor = make_compressor(encoding, self.config)
+                        headers = [(name, add_etag_encoding(value, encoding) if name == b'etag' else value)
+                                   for name, value in headers if name != b'content-length']
+                        headers.append((b'content-encoding', encoding.encode('latin-1')))
+                        if not more_body:
+                            body = compressor.compress(body, finish=True)
+                            headers.append((b'content-length', str(len(body)).encode('latin-1')))
+                await send({**start_message, 'headers': headers})
+                start_message = None
+                if compressor is not None and not more_body:
+                    return await send({'type': 'http.response.body', 'body': body})
+
+            if compressor is not None:
+                body = compressor.compress(body, finish=not more_body)
+            await send({'type': 'http.response.body', 'body': body, 'more_body': more_body})
+
+        await self.app(scope, receive, send_compressed)
+
+
+response_compression = ResponseCompression()
@@ -1,90 +1,179 @@
-"""functions to generate test data (item 2 of Task 10)."""
+"""functions to generate test data (item 2 of Task 10).
+
+data is generated by seeded random generator, so the same parameters and seed give
+the same dataset with item ids from 1, and loaded by `COPY ... FROM STDIN` in chunks,
+so big datasets for benchmarks are loaded fast with constant memory. cached values of
+all worker processes are checked against the increased tables versions, so running
+servers never return the replaced data.
+
+can be called from command line, e.g.:
+    python -m app.create_test_data --groups 1000 --students 2000000 --courses 500 \
+        --min-enrollments 3 --max-enrollments 7 --seed 1"""
+import argparse
+import io
 import random
 import string
-from .application import db
-from .models import GroupModel, CourseModel, StudentModel, students_courses_relation
+from sqlalchemy import text
+from .application import db, create_app
+from .cache import item_cache
+from .models import GroupModel, CourseModel, StudentModel, students_courses_relation, bump_tables_versions, \
+    group_stats, course_stats, course_pair_stats
 
+# rows count of one `COPY` statement.
+COPY_CHUNK_SIZE = 100000
 
-def clear_all_tables():
-    """delete all from the tables in the database."""
-    StudentModel.query.delete()
-    CourseModel.query.delete()
-    GroupModel.query.delete()
-    students_courses_relation.delete()
+FIRST_NAMES = ['Liam', 'Noah', 'Oliver', 'Elijah', 'William',
+               'James', 'Benjamin', 'Lucas', 'Henry', 'Alexander',
+               'Olivia', 'Emma', 'Ava', 'Charlotte', 'Sophia',
+               'Amelia', 'Isabella', 'Mia', 'Evelyn', 'Harper']
+
+SECOND_NAMES = ['Smith', 'Johnson', 'Williams', 'Brown', 'Jones',
+                'Garcia', 'Miller', 'Davis', 'Rodriguez', 'Martinez',
+                'Hernandez', 'Lopez', 'Gonzalez', 'Wilson', 'Anderson',
+                'Thomas', 'Taylor', 'Moore', 'Jackson', 'Martin']
+
+COURSES_NAMES = ['math', 'biology', 'art', 'geography', 'history',
+                 'english', 'chemistry', 'physics', 'Marketing', 'management']
 
 
-def get_random_group_name():
+def quote(name):
+    """return the table or column `name`, quoted for SQL statements, if it is needed."""
+    return db.engine.dialect.identifier_preparer.quote(name)
+
+
+def clear_all_tables():
+    """delete all from the tables in the database. summary tables are cleared too,
+    because `TRUNCATE` does not fire the triggers, which update them."""
+    tables = ', '.join(quote(table.name) for table in
+                       (students_courses_relation, StudentModel.__table__,
+                        CourseModel.__table__, GroupModel.__table__,
+                        group_stats, course_stats, course_pair_stats))
+    db.session.execute(text(f'TRUNCATE {tables}'))
+
+
+def set_id_sequence(table, count):
+    """continue id sequence of the `table` after `count` generated items with ids from 1
+    to `count`."""
+    db.session.execute(text("SELECT setval(pg_get_serial_sequence(:table_name, 'id'), :value, :is_called)"),
+                       {'table_name': quote(table.name), 'value': max(count, 1), 'is_called': count > 0})
+
+
+def copy_rows(table, columns, rows):
+    """load `rows` iterable of tuples into the `columns` of the `table` by `COPY`
+    statements of `COPY_CHUNK_SIZE` rows."""
+    cursor = db.session.connection().connection.cursor()
+    statement = 'COPY {} ({}) FROM STDIN'.format(quote(table.name), ', '.join(map(quote, columns)))
+
+    chunk = io.StringIO()
+    chunk_size = 0
+    for row in rows:
+        chunk.write('\t'.join(str(value) for value in row) + '\n')
+        chunk_size += 1
+        if chunk_size == COPY_CHUNK_SIZE:
+            chunk.seek(0)
+            cursor.copy_expert(statement, chunk)
+            chunk = io.StringIO()
+            chunk_size = 0
+
+    if chunk_size:
+        chunk.seek(0)
+        cursor.copy_expert(statement, chunk)
+
+
+def get_random_group_name(rng=random):
     """return string, composed from 2 random characters, hyphen, 2 random numbers."""
     name = ''
     for _ in range(2):
-        name += random.choice(string.ascii_lowercase)
+        name += rng.choice(string.ascii_lowercase)
 
     name += '-'
 
     for _ in range(2):
-        name += random.choice(string.digits)
+        name += rng.choice(string.digits)
 
     return name
 
 
-def get_random_group_id():
-    """return id of random group from `GroupModel` table."""
-    return random.choice(GroupModel.query.all()).id
+def create_groups(count, rng):
+    """fill `groups` table with `count` randomly named groups."""
+    rows = ((group_id, get_random_group_name(rng)) for group_id in range(1, count + 1))
+    copy_rows(GroupModel.__table__, ['id', 'name'], rows)
+    set_id_sequence(GroupModel.__table__, count)
 
 
-def create_groups():
-    """fill `groups` table with example data, 10 randomly named group objects."""
-    for i in range(10):
-        group = GroupModel(get_random_group_name())
-        db.session.add(group)
+def create_courses(count):
+    """fill `courses` table with `count` courses with trivial descriptions."""
+    def rows():
+        for course_id in range(1, count + 1):
+            if course_id <= len(COURSES_NAMES):
+                course_name = COURSES_NAMES[course_id - 1]
+            else:
+                course_name = f'course_{course_id}'
+            yield course_id, course_name, 'The course of {}.'.format(course_name)
 
+    copy_rows(CourseModel.__table__, ['id', 'name', 'description'], rows())
+    set_id_sequence(CourseModel.__table__, count)
 
-def create_courses():
-    """fill `courses` table with example data, 10 courses with trivial descriptions."""
-    courses = ['math', 'biology', 'art', 'geography', 'history',
-               'english', 'chemistry', 'physics', 'Marketing', 'management']
 
-    for course_name in courses:
-        course = CourseModel(course_name, 'The course of {}.'.format(course_name))
-        db.session.add(course)
+def create_students(count, groups_count, rng):
+    """fill `students` table with `count` students with randomly combined
+    first names/last names, assigned to random groups with ids from 1 to `groups_count`."""
+    rows = ((student_id, rng.randint(1, groups_count), rng.choice(FIRST_NAMES), rng.choice(SECOND_NAMES))
+            for student_id in range(1, count + 1))
+    copy_rows(StudentModel.__table__, ['id', 'group_id', 'first_name', 'last_name'], rows)
+    set_id_sequence(StudentModel.__table__, count)
 
 
-def create_students():
-    """fill `students` table with example data, 200 students with randomly combined
-    first names\last names."""
-    first_names = ['Liam', 'Noah', 'Oliver', 'Elijah', 'William',
-                   'James', 'Benjamin', 'Lucas', 'Henry', 'Alexander',
-                   'Olivia', 'Emma', 'Ava', 'Charlotte', 'Sophia',
-                   'Amelia', 'Isabella', 'Mia', 'Evelyn', 'Harper']
+def create_students_courses_relation(students_count, courses_count, min_enrollments, max_enrollments, rng):
+    """randomly assign from `min_enrollments` to `max_enrollments` different courses
+    for each student."""
+    courses_ids = range(1, courses_count + 1)
+    max_enrollments = min(max_enrollments, courses_count)
+    min_enrollments = min(min_enrollments, max_enrollments)
 
-    second_names = ['Smith', 'Johnson', 'Williams', 'Brown', 'Jones',
-                    'Garcia', 'Miller', 'Davis', 'Rodriguez', 'Martinez',
-                    'Hernandez', 'Lopez', 'Gonzalez', 'Wilson', 'Anderson',
-                    'Thomas', 'Taylor', 'Moore', 'Jackson', 'Martin']
+    def rows():
+        for student_id in range(1, students_count + 1):
+            for course_id in rng.sample(courses_ids, rng.randint(min_enrollments, max_enrollments)):
+                yield course_id, student_id
 
-    for _ in range(200):
-        student = StudentModel(get_random_group_id(), random.choice(first_names), random.choice(second_names))
-        db.session.add(student)
+    copy_rows(students_courses_relation, ['course_id', 'student_id'], rows())
 
 
-def create_students_courses_relation():
-    """randomly assign from 1 to 3 courses for each student."""
-    courses_list = CourseModel.query.all()
+def create_test_data(groups=10, students=200, courses=10, min_enrollments=1, max_enrollments=3, seed=None):
+    """fill all tables in the database by example data, replacing existing data.
+    versions of the tables are increased in the same transaction, so values, cached
+    by other worker processes in their own stores, are not served after it, and the
+    workers need not be restarted. the shared store is cleared."""
+    rng = random.Random(seed)
 
-    for student in StudentModel.query.all():
-        for courses in random.sample(courses_list, random.randint(1, 3)):
-            student.courses.append(courses)
-
-
-def create_test_data():
-    """fill all tables in the database by example data."""
     clear_all_tables()
-    create_groups()
-    create_students()
-    create_courses()
-    create_students_courses_relation()
+    create_groups(groups, rng)
+    create_courses(courses)
+    if groups:
+        create_students(students, groups, rng)
+        if courses:
+            create_students_courses_relation(students, courses, min_enrollments, max_enrollments, rng)
+    bump_tables_versions(students_courses_relation.name, StudentModel.__tablename__,
+                         CourseModel.__tablename__, GroupModel.__tablename__)
     db.session.commit()
+    item_cache.clear()
+
+
+def main(args=None):
+    """parse command line arguments and fill the database by example data."""
+    parser = argparse.ArgumentParser(description='fill all tables in the database by example data.')
+    parser.add_argument('--groups', type=int, default=10, help='number of groups.')
+    parser.add_argument('--students', type=int, default=200, help='number of students.')
+    parser.add_argument('--courses', type=int, default=10, help='number of courses.')
+    parser.add_argument('--min-enrollments', type=int, default=1, help='min number of courses of a student.')
+    parser.add_argument('--max-enrollments', type=int, default=3, help='max number of courses of a student.')
+    parser.add_argument('--seed', type=int, default=None, help='seed of the random generator.')
+    args = parser.parse_args(args)
+
+    with create_app().app_context():
+        create_test_data(args.groups, args.students, args.courses,
+                         args.min_enrollments, args.max_enrollments, args.seed)
 
 
 if __name__ == '__main__':
-    create_test_data()
+    main()
@@ -0,0 +1,34 @@
+"""per-application state of the flask extensions.
+
+`AppExtension` is the base of the extension objects at the module variables, e.g.
+`item_cache`, which are initialized for every application by `init_app`. state of the
+extension, created by `create_state`, is kept in `app.extensions` of each application,
+so applications, created by `create_app` in one process, e.g. by tests or by
+`create_asgi_app`, do not share or replace the state of each other. attributes of the
+extension object are looked up in the state of the `current_app`."""
+from flask import current_app
+
+
+class AppExtension(object):
+    # key of the state in `app.extensions`
+    name = None
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.extensions[self.name] = self.create_state(app)
+
+    def create_state(self, app):
+        """return new state object of the `app`."""
+        raise NotImplementedError
+
+    def get_state(self, app=None):
+        """return state object of the `app` or of the current application."""
+        return (app or current_app).extensions[self.name]
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return getattr(self.get_state(), name)
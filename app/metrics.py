@@ -0,0 +1,212 @@
+"""per-request latency and SQL statements instrumentation.
+
+create `AppRequestMetrics` object at the `request_metrics` variable, which keeps
+`RequestMetrics` of every application in `app.extensions`, measures every request of
+the application and SQL statements, executed by all SQLAlchemy engines while the
+request is handled, and renders histograms of this process in the Prometheus text
+format, failed requests included:
+    http_request_duration_seconds - request latency by route and method
+    http_request_sql_statements - number of SQL statements of the request
+    http_request_db_duration_seconds - total time of SQL statements of the request
+statements of streamed responses, executed after the response is returned, are not
+counted.
+
+configured by `init_app` from the app config:
+    QUERY_COUNT_HEADER - add `X-Query-Count` header with number of SQL statements of
+        the request to every response, for debugging
+    DETECT_REPEATED_QUERIES - development mode: issue `RepeatedQueriesWarning`, if
+        statements of the same shape, e.g. N+1 selects of related rows, are executed
+        by one request `REPEATED_QUERIES_THRESHOLD` times or more
+
+`query_budget` context manager and decorator fails tests, which execute more SQL
+statements than declared."""
+import re
+import threading
+import time
+import warnings
+from bisect import bisect_left
+from collections import Counter
+from contextlib import contextmanager
+
+from flask import g, request, current_app, has_request_context
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from .extensions import AppExtension
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+STATEMENTS_BUCKETS = (0, 1, 2, 3, 5, 10, 25, 50, 100)
+
+
+class RepeatedQueriesWarning(UserWarning):
+    pass
+
+
+def get_statement_shape(statement):
+    """return `statement` with parameters, lists of parameters and numbers replaced by
+    `?`, so statements, which differ only by values, have the same shape."""
+    shape = re.sub(r'%\(\w+\)s|\b\d+\b', '?', statement)
+    shape = re.sub(r'\?(\s*,\s*\?)+', '?', shape)
+    return ' '.join(shape.split())
+
+
+@contextmanager
+def query_budget(max_statements):
+    """fail with AssertionError, if more than `max_statements` SQL statements are
+    executed by all engines inside the block or the decorated function. yield list of
+    executed statements."""
+    statements = []
+
+    def collect_statement(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(Engine, 'before_cursor_execute', collect_statement)
+    try:
+        yield statements
+    finally:
+        event.remove(Engine, 'before_cursor_execute', collect_statement)
+
+    assert len(statements) <= max_statements, \
+        '{} SQL statements executed, budget is {}:\n{}'.format(len(statements), max_statements,
+                                                            '\n'.join(statements))
+
+
+def format_labels(labels):
+    return ','.join('{}="{}"'.format(name, str(value).replace('\\', '\\\\').replace('"', '\\"'))
+                    for name, value in labels)
+
+
+class Histogram(object):
+    """histogram of observed values by labels, with cumulative buckets."""
+
+    def __init__(self, name, documentation, buckets):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = buckets
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, labels, value):
+        """add the `value` to the histogram of the `labels` tuple of (name, value)
+        pairs."""
+        with self._lock:
+            counts, total = self._values.get(labels, ([0] * (len(self.buckets) + 1), 0))
+            counts[bisect_left(self.buckets, value)] += 1
+            self._values[labels] = (counts, total + value)
+
+    def get_count(self, labels):
+        """return number of observed values of the `labels`."""
+        with self._lock:
+            counts, _ = self._values.get(labels, ((), 0))
+            return sum(counts)
+
+    def render(self):
+        """return list of lines of the histogram in the Prometheus text format."""
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            for labels, (counts, total) in sorted(self._values.items()):
+                cumulative_count = 0
+                for bound, count in zip((*self.buckets, '+Inf'), counts):
+                    cumulative_count += count
+                    bucket_labels = format_labels((*labels, ('le', bound)))
+                    lines.append(f'{self.name}_bucket{{{bucket_labels}}} {cumulative_count}')
+                lines.append(f'{self.name}_sum{{{format_labels(labels)}}} {total}')
+                lines.append(f'{self.name}_count{{{format_labels(labels)}}} {cumulative_count}')
+        return lines
+
+
+class RequestMetrics(object):
+    def __init__(self, app=None):
+        self.request_duration = Histogram('http_request_duration_seconds',
+                                          'Request latency by route and method.', DURATION_BUCKETS)
+        self.sql_statements = Histogram('http_request_sql_statements',
+                                        'Number of SQL statements of the request.', STATEMENTS_BUCKETS)
+        self.db_duration = Histogram('http_request_db_duration_seconds',
+                                     'Total time of SQL statements of the request.', DURATION_BUCKETS)
+
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        if not event.contains(Engine, 'before_cursor_execute', before_cursor_execute):
+            event.listen(Engine, 'before_cursor_execute', before_cursor_execute)
+            event.listen(Engine, 'after_cursor_execute', after_cursor_execute)
+
+        app.before_request(start_request_measuring)
+        app.after_request(add_query_count_header)
+        # teardown is called for failed requests too, after_request is skipped by
+        # unhandled exceptions.
+        app.teardown_request(self.finish_request_measuring)
+        app.config.setdefault('QUERY_COUNT_HEADER', False)
+        app.config.setdefault('DETECT_REPEATED_QUERIES', False)
+        app.config.setdefault('REPEATED_QUERIES_THRESHOLD', 2)
+
+    def finish_request_measuring(self, exception=None):
+        """observe the request metrics of the finished request, successful or not."""
+        if 'request_start' not in g:
+            return
+
+        labels = (('route', request.url_rule.rule if request.url_rule else 'unmatched'), ('method', request.method))
+        self.request_duration.observe(labels, time.perf_counter() - g.pop('request_start'))
+        self.sql_statements.observe(labels, g.pop('sql_statements'))
+        self.db_duration.observe(labels, g.pop('db_duration'))
+
+        if 'statements_shapes' in g:
+            warn_repeated_queries(g.pop('statements_shapes'), labels)
+
+    def render(self):
+        """return all metrics in the Prometheus text format."""
+        histograms = (self.request_duration, self.sql_statements, self.db_duration)
+        return '\n'.join(line for histogram in histograms for line in histogram.render()) + '\n'
+
+
+def start_request_measuring():
+    g.request_start = time.perf_counter()
+    g.sql_statements = 0
+    g.db_duration = 0.0
+    if current_app.config['DETECT_REPEATED_QUERIES']:
+        g.statements_shapes = Counter()
+
+
+def add_query_count_header(response):
+    """add `X-Query-Count` header with number of SQL statements of the request, if it
+    is configured."""
+    if current_app.config['QUERY_COUNT_HEADER'] and 'sql_statements' in g:
+        response.headers['X-Query-Count'] = str(g.sql_statements)
+    return response
+
+
+def warn_repeated_queries(statements_shapes, labels):
+    """issue `RepeatedQueriesWarning` for every statement shape, executed by the request
+    `REPEATED_QUERIES_THRESHOLD` times or more."""
+    threshold = current_app.config['REPEATED_QUERIES_THRESHOLD']
+    route, method = (value for _, value in labels)
+    for (_, shape), count in statements_shapes.items():
+        if count >= threshold:
+            warnings.warn(f'{method} {route} executed {count} statements of the same shape: {shape}',
+                          RepeatedQueriesWarning)
+
+
+def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info['statement_start'] = time.perf_counter()
+
+
+def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if has_request_context() and 'sql_statements' in g:
+        g.sql_statements += 1
+        g.db_duration += time.perf_counter() - conn.info.pop('statement_start')
+        if 'statements_shapes' in g:
+            # the same statement on different engines, e.g. on the primary and replica,
+            # is not repeated.
+            g.statements_shapes[(conn.engine, get_statement_shape(statement))] += 1
+
+
+class AppRequestMetrics(AppExtension):
+    """`RequestMetrics` of every application, configured by `init_app`."""
+    name = 'request_metrics'
+
+    def create_state(self, app):
+        return RequestMetrics(app)
+
+
+request_metrics = AppRequestMetrics()
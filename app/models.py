@@ -1,19 +1,19 @@
 """
-Contains SQLAlchemy models of tables
-automatically creates all tables in the database, if they are not, and test data,
-if any data not exist.
+Contains SQLAlchemy models of tables.
 
 models:
     GroupModel
         fields:
             id (int, primary_key)
             name (str)
+            version (int)
 
     CourseModel
         fields:
             id (int, primary_key)
             name (str)
             description (str)
+            version (int)
 
     StudentModel
         fields:
@@ -21,6 +21,10 @@ models:
             first_name (str)
             last_name (str)
             group_id (int)
+            version (int)
+
+    `version` of the item is increased by every update of its columns, `put_item`
+    updates the item only if it has one of the expected versions, if they are given.
 
 tables:
     students_courses_relation
@@ -29,97 +33,687 @@ tables:
         columns:
             course_id (int, primary_key)
             student_id (int, primary_key)
+
+    table_versions
+        version counters of the tables, increased by every change of the table data.
+        columns:
+            table_name (str, primary_key)
+            version (int)
+            updated_at (datetime)
+
+    schema_migrations
+        versions of the applied schema migrations.
+        columns:
+            version (int, primary_key)
+            name (str)
+            applied_at (datetime)
+
+    group_stats, course_stats, course_pair_stats
+        summary tables of numbers of students of groups, of courses and of pairs of
+        courses, updated by the database triggers in the transaction of every change
+        of the students and enrollments. groups and courses without students are
+        not kept.
+        columns:
+            group_id/course_id, other_course_id (int, primary_key)
+            students_count (int)
+
+functions:
+    enroll_students, unenroll_students
+        add/delete many (student_id, course_id) pairs to/from the
+        `students_courses_relation` table by one set-based statement.
+
+    bump_tables_versions, get_tables_versions
+        increase/return version counters of the tables.
+
+    read_connection, read_rows
+        return connection of the read replica, that has all changes of the tables,
+        committed on the primary, or of the primary / rows of the statement, read
+        from it. failed replicas are skipped.
+
+    refresh_stats
+        recount all summary tables from the data.
 """
+import os
 import re
+from contextlib import closing, contextmanager
 
-from .application import app, db
-from sqlalchemy.exc import IntegrityError, DataError
+from .application import db
+from .cache import item_cache
+from .replicas import replica_router
+from sqlalchemy import event, cast, func, insert, select, update, delete, literal, or_, true, tuple_, DDL
+from sqlalchemy.dialects.postgresql import ARRAY, aggregate_order_by, insert as pg_insert
+from sqlalchemy.exc import IntegrityError, DataError, OperationalError
 
 
 def is_group_name_fits(name):
-    return re.search("[a-z][a-z]-[0-9][0-9]", name)
+    return isinstance(name, str) and re.search("[a-z][a-z]-[0-9][0-9]", name)
+
+
+def is_non_negative_integer(value):
+    """return True if the string is a non-negative integer of ASCII digits, so `int`
+    parses it."""
+    return value.isascii() and value.isdigit()
 
 
+def is_integer_id(value):
+    """return True if `value` is an int, not a bool, in the range of integer columns."""
+    return isinstance(value, int) and not isinstance(value, bool) and -2 ** 31 <= value < 2 ** 31
+
+
+def escape_like(value):
+    """return `value` with `%`, `_` and `\\` characters escaped by `\\` for LIKE
+    patterns."""
+    return re.sub(r'([\\%_])', r'\\\1', value)
+
+
+class VersionConflictError(Exception):
+    """the item was changed by another request, since its version was read."""
+
+
+def get_id_filter_value(args, name):
+    """return int value of the id filter query string parameter, or None if it is not
+    given."""
+    value = args.get(name)
+    if value is None:
+        return None
+    assert is_non_negative_integer(value), f'`{name}` parameter should be a non-negative integer.'
+    return int(value)
+
+
+# indexes are declared with the same names as in `sql/create_tables.sql`, and added to
+# existing databases by `sql/migrations`.
 students_courses_relation = db.Table('students_courses_relation',
                         db.Column('course_id', db.Integer, db.ForeignKey('courses.id'), primary_key=True),
-                        db.Column('student_id', db.Integer, db.ForeignKey('students.id'), primary_key=True)
+                        db.Column('student_id', db.Integer, db.ForeignKey('students.id'), primary_key=True),
+                        db.UniqueConstraint('student_id', 'course_id',
+                                            name='students_courses_relation_student_id_course_id_key'),
+                        db.Index('students_courses_relation_course_id_idx', 'course_id')
+                        )
+
+table_versions = db.Table('table_versions',
+                          db.Column('table_name', db.String, primary_key=True),
+                          db.Column('version', db.BigInteger, nullable=False),
+                          db.Column('updated_at', db.DateTime(timezone=True), nullable=False)
+                          )
+
+schema_migrations = db.Table('schema_migrations',
+                             db.Column('version', db.Integer, primary_key=True),
+                             db.Column('name', db.String, nullable=False),
+                             db.Column('applied_at', db.DateTime(timezone=True), nullable=False,
+                                       server_default=func.now())
+                             )
+
+# summary tables of the statistics, updated by the triggers of `sql/stats.sql`, which
+# are created with the tables.
+group_stats = db.Table('group_stats',
+                       db.Column('group_id', db.Integer, primary_key=True),
+                       db.Column('students_count', db.Integer, nullable=False)
+                       )
+
+course_stats = db.Table('course_stats',
+                        db.Column('course_id', db.Integer, primary_key=True),
+                        db.Column('students_count', db.Integer, nullable=False)
                         )
 
+course_pair_stats = db.Table('course_pair_stats',
+                             db.Column('course_id', db.Integer, primary_key=True),
+                             db.Column('other_course_id', db.Integer, primary_key=True),
+                             db.Column('students_count', db.Integer, nullable=False)
+                             )
+
+STATS_SQL_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'sql', 'stats.sql')
+with open(STATS_SQL_PATH) as stats_sql_file:
+    event.listen(db.metadata, 'after_create', DDL(stats_sql_file.read()))
+
+# trigram indexes of the columns with `trigram_indexed` info, used by the names filters
+# of the list resources, are created by `sql/search.sql`, if the `pg_trgm` extension is
+# available.
+SEARCH_SQL_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'sql', 'search.sql')
+with open(SEARCH_SQL_PATH) as search_sql_file:
+    event.listen(db.metadata, 'after_create', DDL(search_sql_file.read()))
+
+
+def bump_tables_versions(*tables_names):
+    """increase versions of the tables in the current transaction, should be called
+    before commit of every change of the tables data."""
+    statement = pg_insert(table_versions) \
+        .values([{'table_name': table_name, 'version': 1, 'updated_at': func.now()}
+                 for table_name in sorted(set(tables_names))])
+    statement = statement.on_conflict_do_update(
+        index_elements=[table_versions.c.table_name],
+        set_={'version': table_versions.c.version + 1, 'updated_at': func.now()})
+    db.session.execute(statement)
+
+
+def get_tables_versions(tables_names):
+    """return dict of (version, updated_at) tuples of the tables by table names, tables
+    without changes have version 0 and updated_at None. selected by one query outside
+    of the session."""
+    with db.engine.connect() as connection:
+        rows = connection.execute(select_tables_versions(tables_names))
+        return get_tables_versions_dict(tables_names, rows)
+
+
+def select_tables_versions(tables_names):
+    """return select of `table_versions` rows of the tables."""
+    return select(table_versions).where(table_versions.c.table_name.in_(tables_names))
+
+
+def get_tables_versions_dict(tables_names, rows):
+    """return dict of (version, updated_at) tuples of the tables from the selected
+    `table_versions` rows."""
+    versions = {row.table_name: (row.version, row.updated_at) for row in rows}
+    return {table_name: versions.get(table_name, (0, None)) for table_name in tables_names}
+
+
+def iter_replicas_connections(tables_names, versions=None):
+    """yield (replica, connection) tuples of the healthy replicas, that have applied all
+    changes of the tables, committed on the primary so far, by `versions` of the tables
+    on the primary, e.g. read for the ETag of the request, or read here, if they are not
+    given. replica, that fails the query, is marked down and skipped."""
+    if not replica_router.replicas:
+        return
+
+    primary_versions = versions or get_tables_versions(tables_names)
+    for replica, connection in replica_router.iter_connections():
+        with connection:
+            try:
+                rows = connection.execute(select_tables_versions(tables_names))
+            except OperationalError:
+                replica_router.mark_down(replica)
+                continue
+            versions = get_tables_versions_dict(tables_names, rows)
+            if all(versions[table_name][0] >= primary_versions[table_name][0] for table_name in tables_names):
+                yield replica, connection
+
+
+@contextmanager
+def read_connection(tables_names, versions=None):
+    """return context manager of the connection for read queries of the tables data:
+    of the next healthy replica, that has applied all changes of the tables, committed on
+    the primary so far, so it returns the same data as the primary and read-your-writes
+    is kept, or of the session connection to the primary, if there is no such replica.
+    pending changes of the session are flushed before reading from the primary, as by
+    autoflush of the session queries. `versions` of the tables on the primary are read,
+    if they are not given."""
+    with closing(iter_replicas_connections(tables_names, versions)) as connections:
+        for replica, connection in connections:
+            try:
+                yield connection
+            except OperationalError:
+                replica_router.mark_down(replica)
+                raise
+            return
+
+    db.session.flush()
+    yield db.session.connection()
+
+
+def read_rows(tables_names, statement, versions=None):
+    """return list of dicts of the rows of the read `statement`, executed on the
+    connection of `read_connection`. if the query fails on the replica, e.g. stopped
+    after the connection was checked out, the replica is marked down and the query is
+    executed on the next replica, or on the primary."""
+    with closing(iter_replicas_connections(tables_names, versions)) as connections:
+        for replica, connection in connections:
+            try:
+                return [dict(row) for row in connection.execute(statement).mappings()]
+            except OperationalError:
+                replica_router.mark_down(replica)
+
+    db.session.flush()
+    return [dict(row) for row in db.session.connection().execute(statement).mappings()]
+
+
+def select_enrollment_pairs(pairs):
+    """return select of (student_id, course_id) rows from the list of
+    {'student_id': int, 'course_id': int} dicts, rows are unnested from two array
+    parameters, so the statement size not depends on the pairs count."""
+    assert isinstance(pairs, list), 'json array of enrollments expected.'
+    for index, pair in enumerate(pairs):
+        assert isinstance(pair, dict) \
+               and is_integer_id(pair.get('student_id')) and is_integer_id(pair.get('course_id')), \
+               f'item {index}: integer `student_id` and `course_id` expected.'
+
+    students_ids = literal([pair['student_id'] for pair in pairs], ARRAY(db.Integer))
+    courses_ids = literal([pair['course_id'] for pair in pairs], ARRAY(db.Integer))
+    return select(func.unnest(students_ids), func.unnest(courses_ids))
+
+
+def enroll_students(pairs):
+    """add all (student_id, course_id) pairs to the `students_courses_relation` table by
+    one statement, already existing pairs are ignored. return number of added pairs."""
+    statement = pg_insert(students_courses_relation) \
+        .from_select(['student_id', 'course_id'], select_enrollment_pairs(pairs)) \
+        .on_conflict_do_nothing()
+
+    try:
+        result = db.session.execute(statement)
+        bump_tables_versions(students_courses_relation.name)
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+        raise AssertionError('incorrect data.')
+
+    invalidate_enrollment_pairs(pairs)
+    return {'enrolled': result.rowcount}
+
+
+def unenroll_students(pairs):
+    """delete all (student_id, course_id) pairs from the `students_courses_relation`
+    table by one statement. return number of deleted pairs."""
+    relation_columns = tuple_(students_courses_relation.c.student_id, students_courses_relation.c.course_id)
+    statement = delete(students_courses_relation).where(relation_columns.in_(select_enrollment_pairs(pairs)))
+
+    result = db.session.execute(statement)
+    bump_tables_versions(students_courses_relation.name)
+    db.session.commit()
+
+    invalidate_enrollment_pairs(pairs)
+    return {'unenrolled': result.rowcount}
+
+
+def invalidate_enrollment_pairs(pairs):
+    """evict cached params dicts of all students and courses of the pairs."""
+    item_cache.invalidate({key for pair in pairs for key in ((StudentModel.__tablename__, pair['student_id']),
+                                                             (CourseModel.__tablename__, pair['course_id']))})
+
 
 class DatabaseFunctionsMixin(object):
+    # (key, join column, ids column) of the relation ids list added to params dict,
+    # e.g. ('courses_ids', students_courses_relation.c.student_id,
+    # students_courses_relation.c.course_id) for StudentModel.
+    relation_ids = None
+    # (table name, column name) pairs of other items, which cached params dicts contain
+    # values of this item columns, e.g. (('groups', 'group_id'),) for StudentModel,
+    # because `students_ids` of the group depend on the student `group_id`.
+    cache_dependents = ()
+    # max number of rows in one multi-row insert statement of `post_items`.
+    bulk_insert_chunk_size = 1000
+    # names of the columns, matched by the `name_prefix` and `search` list filters.
+    name_columns = ()
+
+    @classmethod
+    def get_item(cls, item_id, options=()):
+        """return the item by id. relationships are loaded lazily, unless loader
+        `options`, e.g. `selectinload(StudentModel.courses)`, are given."""
+        return db.session.get(cls, item_id, options=options)
+
+    @classmethod
+    def get_item_params_dict(cls, item_id, fields=None):
+        """return params dict of the item with `fields`, or None if there is no such
+        item. read from the replica by one query."""
+        rows = read_rows(cls.get_version_tables_names(), cls.select_item_params_dict(item_id, fields))
+        return rows[0] if rows else None
+
+    @classmethod
+    def get_item_params_dict_with_versions(cls, item_id, fields=None, versions=None):
+        """return params dict of the item with `fields`, or None if there is no such
+        item, and dict of versions of the model tables, read from the replica by one
+        query. `versions` of the tables on the primary are passed to `read_rows`, if
+        they are already read."""
+        rows = read_rows(cls.get_version_tables_names(), cls.select_item_params_dict_with_versions(item_id, fields),
+                         versions)
+        return cls.split_item_params_dict_with_versions(rows)
+
+    @classmethod
+    def get_params_names(cls):
+        """return list of names of the params dict keys."""
+        names = cls.__table__.columns.keys()
+        if cls.relation_ids:
+            names.append(cls.relation_ids[0])
+        return names
+
+    @classmethod
+    def get_fields(cls, args):
+        """return list of names of the params, requested by the comma separated `fields`
+        query string parameter, or None if all params are requested. `id` is always
+        returned."""
+        if args.get('fields') is None:
+            return None
+
+        fields = [name.strip() for name in args['fields'].split(',') if name.strip()]
+        unknown_fields = [name for name in fields if name not in cls.get_params_names()]
+        assert not unknown_fields, 'unknown fields: {}. fields of {}: {}.'.format(
+            ', '.join(unknown_fields), cls.__tablename__, ', '.join(cls.get_params_names()))
+        return ['id'] + [name for name in fields if name != 'id']
+
+    @classmethod
+    def get_cache_keys(cls, columns_dict):
+        """return cache keys of the item with `columns_dict` values and other items,
+        which cached params dicts depend on them."""
+        keys = [(cls.__tablename__, int(columns_dict['id']))]
+        keys.extend((table_name, int(columns_dict[column_name])) for table_name, column_name in cls.cache_dependents
+                    if columns_dict[column_name] is not None)
+        return keys
 
     @classmethod
-    def get_item(cls, item_id):
-        return db.session.get(cls, item_id)
+    def get_related_cache_keys(cls, item_id):
+        """return cache keys of the items, related to the item through `relation_ids`."""
+        if not cls.relation_ids:
+            return []
+
+        _, join_column, ids_column = cls.relation_ids
+        foreign_key = next(iter(ids_column.foreign_keys), None)
+        related_table_name = foreign_key.column.table.name if foreign_key else ids_column.table.name
+        related_ids = db.session.query(ids_column).filter(join_column == item_id)
+        return [(related_table_name, related_id) for related_id, in related_ids]
 
     @classmethod
     def delete_item(cls, item_id):
-        item = cls.query.filter_by(id=item_id).first()
+        item = cls.get_item(item_id)
         if not item:
             return f'item {item_id} was not found in {cls.__tablename__} table.'
+        cache_keys = cls.get_cache_keys(item.get_columns_dict()) + cls.get_related_cache_keys(item_id)
         db.session.delete(item)
+        bump_tables_versions(*cls.get_version_tables_names())
         db.session.commit()
+        item_cache.invalidate(cache_keys)
 
         return f'deleted item {item_id}.'
 
     @classmethod
-    def get_all_items_params_dict(cls):
-        items = cls.query.all()
-        return [item.get_params_dict() for item in items]
+    def get_version_tables_names(cls):
+        """return names of the tables, params dicts of the model depend on."""
+        tables_names = [cls.__tablename__]
+        if cls.relation_ids:
+            tables_names.append(cls.relation_ids[1].table.name)
+        return tables_names
 
+    @classmethod
+    def get_filters_clauses(cls, args):
+        """return list of where clauses of the list filters from the dict of query string
+        parameters:
+            name_prefix - any of `name_columns` starts with the value
+            search - any of `name_columns` contains the value
+        names are matched case-insensitive by the trigram indexes."""
+        clauses = []
+        name_columns = [cls.__table__.c[column_name] for column_name in cls.name_columns]
+        if args.get('name_prefix'):
+            pattern = escape_like(args['name_prefix']) + '%'
+            clauses.append(or_(*(column.ilike(pattern, escape='\\') for column in name_columns)))
+        if args.get('search'):
+            pattern = '%' + escape_like(args['search']) + '%'
+            clauses.append(or_(*(column.ilike(pattern, escape='\\') for column in name_columns)))
+        return clauses
 
     @classmethod
-    def post_item(cls, **params):
+    def select_params_dicts(cls, after=None, limit=None, filters=(), fields=None):
+        """return core select of params dicts of items ordered by id in one round trip,
+        relation ids are collected by the array aggregate over outer join. it is executed
+        by both the session and the async engine of the ASGI mode.
+        `after` and `limit` select a keyset page: items with id greater than `after`,
+        not more than `limit`, of the items, selected by the `filters` where clauses.
+        `fields` is list of names of the selected params, all by default, the relation
+        is joined only if its ids are selected."""
+        columns = [column for column in cls.__table__.columns if fields is None or column.key in fields]
+        statement = select(*columns).select_from(cls.__table__).where(*filters)
+
+        if cls.relation_ids and (fields is None or cls.relation_ids[0] in fields):
+            ids_name, join_column, ids_column = cls.relation_ids
+            ids_array = func.array_remove(func.array_agg(aggregate_order_by(ids_column, ids_column)), None)
+            statement = statement.add_columns(ids_array.label(ids_name)) \
+                .outerjoin(join_column.table, join_column == cls.__table__.c.id) \
+                .group_by(cls.__table__.c.id)
+
+        if after is not None:
+            statement = statement.where(cls.__table__.c.id > after)
+
+        return statement.order_by(cls.__table__.c.id).limit(limit)
+
+    @classmethod
+    def select_item_params_dict(cls, item_id, fields=None):
+        """return core select of the params dict of one item."""
+        return cls.select_params_dicts(fields=fields).where(cls.__table__.c.id == item_id)
+
+    @classmethod
+    def select_item_params_dict_with_versions(cls, item_id, fields=None):
+        """return core select of `table_versions` rows of the model tables, joined with
+        the params dict of one item, so the validators and the data of the item GET are
+        read by one round trip. params columns are null, if there is no such item."""
+        tables_names = cast(cls.get_version_tables_names(), ARRAY(db.String))
+        names = func.unnest(tables_names).table_valued('table_name').render_derived('names')
+        item = cls.select_item_params_dict(item_id, fields).subquery('item')
+        return select(names.c.table_name, table_versions.c.version.label('table_version'),
+                      table_versions.c.updated_at.label('table_updated_at'), *item.c) \
+            .select_from(names.outerjoin(table_versions, table_versions.c.table_name == names.c.table_name)
+                         .outerjoin(item, true()))
+
+    @classmethod
+    def split_item_params_dict_with_versions(cls, rows):
+        """return params dict of the item, or None, and dict of versions of the model
+        tables from the rows of `select_item_params_dict_with_versions`."""
+        versions, params_dict = {}, None
+        for row in rows:
+            row = dict(row)
+            versions[row.pop('table_name')] = (row.pop('table_version') or 0, row.pop('table_updated_at'))
+            if row['id'] is not None:
+                params_dict = row
+        return params_dict, {table_name: versions[table_name] for table_name in cls.get_version_tables_names()}
+
+    @classmethod
+    def get_all_items_params_dict(cls, after=None, limit=None, filters=(), fields=None, versions=None):
+        """return list of params dicts of items, read from the replica."""
+        statement = cls.select_params_dicts(after, limit, filters, fields)
+        return read_rows(cls.get_version_tables_names(), statement, versions)
+
+    @classmethod
+    def iter_all_items_params_dict(cls, batch_size, after=None, filters=(), fields=None, versions=None):
+        """yield params dicts of all items with id greater than `after` one by one,
+        rows are read from the replica through the server side cursor by `batch_size`
+        rows."""
+        with read_connection(cls.get_version_tables_names(), versions) as connection:
+            result = connection.execution_options(stream_results=True, max_row_buffer=batch_size) \
+                .execute(cls.select_params_dicts(after, filters=filters, fields=fields))
+            for row in result.mappings():
+                yield dict(row)
+
+    @classmethod
+    def get_post_columns_names(cls):
         columns_name_list = cls.__table__.columns.keys()
         columns_name_list.remove('id')
-        for column_name in columns_name_list:
+        columns_name_list.remove('version')
+        return columns_name_list
+
+    @classmethod
+    def get_put_columns_names(cls):
+        """return names of the columns, which are changed by the PUT method params.
+        `version` is increased by every update."""
+        columns_name_list = cls.__table__.columns.keys()
+        columns_name_list.remove('version')
+        return columns_name_list
+
+    @classmethod
+    def check_put_params(cls, params):
+        """raise AssertionError if `params` are not correct values of the columns."""
+
+    @classmethod
+    def check_post_params(cls, params):
+        """raise AssertionError if `params` are not enough to create a new item."""
+        for column_name in cls.get_post_columns_names():
             assert column_name in params, '`{}` parameter missed'.format(column_name)
+            cls.check_param_type(column_name, params[column_name])
+
+    @classmethod
+    def check_param_type(cls, column_name, value):
+        """raise AssertionError if `value` of the column is not a string, or an integer
+        of an integer column, or null of a nullable one, e.g. an object of a json
+        body."""
+        column = cls.__table__.c[column_name]
+        assert isinstance(value, str) \
+            or value is None and column.nullable \
+            or isinstance(value, int) and not isinstance(value, bool) and isinstance(column.type, db.Integer), \
+            '`{}` parameter has wrong type'.format(column_name)
+
+    @classmethod
+    def post_item(cls, **params):
+        cls.check_post_params(params)
+        columns_name_list = cls.get_post_columns_names()
 
         new_item = cls(**{column_name: params[column_name] for column_name in columns_name_list})
 
         try:
             db.session.add(new_item)
+            db.session.flush()
+            bump_tables_versions(cls.__tablename__)
+            cache_keys = cls.get_cache_keys(new_item.get_columns_dict())
+            db.session.commit()
+        except (IntegrityError, DataError):
+            db.session.rollback()
+            raise AssertionError('incorrect data.')
+
+        item_cache.invalidate(cache_keys)
+
+    @classmethod
+    def post_items(cls, items):
+        """create new items from the list of params dicts by multi-row inserts in one
+        transaction, return list of new item ids in the same order.
+        if any of items is incorrect, nothing is created."""
+        errors = []
+        for index, params in enumerate(items):
+            try:
+                assert isinstance(params, dict), 'item should be an object.'
+                cls.check_post_params(params)
+            except AssertionError as e:
+                errors.append(f'item {index}: {e}')
+        assert not errors, '; '.join(errors)
+
+        columns_name_list = cls.get_post_columns_names()
+        rows = [{column_name: params[column_name] for column_name in columns_name_list} for params in items]
+        ids = []
+
+        try:
+            for start in range(0, len(rows), cls.bulk_insert_chunk_size):
+                statement = insert(cls.__table__) \
+                    .values(rows[start:start + cls.bulk_insert_chunk_size]) \
+                    .returning(cls.__table__.c.id)
+                ids.extend(db.session.execute(statement).scalars())
+            bump_tables_versions(cls.__tablename__)
             db.session.commit()
-        except IntegrityError:
+        except (IntegrityError, DataError):
             db.session.rollback()
             raise AssertionError('incorrect data.')
 
+        item_cache.invalidate({key for item_id, row in zip(ids, rows)
+                               for key in cls.get_cache_keys({**row, 'id': item_id})})
+        return ids
+
     def put_params(self, **params):
-        for column_name in self.__table__.columns.keys():
-            if column_name in params:
-                setattr(self, column_name, params[column_name])
+        return self.put_item(self.id, params)
 
+    @classmethod
+    def put_item(cls, item_id, params, versions=None, conditional=False):
+        """update columns of the item by `params` and increase its version by one
+        conditional UPDATE statement, without reading the item before and locking it
+        between requests. if `versions` are given, the item is updated only if its
+        current version is one of them. if the item is not updated because of its
+        version, or there is no such item and the update is `conditional`, e.g. by
+        `If-Match: *`, VersionConflictError is raised, otherwise error message is
+        returned if there is no such item."""
+        conditional = conditional or versions is not None
+        table = cls.__table__
+        not_exist_message = f'item with id {item_id} not exist in {cls.__tablename__} model.'
         try:
+            cls.check_put_params(params)
+        except AssertionError:
+            # missing item is reported before the wrong params.
+            if not db.session.execute(select(table.c.id).where(table.c.id == item_id)).first():
+                if conditional:
+                    raise VersionConflictError(not_exist_message)
+                return not_exist_message
+            raise
+        values = {column_name: params[column_name] for column_name in cls.get_put_columns_names()
+                  if column_name in params}
+        # the row before the update is locked by the same statement, so its version and
+        # values of the columns, which cached params dicts of other items depend on, are
+        # the latest committed ones, even if the row is updated concurrently. both old
+        # and new dependent items are evicted.
+        old = select(table.c.id, table.c.version, *(table.c[column_name] for _, column_name in cls.cache_dependents)) \
+            .where(table.c.id == item_id).with_for_update().cte('old')
+        conditions = [table.c.id == old.c.id]
+        if versions is not None:
+            conditions.append(table.c.version.in_(versions))
+        updated = update(table).where(*conditions) \
+            .values(**values, version=table.c.version + 1) \
+            .returning(*table.c, *(old.c[column_name].label(f'old_{column_name}')
+                                   for _, column_name in cls.cache_dependents)) \
+            .cte('updated')
+        # one row with the updated columns, or nulls, and with the version before the
+        # update, which is null if there is no such item.
+        statement = select(old.c.version.label('current_version'), *updated.c) \
+            .select_from(select(literal(1)).subquery('one').outerjoin(old, true()).outerjoin(updated, true()))
+
+        try:
+            row = db.session.execute(statement).mappings().one()
+            if row['id'] is not None:
+                bump_tables_versions(cls.__tablename__)
             db.session.commit()
         except (IntegrityError, DataError):
             db.session.rollback()
             raise AssertionError('Incorrect data.')
 
-    def get_params_dict(self):
+        if row['current_version'] is None:
+            if conditional:
+                raise VersionConflictError(not_exist_message)
+            return not_exist_message
+        if row['id'] is None:
+            raise VersionConflictError(f'item {item_id} of {cls.__tablename__} table was changed, '
+                                       f'its version is {row["current_version"]}.')
+
+        columns_dict = {column_name: row[column_name] for column_name in table.columns.keys()}
+        old_columns_dict = {**columns_dict, **{column_name: row[f'old_{column_name}']
+                                               for _, column_name in cls.cache_dependents}}
+        item_cache.invalidate(set(cls.get_cache_keys(columns_dict) + cls.get_cache_keys(old_columns_dict)))
+
+    def get_columns_dict(self):
         return {column_name: getattr(self, column_name)
                 for column_name in self.__table__.columns.keys()}
 
+    def get_params_dict(self):
+        return self.get_columns_dict()
+
 
 class StudentModel(db.Model, DatabaseFunctionsMixin):
     __tablename__ = 'students'
+    __table_args__ = (db.Index('students_group_id_idx', 'group_id'),)
 
     id = db.Column(db.Integer, primary_key=True)
     group_id = db.Column(db.Integer, db.ForeignKey('groups.id'))
-    first_name = db.Column(db.String)
-    last_name = db.Column(db.String)
-    courses = db.relationship('CourseModel', secondary=students_courses_relation, lazy='subquery',
+    first_name = db.Column(db.String, info={'trigram_indexed': True})
+    last_name = db.Column(db.String, info={'trigram_indexed': True})
+    version = db.Column(db.Integer, nullable=False, default=1, server_default='1')
+    # loaded lazily, callers, which need the related items, choose the loading strategy
+    # by the `get_item` options, GET methods read ids of the related items by the core
+    # selects of params dicts.
+    courses = db.relationship('CourseModel', secondary=students_courses_relation,
                               backref=db.backref('students', lazy=True))
+    relation_ids = ('courses_ids', students_courses_relation.c.student_id, students_courses_relation.c.course_id)
+    cache_dependents = (('groups', 'group_id'),)
+    name_columns = ('first_name', 'last_name')
 
     def __init__(self, group_id, first_name, last_name):
         self.group_id = group_id
         self.first_name = first_name
         self.last_name = last_name
 
+    @classmethod
+    def get_filters_clauses(cls, args):
+        """add filters of students:
+            group_id - students of the group
+            course_id - students, enrolled to the course"""
+        clauses = super(StudentModel, cls).get_filters_clauses(args)
+        group_id = get_id_filter_value(args, 'group_id')
+        if group_id is not None:
+            clauses.append(cls.__table__.c.group_id == group_id)
+        course_id = get_id_filter_value(args, 'course_id')
+        if course_id is not None:
+            clauses.append(cls.__table__.c.id.in_(select(students_courses_relation.c.student_id)
+                                                  .where(students_courses_relation.c.course_id == course_id)))
+        return clauses
+
     def get_params_dict(self):
         params_dict = super(StudentModel, self).get_params_dict()
-
-        courses = db.session.query(students_courses_relation).filter_by(student_id=self.id)
-        params_dict['courses_ids'] = [course.course_id for course in courses]
+        params_dict['courses_ids'] = [course.id for course in self.courses]
         return params_dict
 
 
@@ -127,7 +721,10 @@ class GroupModel(db.Model, DatabaseFunctionsMixin):
     __tablename__ = 'groups'
 
     id = db.Column(db.Integer, primary_key=True)
-    name = db.Column(db.String)
+    name = db.Column(db.String, info={'trigram_indexed': True})
+    version = db.Column(db.Integer, nullable=False, default=1, server_default='1')
+    relation_ids = ('students_ids', StudentModel.__table__.c.group_id, StudentModel.__table__.c.id)
+    name_columns = ('name',)
 
     def __init__(self, name):
         self.name = name
@@ -139,12 +736,11 @@ class GroupModel(db.Model, DatabaseFunctionsMixin):
         params_dict['students_ids'] = [student.id for student in students]
         return params_dict
 
-    def put_params(self, **params):
+    @classmethod
+    def check_put_params(cls, params):
         if 'name' in params:
             assert is_group_name_fits(params['name']), 'wrong group name format.'
 
-        return super(GroupModel, self).put_params(**params)
-
     @classmethod
     def delete_item(cls, item_id):
         students = db.session.query(StudentModel).filter_by(group_id=item_id).all()
@@ -156,18 +752,21 @@ class GroupModel(db.Model, DatabaseFunctionsMixin):
         return super(GroupModel, cls).delete_item(item_id)
 
     @classmethod
-    def post_item(cls, **params):
+    def check_post_params(cls, params):
         assert 'name' in params and is_group_name_fits(params['name']), 'wrong group name format.'
 
-        super(GroupModel, cls).post_item(**params)
+        super(GroupModel, cls).check_post_params(params)
 
 
 class CourseModel(db.Model, DatabaseFunctionsMixin):
     __tablename__ = 'courses'
 
     id = db.Column(db.Integer, primary_key=True)
-    name = db.Column(db.String)
+    name = db.Column(db.String, info={'trigram_indexed': True})
     description = db.Column(db.String)
+    version = db.Column(db.Integer, nullable=False, default=1, server_default='1')
+    relation_ids = ('students_ids', students_courses_relation.c.course_id, students_courses_relation.c.student_id)
+    name_columns = ('name',)
 
     def __init__(self, name, description):
         self.name = name
@@ -175,13 +774,44 @@ class CourseModel(db.Model, DatabaseFunctionsMixin):
 
     def get_params_dict(self):
         params_dict = super(CourseModel, self).get_params_dict()
-
-        students = db.session.query(students_courses_relation).filter_by(course_id=self.id)
-        params_dict['students_ids'] = [student.student_id for student in students]
+        params_dict['students_ids'] = [student.id for student in self.students]
         return params_dict
 
 
-if not db.engine.table_names() or GroupModel.query.count() == 0 or CourseModel.query.count() == 0:
-    from app.create_test_data import create_test_data
-    db.create_all()
-    create_test_data()
+def refresh_stats():
+    """recount all summary tables from the data in the current transaction."""
+    db.session.execute(select(func.refresh_stats()))
+
+
+class StatsModel(object):
+    """read-only summary table of the statistics."""
+    table = None
+    # names of the tables, changes of which update the summary table, so their
+    # versions are versions of the summary.
+    version_tables_names = ()
+
+    @classmethod
+    def get_version_tables_names(cls):
+        return list(cls.version_tables_names)
+
+    @classmethod
+    def get_all_items_params_dict(cls, versions=None):
+        """return list of rows dicts of the summary table ordered by primary key, read
+        from the replica."""
+        statement = select(cls.table).order_by(*cls.table.primary_key.columns)
+        return read_rows(cls.get_version_tables_names(), statement, versions)
+
+
+class GroupStatsModel(StatsModel):
+    table = group_stats
+    version_tables_names = (StudentModel.__tablename__,)
+
+
+class CourseStatsModel(StatsModel):
+    table = course_stats
+    version_tables_names = (students_courses_relation.name,)
+
+
+class CoursePairStatsModel(StatsModel):
+    table = course_pair_stats
+    version_tables_names = (students_courses_relation.name,)
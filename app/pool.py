@@ -0,0 +1,52 @@
+"""database connection pool with health metrics.
+
+`InstrumentedQueuePool` is used as `poolclass` of the SQLAlchemy engine, it counts
+connection checkouts, checkout timeouts and time of waiting for the connection, which
+are returned by `get_stats` together with current checked out and overflow connections
+of the pool of this process."""
+import threading
+import time
+
+from sqlalchemy.exc import TimeoutError
+from sqlalchemy.pool import QueuePool
+
+
+class InstrumentedQueuePool(QueuePool):
+    def __init__(self, *args, **kwargs):
+        super(InstrumentedQueuePool, self).__init__(*args, **kwargs)
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_time_total = 0.0
+        self.wait_time_max = 0.0
+        self._stats_lock = threading.Lock()
+
+    def connect(self):
+        start = time.perf_counter()
+        timed_out = False
+        try:
+            return super(InstrumentedQueuePool, self).connect()
+        except TimeoutError:
+            timed_out = True
+            raise
+        finally:
+            wait_time = time.perf_counter() - start
+            with self._stats_lock:
+                self.checkouts += 1
+                self.timeouts += timed_out
+                self.wait_time_total += wait_time
+                self.wait_time_max = max(self.wait_time_max, wait_time)
+
+    def get_stats(self):
+        """return dict of the pool state and counters."""
+        with self._stats_lock:
+            return {
+                'size': self.size(),
+                'checked_out': self.checkedout(),
+                'checked_in': self.checkedin(),
+                'overflow': max(self.overflow(), 0),
+                'max_overflow': self._max_overflow,
+                'checkouts': self.checkouts,
+                'timeouts': self.timeouts,
+                'wait_time_total': self.wait_time_total,
+                'wait_time_max': self.wait_time_max,
+            }
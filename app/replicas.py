@@ -0,0 +1,95 @@
+"""routing of read queries to the read replicas of the database.
+
+create `AppReplicaRouter` object at the `replica_router` variable, which keeps
+`ReplicaRouter` of every application in `app.extensions`, with engines of the replicas,
+and yields their connections in round-robin order. replica is skipped for
+`REPLICA_RETRY_INTERVAL` seconds after the failed connection attempt, or after the
+query, which failed on the established connection, pooled connections are tested on
+every checkout, so the queries are not sent to the stopped replica.
+
+configured by `init_app` from the app config:
+    REPLICA_DATABASE_URIS - list of database urls of the replicas, reads go to the
+        primary database if it is empty
+    REPLICA_RETRY_INTERVAL - float, seconds, the failed replica is skipped for"""
+import itertools
+import threading
+import time
+
+from sqlalchemy import create_engine
+from sqlalchemy.exc import DBAPIError
+
+from .extensions import AppExtension
+
+
+class Replica(object):
+    def __init__(self, engine):
+        self.engine = engine
+        self.down_until = 0.0
+        self.failures = 0
+
+    def is_down(self):
+        return self.down_until > time.monotonic()
+
+
+class ReplicaRouter(object):
+    def __init__(self, app=None):
+        self.replicas = []
+        self.retry_interval = 0.0
+        self._counter = itertools.count()
+        self._lock = threading.Lock()
+
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        for replica in self.replicas:
+            replica.engine.dispose()
+
+        engine_options = {**app.config.get('SQLALCHEMY_ENGINE_OPTIONS', {}), 'pool_pre_ping': True}
+        self.replicas = [Replica(create_engine(uri, **engine_options))
+                         for uri in app.config.get('REPLICA_DATABASE_URIS', [])]
+        self.retry_interval = app.config.get('REPLICA_RETRY_INTERVAL', 30)
+
+    def iter_connections(self):
+        """yield (replica, new connection) tuples of the healthy replicas in round-robin
+        order, starting from the next replica on every call."""
+        if not self.replicas:
+            return
+
+        start = next(self._counter)
+        for index in range(len(self.replicas)):
+            replica = self.replicas[(start + index) % len(self.replicas)]
+            if replica.is_down():
+                continue
+
+            try:
+                connection = replica.engine.connect()
+            except DBAPIError:
+                self.mark_down(replica)
+                continue
+
+            yield replica, connection
+
+    def mark_down(self, replica):
+        """skip the failed replica for `retry_interval` seconds."""
+        with self._lock:
+            replica.failures += 1
+            replica.down_until = time.monotonic() + self.retry_interval
+
+    def get_stats(self):
+        """return list of dicts of the replicas state."""
+        return [{'url': replica.engine.url.render_as_string(hide_password=True),
+                 'down': replica.is_down(),
+                 'failures': replica.failures,
+                 **replica.engine.pool.get_stats()} for replica in self.replicas]
+
+
+class AppReplicaRouter(AppExtension):
+    """`ReplicaRouter` of every application, configured by `init_app`."""
+    name = 'replica_router'
+
+    def create_state(self, app):
+        return ReplicaRouter(app)
+
+
+replica_router = AppReplicaRouter()
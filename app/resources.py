@@ -8,6 +8,7 @@ resources:
                 'first_name' - str, first name of student
                 'last_name' - str, last name of student
                 'group_id' - int, id of student group
+                'version' - int, version of the item, increased by every update
                 'courses_ids' - list of course IDs of this student
 
     CourseResource:
@@ -17,6 +18,7 @@ resources:
              json keys:
                 'name' - str, name of the course
                 'description' - str, description of the course
+                'version' - int, version of the item, increased by every update
                 'students_ids' - list of student IDs, joined to the course
 
     GroupResource:
@@ -24,11 +26,129 @@ resources:
             return data about group by group id from the 'groups' table in json format.
             json keys:
                 'name' - str, name of the group
-                'students_ids' - list of IDs of all students in this group"""
-from flask import request
+                'version' - int, version of the item, increased by every update
+                'students_ids' - list of IDs of all students in this group
+
+    GET methods of item and list resources return only the params, listed in the comma
+    separated `fields` query parameter, and `id`, if it is given, e.g.
+    `/students/?fields=first_name,last_name`. ids of the related items are selected only
+    if they are requested. unknown fields return error.
+
+    GET methods of item and list resources return `ETag` and `Last-Modified` headers,
+    made from version counters of the tables, the data depends on. if `If-None-Match`
+    header contains this ETag, or the ETag of the compressed response, or
+    `If-Modified-Since` is not earlier than the last modification, empty 304 response is
+    returned without building the data.
+
+    PUT method of item resources updates the item and increases its version by one
+    conditional UPDATE statement, so the item is not read before and not locked between
+    requests. ETag of the item GET ends with the version of the item, e.g.
+    `groups.3-students.5-version.2`. if `If-Match` header is given, the item is updated
+    only if it has the version of one of the entity tags: ETags of the item GET of the
+    same resource, of any encoding, or versions, e.g. `"2"`. otherwise, or if there is
+    no such item, 412 response is returned. `If-Match: *` updates any existing item.
+
+    StudentListResource, CourseListResource, GroupListResource:
+        get method:
+            return keyset page of items of the table in json format, ordered by id.
+            query parameters:
+                'limit' - int, return not more than `limit` items, capped by
+                    `LIST_PAGE_SIZE_MAX` config value, which is also the size of the
+                    page, if `limit` is not given
+                'after' - int, return only items with id greater than `after`
+                'name_prefix' - str, return only items, which name, or first or last
+                    name of students, starts with the value, case-insensitive
+                'search' - str, return only items, which name, or first or last name
+                    of students, contains the value, case-insensitive
+                'group_id' - int, return only students of the group
+                'course_id' - int, return only students, enrolled to the course
+            filters are executed by the database, use its indexes, and combine with
+            each other and with pages.
+            if comma separated `ids` parameter is given, e.g. `?ids=1,2,3`, the items
+            are returned by one query as {'items': list of items, 'missing_ids': list
+            of requested ids, which were not found} json object. not more than
+            `LIST_PAGE_SIZE_MAX` ids, can not be combined with pages.
+            if page is not the last one, the id to pass as `after` for the next page is
+            returned in the `X-Next-Cursor` header, and the next page url in the `Link`
+            header.
+            if `application/x-ndjson` is requested by the `Accept` header, all items
+            with id greater than `after` are streamed one json object per line, rows are
+            read from the database by `STREAM_BATCH_SIZE` rows.
+        post method:
+            create new item from the form data. if json array of objects is posted,
+            create all items in one transaction and return list of their ids, nothing is
+            created if any of items is incorrect. values of the items should be strings,
+            integers of id columns or nulls.
+
+    EnrollmentListResource:
+        post method:
+            enroll students to courses from the json array of
+            {'student_id': int, 'course_id': int} objects, already existing pairs are
+            ignored. return number of added pairs.
+        delete method:
+            unenroll students from courses from the json array in the same format.
+            return number of deleted pairs.
+
+    GroupStatsResource, CourseStatsResource, CoEnrollmentStatsResource:
+        get method:
+            return numbers of students of every group, of every course and of every pair
+            of courses, in which students are enrolled together, from the summary
+            tables, which are updated in the transaction of every change of students and
+            enrollments, so the request reads precomputed rows and does not aggregate.
+            json keys:
+                'updated_at' - str, ISO datetime of the last change of the data, the
+                    statistics are counted for, or null if there were no changes
+                'items' - list of objects, ordered by ids:
+                    'group_id'/'course_id' - int, id of the group/course
+                    'other_course_id' - int, id of the second course of the pair,
+                        greater than 'course_id'
+                    'students_count' - int, number of students
+            groups and courses without students are not listed. returned with ETag and
+            Last-Modified headers, and cached for the current ETag.
+
+    CacheStatsResource:
+        get method:
+            return hits, misses counters of this process and size of the item cache.
+
+    PoolStatsResource:
+        get method:
+            return state and counters of the database connection pool of this process:
+            size, checked out, checked in and overflow connections, number of checkouts,
+            timeouts, total and max seconds of waiting for the connection.
+            'replicas' key contains the same stats of the pools of the read replicas,
+            with their url and health.
+
+    MetricsResource:
+        get method:
+            return request latency, SQL statements count and database time histograms
+            by route and method of this process in the Prometheus text format.
+
+    GET method of item resources is served from the `item_cache`, evicted by all changes
+    of the item and related items, not cached item is selected with ids of the related
+    items by the same query as the ETag versions, in one round trip. cached items keep
+    the versions of the tables, they were read from, and are read again, if the tables
+    were changed since, e.g. by other worker processes. pages of list resources are
+    cached for the current ETag, so writes of other worker processes never return stale
+    pages.
+    the cache is shared by the worker processes if `SHARED_CACHE_PATH` is configured.
+    data of GET methods is read from the read replicas, if they are configured and
+    have all changes of the primary, by the tables versions, read for the ETag."""
+import re
+from urllib.parse import urlencode
+
+from flask import request, current_app, g, Response, stream_with_context
 from flask_restful import Resource
-from .application import api
-from app.models import StudentModel, GroupModel, CourseModel
+from flask_restful.utils import unpack
+from werkzeug.http import http_date
+from .application import api, db
+from .cache import item_cache
+from .compression import strip_etag_encoding
+from .metrics import request_metrics
+from .replicas import replica_router
+from .serialization import dumps
+from app.models import StudentModel, GroupModel, CourseModel, enroll_students, unenroll_students, \
+    get_tables_versions, GroupStatsModel, CourseStatsModel, CoursePairStatsModel, VersionConflictError, \
+    is_non_negative_integer
 
 
 def return_assertion_massages_decorator(f):
@@ -41,21 +161,256 @@ def return_assertion_massages_decorator(f):
     return warper
 
 
+def get_validators(model):
+    """return ETag and last modification datetime of the model data, made from version
+    counters of the tables, the model data depends on."""
+    return make_validators(get_tables_versions(model.get_version_tables_names()))
+
+
+def make_validators(versions):
+    """return ETag and last modification datetime from the dict of tables versions."""
+    etag = '-'.join(f'{table_name}.{version}' for table_name, (version, _) in versions.items())
+    modification_times = [updated_at for _, updated_at in versions.values() if updated_at]
+
+    return etag, max(modification_times) if modification_times else None
+
+
+def get_validators_headers(etag, last_modified):
+    """return dict of `ETag`, `Last-Modified` and `Vary` headers of GET response."""
+    headers = {'ETag': f'"{etag}"', 'Vary': 'Accept'}
+    if last_modified:
+        headers['Last-Modified'] = http_date(last_modified)
+    return headers
+
+
+def is_not_modified(etag, last_modified, if_none_match, if_modified_since):
+    """return True if the client has the data with `etag`, by the parsed
+    `If-None-Match` and `If-Modified-Since` request headers. entity tags of
+    `If-None-Match` are compared weakly and without the encoding, so ETags of
+    compressed responses match."""
+    if if_none_match:
+        return if_none_match.star_tag or any(strip_etag_encoding(tag) == etag
+                                             for tag in if_none_match.as_set(include_weak=True))
+    return bool(if_modified_since and last_modified
+                and last_modified.replace(microsecond=0) <= if_modified_since)
+
+
+def conditional_get_decorator(f):
+    """add `ETag` and `Last-Modified` headers to the response of resource get method,
+    return 304 response without calling it, if the client has the same data.
+    validators are made by the `get_validators` method of the resource, if it has one,
+    e.g. by the same query as the data, or from the tables versions, which are kept in
+    `g.tables_versions`, so the reads of the data do not read them again."""
+    def warper(self, *args, **kwargs):
+        get_resource_validators = getattr(self, 'get_validators', None)
+        g.tables_versions = None
+        if get_resource_validators:
+            etag, last_modified = get_resource_validators(*args, **kwargs)
+        else:
+            g.tables_versions = get_tables_versions(self.model.get_version_tables_names())
+            etag, last_modified = make_validators(g.tables_versions)
+        g.etag = etag
+        g.last_modified = last_modified
+        headers = get_validators_headers(etag, last_modified)
+        if is_not_modified(etag, last_modified, request.if_none_match, request.if_modified_since):
+            return Response(status=304, headers=headers)
+
+        response = f(self, *args, **kwargs)
+        if isinstance(response, Response):
+            response.headers.extend(headers)
+            return response
+
+        data, code, response_headers = unpack(response)
+        return data, code, {**headers, **response_headers}
+
+    return warper
+
+
+def get_page_params(args, page_size_max):
+    """return `after` and `limit` keyset page parameters from the dict of query string
+    parameters. `limit` is capped by `page_size_max`, and set to it if it is not
+    given, so the whole table is never returned by one page."""
+    after, limit = args.get('after'), args.get('limit')
+    if after is not None:
+        assert is_non_negative_integer(after), '`after` parameter should be a non-negative integer.'
+        after = int(after)
+
+    if limit is None:
+        return after, page_size_max
+
+    assert is_non_negative_integer(limit) and int(limit) > 0, '`limit` parameter should be a positive integer.'
+    return after, min(int(limit), page_size_max)
+
+
+def get_batch_ids(args, batch_size_max):
+    """return sorted list of unique ids of the batch GET from the comma separated `ids`
+    query string parameter, or None if it is not given."""
+    if args.get('ids') is None:
+        return None
+
+    ids = [value.strip() for value in args['ids'].split(',') if value.strip()]
+    assert all(is_non_negative_integer(value) for value in ids), \
+        '`ids` parameter should be comma separated non-negative integers.'
+    assert args.get('after') is None and args.get('limit') is None, \
+        '`ids` parameter can not be combined with `after` and `limit`.'
+    ids = sorted(set(int(value) for value in ids))
+    assert len(ids) <= batch_size_max, f'`ids` parameter should contain not more than {batch_size_max} ids.'
+    return ids
+
+
+def make_batch(items, ids):
+    """return dict of the found items and of the requested `ids`, which were not
+    found."""
+    found_ids = {item['id'] for item in items}
+    return {'items': items, 'missing_ids': [item_id for item_id in ids if item_id not in found_ids]}
+
+
+def get_item_load_fields(fields):
+    """return names of the params, selected for the item GET, which returns `fields`:
+    version of the item is always selected for its ETag."""
+    return fields if fields is None or 'version' in fields else fields + ['version']
+
+
+def make_item_validators(versions, params_dict):
+    """return ETag and last modification datetime of the item GET from the dict of
+    tables versions and params dict of the item, or None. ETag of the item ends with its
+    version, e.g. `groups.3-students.5-version.2`, so `If-Match` of the PUT method can
+    be checked by it."""
+    etag, last_modified = make_validators(versions)
+    if params_dict is not None:
+        etag = f'{etag}-version.{params_dict["version"]}'
+    return etag, last_modified
+
+
+def get_if_match_versions(if_match, tables_names):
+    """return list of the item versions from the parsed `If-Match` header, which
+    entity tags are ETags of the item GET, of any encoding, with the versions of the
+    `tables_names` tables, or versions, e.g. `"3"`. ETags of other resources, weak and
+    other entity tags never match."""
+    versions = []
+    for etag in if_match.as_set():
+        match = re.fullmatch(r'(?:(.*)-version\.)?([0-9]+)', strip_etag_encoding(etag))
+        if match and (match.group(1) is None or get_etag_tables_names(match.group(1)) == set(tables_names)):
+            versions.append(int(match.group(2)))
+    return versions
+
+
+def get_etag_tables_names(etag):
+    """return set of names of the tables of the ETag, made by `make_validators`."""
+    return {part.rpartition('.')[0] for part in etag.split('-')}
+
+
+def make_cached_item(params_dict, versions):
+    """return cached value of the item GET: params dict of the item with numbers of
+    the tables versions, it was read from, or None, if there is no such item."""
+    if params_dict is None:
+        return None
+    return {'params_dict': params_dict,
+            'versions': {table_name: version for table_name, (version, _) in versions.items()}}
+
+
+def is_cached_item_valid(cached_item, versions):
+    """return True if the cached item was read from the current `versions` of the
+    tables, so it is not changed since, e.g. by other worker processes."""
+    return cached_item['versions'] == {table_name: version for table_name, (version, _) in versions.items()}
+
+
+def get_page_cache_key(model, etag, args_items):
+    """return cache key of the page for the current versions of the tables, so writes
+    of other processes never return stale pages."""
+    return 'pages', model.__tablename__, etag, tuple(sorted(args_items))
+
+
+def make_page(items, limit, path, args):
+    """return list of page items and dict of page headers from `limit` + 1 items,
+    selected for the page, `path` and dict of query string parameters. the next page
+    url is made of the canonical path of the list resource with the trailing slash, so
+    the page, cached by `get_page_cache_key`, is the same for both paths of the ASGI
+    application."""
+    if len(items) <= limit:
+        return [items, {}]
+
+    items = items[:limit]
+    next_cursor = items[-1]['id']
+    next_page_args = dict(args)
+    next_page_args.update(after=next_cursor, limit=limit)
+    next_page_url = f'{path.rstrip("/")}/?{urlencode(next_page_args)}'
+
+    return [items, {'X-Next-Cursor': str(next_cursor), 'Link': f'<{next_page_url}>; rel="next"'}]
+
+
+def is_ndjson_requested(accept_mimetypes):
+    """return True if the parsed `Accept` header prefers newline delimited json."""
+    return accept_mimetypes.best_match(['application/json', 'application/x-ndjson']) == 'application/x-ndjson'
+
+
+def ndjson_response(items):
+    """return streamed response, that writes every item of `items` iterable as a json
+    line."""
+    lines = (dumps(item) + b'\n' for item in items)
+    return Response(stream_with_context(lines), mimetype='application/x-ndjson')
+
+
+def get_fields_dict(params_dict, fields):
+    """return dict of the `fields` of the params dict."""
+    return {name: value for name, value in params_dict.items() if name in fields}
+
+
 class ModelResource(Resource):
     model = None
 
+    @conditional_get_decorator
+    @return_assertion_massages_decorator
     def get(self, item_id):
-        item = self.model.get_item(item_id)
-        if not item:
-            return {}
-        return item.get_params_dict()
+        self.model.get_fields(request.args)
+        return g.params_dict or {}
+
+    def get_validators(self, item_id):
+        """return validators of the item GET and keep params dict of the item in
+        `g.params_dict`. the item, which is not cached, is selected by the same query as
+        the tables versions, so the request takes one round trip. the cached item is
+        returned only if it was read from the current versions of the tables."""
+        g.params_dict = None
+        try:
+            fields = self.model.get_fields(request.args)
+        except AssertionError:
+            # the error is returned by `get`
+            return get_validators(self.model)
+
+        loaded, current = {}, {}
+
+        def is_valid(cached_item):
+            current['versions'] = get_tables_versions(self.model.get_version_tables_names())
+            return is_cached_item_valid(cached_item, current['versions'])
+
+        def load():
+            loaded['params_dict'], loaded['versions'] = \
+                self.model.get_item_params_dict_with_versions(item_id, get_item_load_fields(fields),
+                                                              current.get('versions'))
+            # the cache keeps only full params dicts
+            return make_cached_item(loaded['params_dict'], loaded['versions']) if fields is None else None
+
+        cached_item = item_cache.get((self.model.__tablename__, item_id), load, is_valid)
+        if 'versions' in loaded:
+            params_dict, versions = loaded['params_dict'], loaded['versions']
+        else:
+            params_dict, versions = cached_item['params_dict'], current['versions']
+
+        g.params_dict = params_dict if fields is None or params_dict is None else get_fields_dict(params_dict, fields)
+        return make_item_validators(versions, params_dict)
 
     @return_assertion_massages_decorator
     def put(self, item_id):
-        item = self.model.get_item(item_id)
-        if not item:
-            return f'item with id {item_id} not exist in {self.model.__tablename__} model.'
-        return item.put_params(**request.form)
+        if not request.if_match:
+            return self.model.put_item(item_id, request.form)
+
+        versions = None
+        if not request.if_match.star_tag:
+            versions = get_if_match_versions(request.if_match, self.model.get_version_tables_names())
+        try:
+            return self.model.put_item(item_id, request.form, versions, conditional=True)
+        except VersionConflictError as e:
+            return 'error during operation: ' + str(e), 412
 
     @return_assertion_massages_decorator
     def delete(self, item_id):
@@ -65,11 +420,42 @@ class ModelResource(Resource):
 class ModelListResource(Resource):
     model = StudentModel
 
+    @conditional_get_decorator
+    @return_assertion_massages_decorator
     def get(self):
-        return self.model.get_all_items_params_dict()
+        after, limit = get_page_params(request.args, current_app.config['LIST_PAGE_SIZE_MAX'])
+        ids = get_batch_ids(request.args, current_app.config['LIST_PAGE_SIZE_MAX'])
+        filters = self.model.get_filters_clauses(request.args)
+        fields = self.model.get_fields(request.args)
+        if ids is not None:
+            cache_key = get_page_cache_key(self.model, g.etag, request.args.items(multi=True))
+            return item_cache.get(cache_key, lambda: self.get_batch(ids, filters, fields))
+
+        if is_ndjson_requested(request.accept_mimetypes):
+            batch_size = current_app.config['STREAM_BATCH_SIZE']
+            return ndjson_response(self.model.iter_all_items_params_dict(batch_size, after, filters, fields,
+                                                                         g.tables_versions))
+
+        cache_key = get_page_cache_key(self.model, g.etag, request.args.items(multi=True))
+        items, headers = item_cache.get(cache_key, lambda: self.get_page(after, limit, filters, fields))
+        return items, 200, headers
+
+    def get_page(self, after, limit, filters, fields):
+        """return list of page items and dict of page headers."""
+        items = self.model.get_all_items_params_dict(after, limit + 1, filters, fields, g.tables_versions)
+        return make_page(items, limit, request.path, request.args.to_dict())
+
+    def get_batch(self, ids, filters, fields):
+        """return dict of items with `ids` and of not found ids, selected by one query."""
+        items = self.model.get_all_items_params_dict(filters=[*filters, self.model.__table__.c.id.in_(ids)],
+                                                     fields=fields, versions=g.tables_versions)
+        return make_batch(items, ids)
 
     @return_assertion_massages_decorator
     def post(self):
+        items = request.get_json(silent=True)
+        if isinstance(items, list):
+            return self.model.post_items(items)
         return self.model.post_item(**request.form)
 
 
@@ -97,6 +483,57 @@ class CourseListResource(ModelListResource):
     model = CourseModel
 
 
+class EnrollmentListResource(Resource):
+
+    @return_assertion_massages_decorator
+    def post(self):
+        return enroll_students(request.get_json(silent=True))
+
+    @return_assertion_massages_decorator
+    def delete(self):
+        return unenroll_students(request.get_json(silent=True))
+
+
+class StatsResource(Resource):
+    model = None
+
+    @conditional_get_decorator
+    def get(self):
+        items = item_cache.get(('stats', self.model.table.name, g.etag),
+                               lambda: self.model.get_all_items_params_dict(g.tables_versions))
+        return {'updated_at': g.last_modified.isoformat() if g.last_modified else None, 'items': items}
+
+
+class GroupStatsResource(StatsResource):
+    model = GroupStatsModel
+
+
+class CourseStatsResource(StatsResource):
+    model = CourseStatsModel
+
+
+class CoEnrollmentStatsResource(StatsResource):
+    model = CoursePairStatsModel
+
+
+class CacheStatsResource(Resource):
+
+    def get(self):
+        return item_cache.get_stats()
+
+
+class PoolStatsResource(Resource):
+
+    def get(self):
+        return {**db.engine.pool.get_stats(), 'replicas': replica_router.get_stats()}
+
+
+class MetricsResource(Resource):
+
+    def get(self):
+        return Response(request_metrics.render(), mimetype='text/plain; version=0.0.4')
+
+
 api.add_resource(StudentResource, '/students/<int:item_id>/', '/students/<int:item_id>')
 api.add_resource(CourseResource, '/courses/<int:item_id>/', '/courses/<int:item_id>')
 api.add_resource(GroupResource, '/groups/<int:item_id>/', '/groups/<int:item_id>')
@@ -104,3 +541,10 @@ api.add_resource(GroupResource, '/groups/<int:item_id>/', '/groups/<int:item_id>
 api.add_resource(StudentListResource, '/students/', '/students')
 api.add_resource(CourseListResource, '/courses/', '/courses')
 api.add_resource(GroupListResource, '/groups/', '/groups')
+api.add_resource(EnrollmentListResource, '/enrollments/', '/enrollments')
+api.add_resource(GroupStatsResource, '/stats/groups/', '/stats/groups')
+api.add_resource(CourseStatsResource, '/stats/courses/', '/stats/courses')
+api.add_resource(CoEnrollmentStatsResource, '/stats/co-enrollments/', '/stats/co-enrollments')
+api.add_resource(CacheStatsResource, '/cache-stats/', '/cache-stats')
+api.add_resource(PoolStatsResource, '/pool-stats/', '/pool-stats')
+api.add_resource(MetricsResource, '/metrics')
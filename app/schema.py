@@ -0,0 +1,227 @@
+"""schema migrations and indexes checks.
+
+migrations are SQL files `NNNN_name.sql` of the `sql/migrations` directory, applied
+in order of their version numbers `NNNN` by `apply_migrations`, e.g. by the command:
+    FLASK_APP="app.application:create_app()" flask migrate
+applied versions are recorded in the `schema_migrations` table, so every migration is
+applied to the database once. the file is executed in one transaction, or statement by
+statement, if the first line of the file is `-- migrate: no-transaction`, e.g. for
+`CREATE INDEX CONCURRENTLY`, which does not block writes to the table, but can not be
+executed in the transaction. such statements should be idempotent, because the
+migration is applied again, if it failed or was interrupted, and can not contain `;`
+inside, e.g. in function bodies. `IF NOT EXISTS` is not enough for the indexes: the
+failed concurrent build leaves the invalid index, which it would skip, so invalid
+indexes of the `CREATE INDEX CONCURRENTLY IF NOT EXISTS` statements of the migration
+are dropped before it is applied, and the data, which fails the build, e.g. duplicates
+of the unique index, should be fixed by the statements before it.
+
+`filters_check` object checks SQL statements, executed by all engines, e.g. by the
+session and by the core selects of the read queries on the replicas, if
+`CHECK_INDEXED_FILTERS` is configured, e.g. by tests, and raises
+`UnindexedFilterError`, if any WHERE clause of the statement, its CTEs and subqueries
+compares column to the value, and none of the columns of its table, compared by the
+clause, is the leading column of any index, primary key or unique constraint, or has
+the trigram index in the database, so the query scans the whole table."""
+import os
+import re
+
+from flask import current_app, has_app_context
+from sqlalchemy import event, insert, select, text, Column, PrimaryKeyConstraint, Table, UniqueConstraint
+from sqlalchemy.engine import Engine
+from sqlalchemy.sql import visitors
+from sqlalchemy.sql.dml import UpdateBase
+from sqlalchemy.sql.elements import BinaryExpression, ClauseElement, Tuple
+from sqlalchemy.sql.selectable import Select
+
+from .models import schema_migrations
+
+MIGRATIONS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'sql', 'migrations')
+NO_TRANSACTION_HEADER = '-- migrate: no-transaction'
+CONCURRENT_INDEX_PATTERN = re.compile(
+    r'(?:--[^\n]*\n\s*)*CREATE\s+(?:UNIQUE\s+)?INDEX\s+CONCURRENTLY\s+IF\s+NOT\s+EXISTS\s+(\w+)', re.IGNORECASE)
+
+
+def get_migrations(migrations_path=MIGRATIONS_PATH):
+    """return list of (version, name, path) tuples of the migrations files, ordered by
+    version."""
+    migrations = []
+    for file_name in os.listdir(migrations_path):
+        match = re.fullmatch(r'(\d+)_(\w+)\.sql', file_name)
+        if match:
+            migrations.append((int(match.group(1)), match.group(2), os.path.join(migrations_path, file_name)))
+    migrations.sort()
+    versions = [version for version, _, _ in migrations]
+    assert len(versions) == len(set(versions)), 'migrations versions are not unique'
+    return migrations
+
+
+def get_statements(sql):
+    """return list of SQL statements of the no-transaction migration file, without
+    comments-only parts."""
+    statements = []
+    for statement in sql.split(';'):
+        lines = [line for line in statement.strip().splitlines() if not line.lstrip().startswith('--')]
+        if lines:
+            statements.append(statement.strip())
+    return statements
+
+
+def get_concurrent_indexes_names(statements):
+    """return list of names of the indexes, created by `CREATE INDEX CONCURRENTLY IF
+    NOT EXISTS` statements."""
+    return [match.group(1) for match in (CONCURRENT_INDEX_PATTERN.match(statement) for statement in statements)
+            if match]
+
+
+def drop_invalid_indexes(connection, indexes_names):
+    """drop indexes of the `indexes_names`, which are left invalid by the failed or
+    interrupted concurrent builds."""
+    statement = text('SELECT indexrelid::regclass::text FROM unnest(CAST(:indexes_names AS text[])) AS name '
+                     'JOIN pg_index ON indexrelid = to_regclass(name) WHERE NOT indisvalid')
+    # names of the regclass are quoted, if it is needed
+    for index_name in connection.execute(statement, {'indexes_names': indexes_names}).scalars().all():
+        connection.exec_driver_sql(f'DROP INDEX CONCURRENTLY IF EXISTS {index_name}')
+
+
+def apply_migrations(engine, migrations_path=MIGRATIONS_PATH):
+    """apply not applied migrations to the database of the `engine`, return list of
+    names of applied migrations. invalid indexes of the no-transaction migration are
+    dropped before it is applied, so they are built again."""
+    schema_migrations.create(engine, checkfirst=True)
+    with engine.connect() as connection:
+        applied_versions = set(connection.execute(select(schema_migrations.c.version)).scalars())
+
+    applied_names = []
+    for version, name, path in get_migrations(migrations_path):
+        if version in applied_versions:
+            continue
+        with open(path) as file:
+            sql = file.read()
+
+        if sql.startswith(NO_TRANSACTION_HEADER):
+            connection = engine.connect().execution_options(isolation_level='AUTOCOMMIT')
+            statements = get_statements(sql)
+            drop_invalid_indexes(connection, get_concurrent_indexes_names(statements))
+        else:
+            connection = engine.connect()
+            statements = [sql]
+        with connection, connection.begin():
+            for statement in statements:
+                connection.exec_driver_sql(statement)
+            connection.execute(insert(schema_migrations).values(version=version, name=name))
+        applied_names.append(f'{version:04}_{name}')
+    return applied_names
+
+
+class UnindexedFilterError(AssertionError):
+    pass
+
+
+def get_indexed_columns(table):
+    """return set of names of the leading columns of the indexes, primary key and unique
+    constraints of the table. foreign keys are not indexed by PostgreSQL."""
+    columns_lists = [index.columns for index in table.indexes]
+    columns_lists += [constraint.columns for constraint in table.constraints
+                      if isinstance(constraint, (PrimaryKeyConstraint, UniqueConstraint))]
+    return {list(columns)[0].name for columns in columns_lists if len(columns)}
+
+
+def has_trigram_index(connection, column):
+    """return True if the valid trigram GIN index of the column exists in the database
+    of the connection. indexes of the columns with `trigram_indexed` info are created by
+    `sql/search.sql` only if the `pg_trgm` extension is available."""
+    statement = text("""
+        SELECT EXISTS (
+            SELECT 1 FROM pg_index
+            JOIN pg_attribute ON attrelid = indrelid AND attnum = indkey[0]
+            JOIN pg_opclass ON pg_opclass.oid = indclass[0]
+            WHERE indrelid = to_regclass(:table_name) AND attname = :column_name
+                AND opcname = 'gin_trgm_ops' AND indisvalid)""")
+    return connection.execute(statement, {'table_name': column.table.name, 'column_name': column.name}).scalar()
+
+
+def is_indexed(connection, column):
+    return column.name in get_indexed_columns(column.table) \
+        or column.info.get('trigram_indexed', False) and has_trigram_index(connection, column)
+
+
+def get_filter_column(expression):
+    """return table column, compared by the binary expression to the value, or None."""
+    if isinstance(expression, Tuple):
+        expression = expression.clauses[0]
+    if isinstance(expression, Column) and isinstance(expression.table, Table):
+        return expression
+    return None
+
+
+def iterate_where_clauses(statement):
+    """yield WHERE clauses of the statement, of its CTEs and of all subqueries."""
+    for element in visitors.iterate(statement):
+        whereclause = getattr(element, 'whereclause', None)
+        if isinstance(element, (Select, UpdateBase)) and whereclause is not None:
+            yield whereclause
+
+
+def iterate_binary_expressions(clause):
+    """yield binary expressions of the clause, but not of the subqueries in it, which
+    WHERE clauses are checked separately."""
+    elements = [clause]
+    while elements:
+        element = elements.pop()
+        if isinstance(element, BinaryExpression):
+            yield element
+        if not isinstance(element, (Select, UpdateBase)):
+            elements.extend(element.get_children())
+
+
+def get_unindexed_filter_columns(statement, connection):
+    """return list of `table.column` names of the columns, compared to values by any
+    WHERE clause of the statement, including CTEs and subqueries, if none of the
+    columns of their table, compared by this clause to values or to other columns, e.g.
+    `id` of the joined CTE row, is a leading column of any index, so the query scans
+    the whole table."""
+    if not isinstance(statement, ClauseElement):
+        return []
+
+    columns = []
+    for whereclause in iterate_where_clauses(statement):
+        filter_columns, compared_columns = [], []
+        for element in iterate_binary_expressions(whereclause):
+            left, right = get_filter_column(element.left), get_filter_column(element.right)
+            compared_columns.extend(column for column in (left, right) if column is not None)
+            # joins of two columns are not filters by values
+            column = left if right is None else right if left is None else None
+            if column is not None:
+                filter_columns.append(column)
+
+        for column in filter_columns:
+            name = f'{column.table.name}.{column.name}'
+            if name not in columns and not any(is_indexed(connection, compared_column)
+                                               for compared_column in compared_columns
+                                               if compared_column.table is column.table):
+                columns.append(name)
+    return columns
+
+
+class FiltersCheck(object):
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        if not event.contains(Engine, 'before_execute', check_indexed_filters):
+            event.listen(Engine, 'before_execute', check_indexed_filters)
+        app.config.setdefault('CHECK_INDEXED_FILTERS', False)
+
+
+def check_indexed_filters(connection, statement, *args):
+    """raise `UnindexedFilterError`, if the statement filters by the unindexed columns
+    and the check is configured."""
+    if not has_app_context() or not current_app.config.get('CHECK_INDEXED_FILTERS'):
+        return
+    columns = get_unindexed_filter_columns(statement, connection)
+    if columns:
+        raise UnindexedFilterError('filter by columns without index: {}\n{}'.format(', '.join(columns), statement))
+
+
+filters_check = FiltersCheck()
@@ -2,7 +2,8 @@ CREATE SEQUENCE groups_id_seq;
 CREATE TABLE public.groups
 (
     id integer PRIMARY KEY NOT NULL DEFAULT nextval('groups_id_seq'),
-    name character(5) NOT NULL
+    name character(5) NOT NULL,
+    version integer NOT NULL DEFAULT 1
 );
 ALTER TABLE public.groups
     OWNER to test_user;
@@ -15,6 +16,7 @@ CREATE TABLE public.students
     group_id integer NOT NULL ,
 	first_name  varchar(100) NOT NULL,
 	last_name varchar(100) NOT NULL,
+	version integer NOT NULL DEFAULT 1,
 	CONSTRAINT students_group_id_fkey FOREIGN KEY (group_id)
         REFERENCES public.groups (id) MATCH SIMPLE
         ON UPDATE NO ACTION
@@ -22,6 +24,7 @@ CREATE TABLE public.students
 );
 ALTER TABLE public.students
     OWNER to test_user;
+CREATE INDEX students_group_id_idx ON public.students (group_id);
 
 
 CREATE SEQUENCE courses_id_seq;
@@ -29,7 +32,8 @@ CREATE TABLE public.courses
 (
     id integer PRIMARY KEY NOT NULL DEFAULT nextval('courses_id_seq'),
 	name varchar(100) NOT NULL,
-	description text NOT NULL
+	description text NOT NULL,
+	version integer NOT NULL DEFAULT 1
 );
 ALTER TABLE public.courses
     OWNER to test_user;
@@ -41,6 +45,7 @@ CREATE TABLE public.students_courses_relation
     id integer PRIMARY KEY NOT NULL DEFAULT nextval('students_courses_relation_id_seq'),
 	student_id integer NOT NULL,
 	course_id integer NOT NULL,
+	CONSTRAINT students_courses_relation_student_id_course_id_key UNIQUE (student_id, course_id),
 	CONSTRAINT students_courses_relation_course_id_fkey FOREIGN KEY (course_id)
         REFERENCES public.courses (id) MATCH SIMPLE
         ON UPDATE NO ACTION
@@ -51,4 +56,60 @@ CREATE TABLE public.students_courses_relation
         ON DELETE NO ACTION
 );
 ALTER TABLE public.students_courses_relation
-    OWNER to test_user;
\ No newline at end of file
+    OWNER to test_user;
+CREATE INDEX students_courses_relation_course_id_idx ON public.students_courses_relation (course_id);
+
+
+CREATE TABLE public.table_versions
+(
+    table_name varchar(100) PRIMARY KEY NOT NULL,
+    version bigint NOT NULL,
+    updated_at timestamp with time zone NOT NULL
+);
+ALTER TABLE public.table_versions
+    OWNER to test_user;
+
+
+CREATE TABLE public.schema_migrations
+(
+    version integer PRIMARY KEY NOT NULL,
+    name varchar(100) NOT NULL,
+    applied_at timestamp with time zone NOT NULL DEFAULT now()
+);
+ALTER TABLE public.schema_migrations
+    OWNER to test_user;
+
+CREATE TABLE public.group_stats
+(
+    group_id integer PRIMARY KEY NOT NULL,
+    students_count integer NOT NULL
+);
+ALTER TABLE public.group_stats
+    OWNER to test_user;
+
+
+CREATE TABLE public.course_stats
+(
+    course_id integer PRIMARY KEY NOT NULL,
+    students_count integer NOT NULL
+);
+ALTER TABLE public.course_stats
+    OWNER to test_user;
+
+
+CREATE TABLE public.course_pair_stats
+(
+    course_id integer NOT NULL,
+    other_course_id integer NOT NULL,
+    students_count integer NOT NULL,
+    PRIMARY KEY (course_id, other_course_id)
+);
+ALTER TABLE public.course_pair_stats
+    OWNER to test_user;
+
+
+-- triggers, which update the summary tables.
+\ir stats.sql
+
+-- trigram indexes of the names, if `pg_trgm` extension is available.
+\ir search.sql
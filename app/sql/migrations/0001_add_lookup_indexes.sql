@@ -0,0 +1,18 @@
+-- migrate: no-transaction
+-- indexes of the lookups of students by group and of enrollments by course and by
+-- student. built concurrently, so writes to the tables are not blocked.
+CREATE INDEX CONCURRENTLY IF NOT EXISTS students_group_id_idx
+    ON public.students (group_id);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS students_courses_relation_course_id_idx
+    ON public.students_courses_relation (course_id);
+
+-- duplicate enrollments, possible in the tables without the unique constraint, are
+-- deleted, so the unique index can be built.
+DELETE FROM public.students_courses_relation AS relation
+    USING public.students_courses_relation AS other
+    WHERE relation.student_id = other.student_id AND relation.course_id = other.course_id
+        AND relation.ctid > other.ctid;
+
+CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS students_courses_relation_student_id_course_id_key
+    ON public.students_courses_relation (student_id, course_id);
@@ -0,0 +1,173 @@
+-- summary tables of the statistics endpoints, with the triggers, that update them, and
+-- their counters of the existing data.
+CREATE TABLE IF NOT EXISTS public.group_stats
+(
+    group_id integer PRIMARY KEY NOT NULL,
+    students_count integer NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS public.course_stats
+(
+    course_id integer PRIMARY KEY NOT NULL,
+    students_count integer NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS public.course_pair_stats
+(
+    course_id integer NOT NULL,
+    other_course_id integer NOT NULL,
+    students_count integer NOT NULL,
+    PRIMARY KEY (course_id, other_course_id)
+);
+
+-- functions and triggers, which keep the summary tables `group_stats`, `course_stats`
+-- and `course_pair_stats` up to date. every statement, that inserts, updates or deletes
+-- students or enrollments, including COPY, adds the changes of its rows to the counters
+-- in the same transaction, so the summaries are always consistent with the data.
+-- counters, which become 0, are deleted. can be executed again to replace them.
+
+CREATE OR REPLACE FUNCTION add_group_stats(groups_ids integer[], delta integer) RETURNS void AS $$
+    INSERT INTO group_stats AS stats (group_id, students_count)
+    SELECT group_id, count(*) * delta FROM unnest(groups_ids) AS changes (group_id)
+    WHERE group_id IS NOT NULL
+    GROUP BY group_id
+    ORDER BY group_id
+    ON CONFLICT (group_id) DO UPDATE SET students_count = stats.students_count + excluded.students_count;
+
+    DELETE FROM group_stats WHERE group_id = ANY(groups_ids) AND students_count = 0;
+$$ LANGUAGE sql;
+
+CREATE OR REPLACE FUNCTION add_course_stats(courses_ids integer[], delta integer) RETURNS void AS $$
+    INSERT INTO course_stats AS stats (course_id, students_count)
+    SELECT course_id, count(*) * delta FROM unnest(courses_ids) AS changes (course_id)
+    GROUP BY course_id
+    ORDER BY course_id
+    ON CONFLICT (course_id) DO UPDATE SET students_count = stats.students_count + excluded.students_count;
+
+    DELETE FROM course_stats WHERE course_id = ANY(courses_ids) AND students_count = 0;
+$$ LANGUAGE sql;
+
+-- pairs are kept once, with `course_id` less than `other_course_id`.
+CREATE OR REPLACE FUNCTION add_course_pair_stats(courses_ids integer[], others_ids integer[], delta integer)
+RETURNS void AS $$
+    INSERT INTO course_pair_stats AS stats (course_id, other_course_id, students_count)
+    SELECT course_id, other_course_id, count(*) * delta
+    FROM unnest(courses_ids, others_ids) AS changes (course_id, other_course_id)
+    GROUP BY course_id, other_course_id
+    ORDER BY course_id, other_course_id
+    ON CONFLICT (course_id, other_course_id)
+        DO UPDATE SET students_count = stats.students_count + excluded.students_count;
+
+    DELETE FROM course_pair_stats
+    WHERE (course_id, other_course_id) IN (SELECT * FROM unnest(courses_ids, others_ids))
+        AND students_count = 0;
+$$ LANGUAGE sql;
+
+CREATE OR REPLACE FUNCTION update_students_stats() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        PERFORM add_group_stats(ARRAY(SELECT group_id FROM new_rows), 1);
+    ELSIF TG_OP = 'DELETE' THEN
+        PERFORM add_group_stats(ARRAY(SELECT group_id FROM old_rows), -1);
+    ELSE
+        -- only students, moved to another group, change the counters
+        PERFORM add_group_stats(ARRAY(
+            SELECT old_rows.group_id FROM old_rows JOIN new_rows ON new_rows.id = old_rows.id
+            WHERE new_rows.group_id IS DISTINCT FROM old_rows.group_id), -1);
+        PERFORM add_group_stats(ARRAY(
+            SELECT new_rows.group_id FROM old_rows JOIN new_rows ON new_rows.id = old_rows.id
+            WHERE new_rows.group_id IS DISTINCT FROM old_rows.group_id), 1);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- every pair of courses of the student, of which at least one is inserted or deleted by
+-- the statement, is counted once: with the course, that is not changed, or from the
+-- lesser course, if both are changed.
+CREATE OR REPLACE FUNCTION update_enrollments_stats() RETURNS trigger AS $$
+DECLARE
+    courses_ids integer[];
+    others_ids integer[];
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        PERFORM add_course_stats(ARRAY(SELECT course_id FROM new_rows), 1);
+
+        SELECT array_agg(least(changed.course_id, other.course_id)),
+               array_agg(greatest(changed.course_id, other.course_id))
+        INTO courses_ids, others_ids
+        FROM new_rows AS changed
+        JOIN students_courses_relation AS other
+            ON other.student_id = changed.student_id AND other.course_id <> changed.course_id
+        WHERE changed.course_id < other.course_id OR NOT EXISTS (
+            SELECT 1 FROM new_rows
+            WHERE new_rows.student_id = other.student_id AND new_rows.course_id = other.course_id);
+
+        PERFORM add_course_pair_stats(courses_ids, others_ids, 1);
+    ELSE
+        PERFORM add_course_stats(ARRAY(SELECT course_id FROM old_rows), -1);
+
+        SELECT array_agg(least(changed.course_id, other.course_id)),
+               array_agg(greatest(changed.course_id, other.course_id))
+        INTO courses_ids, others_ids
+        FROM old_rows AS changed
+        JOIN (SELECT student_id, course_id FROM students_courses_relation
+              UNION ALL
+              SELECT student_id, course_id FROM old_rows) AS other
+            ON other.student_id = changed.student_id AND other.course_id <> changed.course_id
+        WHERE changed.course_id < other.course_id OR NOT EXISTS (
+            SELECT 1 FROM old_rows
+            WHERE old_rows.student_id = other.student_id AND old_rows.course_id = other.course_id);
+
+        PERFORM add_course_pair_stats(courses_ids, others_ids, -1);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- recount all summaries from the data, e.g. after they were created for existing data.
+CREATE OR REPLACE FUNCTION refresh_stats() RETURNS void AS $$
+    DELETE FROM group_stats;
+    INSERT INTO group_stats (group_id, students_count)
+    SELECT group_id, count(*) FROM students WHERE group_id IS NOT NULL GROUP BY group_id;
+
+    DELETE FROM course_stats;
+    INSERT INTO course_stats (course_id, students_count)
+    SELECT course_id, count(*) FROM students_courses_relation GROUP BY course_id;
+
+    DELETE FROM course_pair_stats;
+    INSERT INTO course_pair_stats (course_id, other_course_id, students_count)
+    SELECT relation.course_id, other.course_id, count(*)
+    FROM students_courses_relation AS relation
+    JOIN students_courses_relation AS other
+        ON other.student_id = relation.student_id AND other.course_id > relation.course_id
+    GROUP BY relation.course_id, other.course_id;
+$$ LANGUAGE sql;
+
+DROP TRIGGER IF EXISTS students_stats_insert ON students;
+CREATE TRIGGER students_stats_insert AFTER INSERT ON students
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION update_students_stats();
+
+DROP TRIGGER IF EXISTS students_stats_update ON students;
+CREATE TRIGGER students_stats_update AFTER UPDATE ON students
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION update_students_stats();
+
+DROP TRIGGER IF EXISTS students_stats_delete ON students;
+CREATE TRIGGER students_stats_delete AFTER DELETE ON students
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION update_students_stats();
+
+-- enrollments are only inserted and deleted.
+DROP TRIGGER IF EXISTS enrollments_stats_insert ON students_courses_relation;
+CREATE TRIGGER enrollments_stats_insert AFTER INSERT ON students_courses_relation
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION update_enrollments_stats();
+
+DROP TRIGGER IF EXISTS enrollments_stats_delete ON students_courses_relation;
+CREATE TRIGGER enrollments_stats_delete AFTER DELETE ON students_courses_relation
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION update_enrollments_stats();
+
+SELECT refresh_stats();
@@ -0,0 +1,15 @@
+-- the indexes are built in the transaction, because they are created conditionally.
+-- trigram indexes of the names, used by the case-insensitive prefix and substring
+-- filters of the list resources. they are created only if the `pg_trgm` extension is
+-- available, otherwise the filters scan the tables. can be executed again.
+DO $$
+BEGIN
+    IF EXISTS (SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm') THEN
+        CREATE EXTENSION IF NOT EXISTS pg_trgm;
+        CREATE INDEX IF NOT EXISTS students_first_name_trgm_idx ON students USING gin (first_name gin_trgm_ops);
+        CREATE INDEX IF NOT EXISTS students_last_name_trgm_idx ON students USING gin (last_name gin_trgm_ops);
+        CREATE INDEX IF NOT EXISTS groups_name_trgm_idx ON groups USING gin (name gin_trgm_ops);
+        CREATE INDEX IF NOT EXISTS courses_name_trgm_idx ON courses USING gin (name gin_trgm_ops);
+    END IF;
+END
+$$;
@@ -0,0 +1,6 @@
+-- versions of the items, increased by every update of the item and compared with the
+-- `If-Match` header of the conditional PUT requests. existing items get version 1. can
+-- be executed again.
+ALTER TABLE public.students ADD COLUMN IF NOT EXISTS version integer NOT NULL DEFAULT 1;
+ALTER TABLE public.groups ADD COLUMN IF NOT EXISTS version integer NOT NULL DEFAULT 1;
+ALTER TABLE public.courses ADD COLUMN IF NOT EXISTS version integer NOT NULL DEFAULT 1;
@@ -0,0 +1,280 @@
+"""HTTP benchmark of the api routes at several dataset sizes.
+
+for every scale the database is filled by `create_test_data` with `scale` students,
+then every route of the resources, reads first and writes after them, is requested
+`--requests` times by `--concurrency` client threads with keep-alive connections.
+throughput, mean and p50/p95/p99 latency of every route are saved in the json file, so
+runs can be compared, e.g.:
+    python -m benchmarks.http_benchmark --scales 1000 100000 1000000 --output results.json
+
+by default the database is a new `testing.postgresql` instance, and the app is served
+by the threaded werkzeug server of this process. `--database-uri` and `--url` run the
+benchmark against the running server, e.g. of the ASGI mode, and its database, which
+is seeded by this process, so `--url` requires `--database-uri`."""
+import argparse
+import itertools
+import json
+import math
+import os
+import platform
+import random
+import socket
+import subprocess
+import threading
+import time
+from datetime import datetime, timezone
+from http.client import HTTPConnection
+from urllib.parse import urlencode, urlsplit
+
+from werkzeug.serving import make_server, WSGIRequestHandler
+
+SCALES = (1000, 100000, 1000000)
+
+
+def get_sizes(scale):
+    """return dict of numbers of groups, students and courses of the dataset."""
+    return {'groups': max(scale // 100, 1), 'students': scale, 'courses': max(scale // 1000, 10)}
+
+
+def form(params):
+    return urlencode(params), 'application/x-www-form-urlencoded'
+
+
+def json_body(data):
+    return json.dumps(data), 'application/json'
+
+
+def random_pairs(rng, sizes, count=10):
+    return [{'student_id': rng.randint(1, sizes['students']), 'course_id': rng.randint(1, sizes['courses'])}
+            for _ in range(count)]
+
+
+# (name, method, function of random generator, request index and dataset sizes, which
+# returns path, body and content type of the request). writes go after all reads,
+# deletes are the last and remove items from the end of the students table.
+ROUTES = [
+    ('student', 'GET', lambda rng, index, sizes: (f'/students/{rng.randint(1, sizes["students"])}/', None, None)),
+    ('group', 'GET', lambda rng, index, sizes: (f'/groups/{rng.randint(1, sizes["groups"])}/', None, None)),
+    ('course', 'GET', lambda rng, index, sizes: (f'/courses/{rng.randint(1, sizes["courses"])}/', None, None)),
+    ('students_page', 'GET',
+     lambda rng, index, sizes: (f'/students/?limit=100&after={rng.randint(0, sizes["students"])}', None, None)),
+    ('students_page_names', 'GET', lambda rng, index, sizes: (
+        f'/students/?limit=100&fields=first_name,last_name&after={rng.randint(0, sizes["students"])}', None, None)),
+    ('groups_page', 'GET',
+     lambda rng, index, sizes: (f'/groups/?limit=100&after={rng.randint(0, sizes["groups"])}', None, None)),
+    ('courses_list', 'GET', lambda rng, index, sizes: ('/courses/', None, None)),
+    ('students_of_group', 'GET',
+     lambda rng, index, sizes: (f'/students/?group_id={rng.randint(1, sizes["groups"])}&limit=100', None, None)),
+    ('students_search', 'GET', lambda rng, index, sizes: (
+        f'/students/?search={rng.choice(("lia", "son", "emma", "ez"))}&limit=100', None, None)),
+    ('students_batch', 'GET', lambda rng, index, sizes: (
+        '/students/?ids={}'.format(','.join(str(rng.randint(1, sizes['students'])) for _ in range(30))), None, None)),
+    ('group_stats', 'GET', lambda rng, index, sizes: ('/stats/groups/', None, None)),
+    ('co_enrollment_stats', 'GET', lambda rng, index, sizes: ('/stats/co-enrollments/', None, None)),
+    ('cache_stats', 'GET', lambda rng, index, sizes: ('/cache-stats/', None, None)),
+    ('pool_stats', 'GET', lambda rng, index, sizes: ('/pool-stats/', None, None)),
+    ('metrics', 'GET', lambda rng, index, sizes: ('/metrics', None, None)),
+    ('post_student', 'POST', lambda rng, index, sizes: ('/students/', *form(
+        {'first_name': 'Liam', 'last_name': 'Smith', 'group_id': rng.randint(1, sizes['groups'])}))),
+    ('post_courses_bulk', 'POST', lambda rng, index, sizes: (
+        '/courses/', *json_body([{'name': f'course_{index}_{num}', 'description': 'benchmark'} for num in range(10)]))),
+    ('put_student', 'PUT', lambda rng, index, sizes: (
+        f'/students/{rng.randint(1, sizes["students"])}/', *form({'first_name': f'first_name_{index}'}))),
+    ('put_group', 'PUT', lambda rng, index, sizes: (
+        f'/groups/{rng.randint(1, sizes["groups"])}/', *form({'name': f'bb-{index % 100:02}'}))),
+    ('enroll', 'POST', lambda rng, index, sizes: ('/enrollments/', *json_body(random_pairs(rng, sizes)))),
+    ('unenroll', 'DELETE', lambda rng, index, sizes: ('/enrollments/', *json_body(random_pairs(rng, sizes)))),
+    ('delete_student', 'DELETE', lambda rng, index, sizes: (f'/students/{sizes["students"] - index}/', None, None)),
+]
+
+
+class QuietRequestHandler(WSGIRequestHandler):
+    """request handler with keep-alive connections and without request logs."""
+    protocol_version = 'HTTP/1.1'
+
+    def setup(self):
+        super(QuietRequestHandler, self).setup()
+        # headers and body are sent by separate writes, which should not wait for the
+        # delayed ack of the client.
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def log_request(self, *args, **kwargs):
+        pass
+
+
+class NoDelayHTTPConnection(HTTPConnection):
+
+    def connect(self):
+        super(NoDelayHTTPConnection, self).connect()
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+
+def start_server(app):
+    """serve the `app` by threaded werkzeug server in the background thread, return the
+    server and its url."""
+    server = make_server('localhost', 0, app, threaded=True, request_handler=QuietRequestHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f'http://localhost:{server.port}'
+
+
+def get_percentile(sorted_values, percent):
+    """return nearest-rank percentile of the sorted list."""
+    return sorted_values[max(math.ceil(percent / 100 * len(sorted_values)) - 1, 0)]
+
+
+def run_route(url, route, sizes, requests_count, concurrency, seed):
+    """request the route `requests_count` times by `concurrency` threads, return dict of
+    the route results."""
+    name, method, make_request = route
+    indexes = itertools.count()
+    latencies, errors = [], []
+    split_url = urlsplit(url)
+
+    def worker(thread_number):
+        rng = random.Random(f'{seed}-{name}-{thread_number}')
+        connection = NoDelayHTTPConnection(split_url.hostname, split_url.port)
+        thread_latencies, thread_errors = [], 0
+        while True:
+            index = next(indexes)
+            if index >= requests_count:
+                break
+            path, body, content_type = make_request(rng, index, sizes)
+            headers = {'Content-Type': content_type} if content_type else {}
+            start = time.perf_counter()
+            try:
+                connection.request(method, path, body=body, headers=headers)
+                response = connection.getresponse()
+                data = response.read()
+            except OSError:
+                connection.close()
+                thread_errors += 1
+                continue
+            thread_latencies.append(time.perf_counter() - start)
+            thread_errors += response.status >= 400 or b'error during operation' in data
+        connection.close()
+        latencies.extend(thread_latencies)
+        errors.append(thread_errors)
+
+    threads = [threading.Thread(target=worker, args=(number,)) for number in range(concurrency)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    duration = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        'route': name,
+        'method': method,
+        'requests': len(latencies),
+        'errors': sum(errors),
+        'duration': duration,
+        'throughput': len(latencies) / duration if duration else 0.0,
+        'mean': sum(latencies) / len(latencies) if latencies else None,
+        'p50': get_percentile(latencies, 50) if latencies else None,
+        'p95': get_percentile(latencies, 95) if latencies else None,
+        'p99': get_percentile(latencies, 99) if latencies else None,
+    }
+
+
+def seed_database(app, sizes, seed):
+    """create tables and fill them by the dataset of `sizes`."""
+    from app.application import db
+    from app.create_test_data import create_test_data
+
+    with app.app_context():
+        db.create_all()
+        create_test_data(sizes['groups'], sizes['students'], sizes['courses'], seed=seed)
+        db.session.remove()
+
+
+def run_benchmark(app, scales=SCALES, requests_count=1000, concurrency=4, seed=1, url=None, routes=ROUTES):
+    """seed the database of the `app` at every scale and benchmark all routes of the
+    `app`, served by this process, or of the running server at `url`. return list of
+    results dicts."""
+    server = None
+    if url is None:
+        server, url = start_server(app)
+
+    results = []
+    try:
+        for scale in scales:
+            sizes = get_sizes(scale)
+            seed_database(app, sizes, seed)
+            for route in routes:
+                results.append({'scale': scale, **run_route(url, route, sizes, requests_count, concurrency, seed)})
+    finally:
+        if server is not None:
+            server.shutdown()
+
+    return results
+
+
+def get_git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=os.path.dirname(os.path.abspath(__file__)),
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(args=None):
+    """parse command line arguments, run the benchmark and save results."""
+    parser = argparse.ArgumentParser(description='HTTP benchmark of the api routes at several dataset sizes.')
+    parser.add_argument('--scales', type=int, nargs='+', default=list(SCALES), help='numbers of students.')
+    parser.add_argument('--requests', type=int, default=1000, help='number of requests of every route.')
+    parser.add_argument('--concurrency', type=int, default=4, help='number of client threads.')
+    parser.add_argument('--seed', type=int, default=1, help='seed of the data and requests generators.')
+    parser.add_argument('--database-uri', default=None,
+                        help='database of the benchmark, new testing.postgresql instance by default.')
+    parser.add_argument('--url', default=None,
+                        help='url of the running server, served by this process by default, requires --database-uri.')
+    parser.add_argument('--routes', nargs='+', choices=[route[0] for route in ROUTES],
+                        default=[route[0] for route in ROUTES], help='names of the benchmarked routes.')
+    parser.add_argument('--output', default=None, help='path of the results json file.')
+    args = parser.parse_args(args)
+    if args.url is not None and args.database_uri is None:
+        parser.error('--url requires --database-uri of the database of the server.')
+
+    postgresql = None
+    if args.database_uri is None:
+        import testing.postgresql
+        postgresql = testing.postgresql.Postgresql()
+        args.database_uri = postgresql.url()
+
+    from app.config import Configuration
+    from app.application import create_app
+    Configuration.SQLALCHEMY_DATABASE_URI = args.database_uri
+    app = create_app(Configuration)
+
+    started_at = datetime.now(timezone.utc)
+    try:
+        routes = [route for route in ROUTES if route[0] in args.routes]
+        results = run_benchmark(app, args.scales, args.requests, args.concurrency, args.seed, args.url, routes)
+    finally:
+        if postgresql is not None:
+            postgresql.stop()
+
+    report = {
+        'started_at': started_at.isoformat(),
+        'git_commit': get_git_commit(),
+        'python': platform.python_version(),
+        'requests': args.requests,
+        'concurrency': args.concurrency,
+        'seed': args.seed,
+        'item_cache_size': app.config['ITEM_CACHE_SIZE'],
+        'results': results,
+    }
+    output = args.output or 'benchmark-{}.json'.format(started_at.strftime('%Y%m%dT%H%M%S'))
+    with open(output, 'w') as file:
+        json.dump(report, file, indent=2)
+
+    for result in results:
+        print('{scale:>8} {method:<6} {route:<18} {throughput:>9.1f} req/s  p50 {p50_ms:>8.2f} ms  '
+              'p95 {p95_ms:>8.2f} ms  p99 {p99_ms:>8.2f} ms  errors {errors}'
+              .format(**result, **{f'{name}_ms': (result[name] or 0) * 1000 for name in ('p50', 'p95', 'p99')}))
+
+
+if __name__ == '__main__':
+    main()
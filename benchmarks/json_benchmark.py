@@ -0,0 +1,69 @@
+"""microbenchmark of the json encoders of the api responses.
+
+list payloads of `--items` students params dicts, as returned by the list resources,
+are encoded by every encoder `--repeat` times, the best time of every encoder and its
+speedup over the flask_restful representation are printed, e.g.:
+    python -m benchmarks.json_benchmark --items 100 1000 100000
+
+encoders:
+    flask_restful - `json.dumps` to str, encoded to utf-8 by the response
+    json_compact - the standard encoder of `serialization.dumps`, used without orjson
+    serialization - `serialization.dumps`, by orjson if it is installed"""
+import argparse
+import json
+import random
+import timeit
+
+from app.create_test_data import FIRST_NAMES, SECOND_NAMES
+from app.serialization import dumps, orjson
+
+ITEMS_COUNTS = (100, 1000, 100000)
+
+
+def make_payload(items_count, seed=1):
+    """return list of students params dicts with random names and courses ids."""
+    rng = random.Random(seed)
+    return [{'id': student_id, 'group_id': rng.randint(1, 100), 'first_name': rng.choice(FIRST_NAMES),
+             'last_name': rng.choice(SECOND_NAMES), 'courses_ids': sorted(rng.sample(range(1, 300), 5))}
+            for student_id in range(1, items_count + 1)]
+
+
+ENCODERS = [
+    ('flask_restful', lambda data: (json.dumps(data) + '\n').encode('utf-8')),
+    ('json_compact', lambda data: json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode('utf-8')),
+    ('serialization', lambda data: dumps(data) + b'\n'),
+]
+
+
+def run_benchmark(items_counts=ITEMS_COUNTS, repeat=5):
+    """return list of results dicts of every encoder and payload size."""
+    results = []
+    for items_count in items_counts:
+        payload = make_payload(items_count)
+        number = max(100000 // items_count, 1)
+        baseline = None
+        for name, encode in ENCODERS:
+            seconds = min(timeit.repeat(lambda: encode(payload), number=number, repeat=repeat)) / number
+            baseline = baseline or seconds
+            results.append({'items': items_count, 'encoder': name, 'seconds': seconds,
+                            'bytes': len(encode(payload)), 'speedup': baseline / seconds})
+    return results
+
+
+def main(args=None):
+    """parse command line arguments, run the benchmark and print results."""
+    parser = argparse.ArgumentParser(description='microbenchmark of the json encoders of the api responses.')
+    parser.add_argument('--items', type=int, nargs='+', default=list(ITEMS_COUNTS), help='numbers of list items.')
+    parser.add_argument('--repeat', type=int, default=5, help='number of measurements of every encoder.')
+    args = parser.parse_args(args)
+
+    print('orjson {}'.format(orjson.__version__ if orjson else 'is not installed'))
+    results = run_benchmark(args.items, args.repeat)
+    for result in results:
+        print('{items:>8} {encoder:<14} {ms:>10.3f} ms {bytes:>12} bytes  x{speedup:.2f}'
+              .format(**result, ms=result['seconds'] * 1000))
+    return results
+
+
+if __name__ == '__main__':
+    main()
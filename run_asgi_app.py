@@ -0,0 +1,3 @@
+from app.asgi import run_asgi_app
+
+run_asgi_app()
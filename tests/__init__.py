@@ -7,9 +7,11 @@ from app.config import Configuration
 postgresql = testing.postgresql.Postgresql(port=7654)
 Configuration.SQLALCHEMY_DATABASE_URI = postgresql.url()
 
-from app.application import app, db
+from app.application import create_app, db
 from app.models import StudentModel, GroupModel, CourseModel
 
+app = create_app(Configuration)
+
 
 def create_test_students(count=1):
     for num in range(1, count + 1):
@@ -0,0 +1,89 @@
+import unittest
+import contextlib
+import io
+import json
+import os
+import tempfile
+import testing.postgresql
+from app.config import Configuration
+
+postgresql = testing.postgresql.Postgresql(port=7654)
+Configuration.SQLALCHEMY_DATABASE_URI = postgresql.url()
+
+from app.application import create_app, db
+from app.cache import item_cache
+from app.models import StudentModel
+from benchmarks.http_benchmark import ROUTES, get_percentile, run_benchmark, main
+from benchmarks import json_benchmark
+
+app = create_app(Configuration)
+
+
+class TestHttpBenchmarkCase(unittest.TestCase):
+
+    def setUp(self):
+        """clear all data from test database after previous test."""
+        self.app_context = app.app_context()
+        self.app_context.push()
+        db.session.commit()
+        db.drop_all()
+        db.create_all()
+        db.session.commit()
+        db.session.remove()
+        item_cache.clear()
+
+    def tearDown(self):
+        db.session.remove()
+        self.app_context.pop()
+
+    def test_percentile(self):
+        values = list(range(1, 101))
+
+        self.assertEqual(get_percentile(values, 50), 50)
+        self.assertEqual(get_percentile(values, 99), 99)
+        self.assertEqual(get_percentile([1], 95), 1)
+
+    def test_run_benchmark(self):
+        results = run_benchmark(app, scales=[50, 100], requests_count=6, concurrency=2)
+
+        self.assertEqual([(result['scale'], result['route']) for result in results],
+                         [(scale, route[0]) for scale in (50, 100) for route in ROUTES])
+        for result in results:
+            self.assertEqual(result['requests'], 6, result['route'])
+            self.assertEqual(result['errors'], 0, result['route'])
+            self.assertLessEqual(result['p50'], result['p95'])
+            self.assertLessEqual(result['p95'], result['p99'])
+        # 6 students are posted and 6 deleted from the end of the table
+        self.assertEqual(StudentModel.query.count(), 100)
+
+    def test_main_saves_results(self):
+        output = os.path.join(tempfile.mkdtemp(), 'results.json')
+
+        main(['--scales', '20', '--requests', '3', '--concurrency', '1', '--routes', 'student',
+              '--database-uri', postgresql.url(), '--output', output])
+
+        with open(output) as file:
+            report = json.load(file)
+        self.assertEqual(report['requests'], 3)
+        self.assertEqual([(result['scale'], result['route']) for result in report['results']], [(20, 'student')])
+
+    def test_main_url_requires_database_uri(self):
+        with self.assertRaises(SystemExit), contextlib.redirect_stderr(io.StringIO()) as stderr:
+            main(['--url', 'http://localhost:8000', '--output', os.path.join(tempfile.mkdtemp(), 'results.json')])
+
+        self.assertIn('--url requires --database-uri', stderr.getvalue())
+
+
+class TestJsonBenchmarkCase(unittest.TestCase):
+
+    def test_run_benchmark(self):
+        results = json_benchmark.main(['--items', '10', '--repeat', '1'])
+
+        self.assertEqual([result['encoder'] for result in results], [name for name, _ in json_benchmark.ENCODERS])
+        self.assertEqual(results[0]['speedup'], 1)
+        # compact json of the same data
+        self.assertEqual(results[1]['bytes'], results[2]['bytes'] - 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
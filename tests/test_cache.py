@@ -0,0 +1,201 @@
+import asyncio
+import os
+import tempfile
+import threading
+import unittest
+from unittest import mock
+from flask import Flask
+from parameterized import parameterized
+from app.cache import AppItemCache, ItemCache, MemoryStore, SqliteStore
+
+
+def create_memory_store(max_size=2, ttl=60):
+    return MemoryStore(max_size, ttl)
+
+
+def create_sqlite_store(max_size=2, ttl=60):
+    directory = tempfile.mkdtemp()
+    return SqliteStore(os.path.join(directory, 'cache.sqlite'), max_size, ttl)
+
+
+class TestItemCacheCase(unittest.TestCase):
+
+    def create_cache(self, create_store, **store_params):
+        cache = ItemCache()
+        cache.store = create_store(**store_params)
+        return cache
+
+    @parameterized.expand([(create_memory_store,), (create_sqlite_store,)])
+    def test_read_through(self, create_store):
+        cache = self.create_cache(create_store)
+        load = mock.Mock(return_value={'id': 1})
+
+        self.assertEqual(cache.get(('students', 1), load), {'id': 1})
+        self.assertEqual(cache.get(('students', 1), load), {'id': 1})
+
+        load.assert_called_once()
+        self.assertEqual(cache.get_stats(), {'hits': 1, 'misses': 1, 'size': 1})
+
+    @parameterized.expand([(create_memory_store,), (create_sqlite_store,)])
+    def test_not_cache_none(self, create_store):
+        cache = self.create_cache(create_store)
+        load = mock.Mock(return_value=None)
+
+        cache.get(('students', 1), load)
+        cache.get(('students', 1), load)
+
+        self.assertEqual(load.call_count, 2)
+
+    def test_least_recently_used_eviction(self):
+        cache = self.create_cache(create_memory_store)
+
+        cache.get(('students', 1), lambda: 1)
+        cache.get(('students', 2), lambda: 2)
+        cache.get(('students', 1), lambda: 1)
+        cache.get(('students', 3), lambda: 3)
+
+        self.assertEqual(cache.get(('students', 1), lambda: None), 1)
+        self.assertEqual(cache.get(('students', 2), lambda: None), None)
+
+    def test_oldest_eviction(self):
+        cache = self.create_cache(create_sqlite_store)
+
+        cache.get(('students', 1), lambda: 1)
+        cache.get(('students', 2), lambda: 2)
+        cache.get(('students', 3), lambda: 3)
+
+        self.assertEqual(cache.get_stats()['size'], 2)
+        self.assertEqual(cache.get(('students', 1), lambda: None), None)
+        self.assertEqual(cache.get(('students', 3), lambda: None), 3)
+
+    @parameterized.expand([
+        (create_memory_store, 'app.cache.time.monotonic'),
+        (create_sqlite_store, 'app.cache.time.time'),
+    ])
+    def test_time_to_live(self, create_store, clock):
+        cache = self.create_cache(create_store)
+
+        with mock.patch(clock, return_value=100):
+            cache.get(('students', 1), lambda: 1)
+        with mock.patch(clock, return_value=161):
+            self.assertEqual(cache.get(('students', 1), lambda: 2), 2)
+
+    @parameterized.expand([(create_memory_store,), (create_sqlite_store,)])
+    def test_invalidate(self, create_store):
+        cache = self.create_cache(create_store)
+        cache.get(('students', 1), lambda: 1)
+        cache.get(('groups', 1), lambda: 1)
+
+        cache.invalidate([('students', 1)])
+
+        self.assertEqual(cache.get(('students', 1), lambda: 2), 2)
+        self.assertEqual(cache.get(('groups', 1), lambda: 2), 1)
+
+    @parameterized.expand([(create_memory_store,), (create_sqlite_store,)])
+    def test_not_cache_value_loaded_before_invalidate(self, create_store):
+        cache = self.create_cache(create_store)
+
+        def load():
+            cache.invalidate([('students', 1)])
+            return 1
+
+        cache.get(('students', 1), load)
+
+        self.assertEqual(cache.get(('students', 1), lambda: 2), 2)
+
+    @parameterized.expand([(create_memory_store,), (create_sqlite_store,)])
+    def test_not_valid(self, create_store):
+        cache = self.create_cache(create_store)
+        cache.get(('students', 1), lambda: {'id': 1, 'version': 1})
+
+        value = cache.get(('students', 1), lambda: {'id': 1, 'version': 2}, lambda value: value['version'] == 2)
+
+        self.assertEqual(value, {'id': 1, 'version': 2})
+        self.assertEqual(cache.get(('students', 1), lambda: None), {'id': 1, 'version': 2})
+        self.assertEqual(cache.get_stats(), {'hits': 1, 'misses': 2, 'size': 1})
+
+    @parameterized.expand([(create_memory_store,), (create_sqlite_store,)])
+    def test_disabled(self, create_store):
+        cache = self.create_cache(create_store, max_size=0)
+
+        cache.get(('students', 1), lambda: 1)
+
+        self.assertEqual(cache.get(('students', 1), lambda: 2), 2)
+
+    def test_shared_between_processes(self):
+        """caches of different processes open the same sqlite file."""
+        first_cache = self.create_cache(create_sqlite_store)
+        second_cache = ItemCache()
+        second_cache.store = SqliteStore(first_cache.store.path, 2, 60)
+
+        first_cache.get(('students', 1), lambda: {'id': 1})
+
+        self.assertEqual(second_cache.get(('students', 1), lambda: None), {'id': 1})
+
+        second_cache.invalidate([('students', 1)])
+
+        self.assertEqual(first_cache.get(('students', 1), lambda: {'id': 2}), {'id': 2})
+
+    def test_sqlite_errors_are_misses(self):
+        cache = self.create_cache(create_sqlite_store)
+        with open(cache.store.path, 'wb') as file:
+            file.write(b'not a database' * 1000)
+
+        self.assertEqual(cache.get(('students', 1), lambda: 1), 1)
+        self.assertEqual(cache.get(('students', 1), lambda: 2), 2)
+
+    @parameterized.expand([(create_memory_store, False), (create_sqlite_store, True)])
+    def test_get_async_blocking_store_in_thread(self, create_store, in_thread):
+        cache = self.create_cache(create_store)
+        threads_ids = []
+        store_get = cache.store.get
+
+        def get(key):
+            threads_ids.append(threading.get_ident())
+            return store_get(key)
+
+        async def load():
+            return 1
+
+        cache.store.get = get
+        asyncio.run(cache.get_async(('students', 1), load))
+        value = asyncio.run(cache.get_async(('students', 1), load))
+
+        self.assertEqual(value, 1)
+        self.assertEqual([thread_id != threading.get_ident() for thread_id in threads_ids], [in_thread] * 2)
+
+    def test_init_app(self):
+        cache = ItemCache()
+        app = mock.Mock(config={'ITEM_CACHE_SIZE': 5, 'ITEM_CACHE_TTL': 10, 'SHARED_CACHE_PATH': None})
+
+        cache.init_app(app)
+
+        self.assertIsInstance(cache.store, MemoryStore)
+
+        app.config['SHARED_CACHE_PATH'] = create_sqlite_store().path
+        cache.init_app(app)
+
+        self.assertIsInstance(cache.store, SqliteStore)
+        self.assertEqual(cache.store.max_size, 5)
+
+
+    def test_cache_of_every_app(self):
+        cache = AppItemCache()
+        apps = [Flask(__name__), Flask(__name__)]
+        for app in apps:
+            app.config.update(ITEM_CACHE_SIZE=5, ITEM_CACHE_TTL=10)
+            cache.init_app(app)
+
+        with apps[0].app_context():
+            cache.get(('students', 1), lambda: 1)
+        cache.init_app(apps[1])
+
+        with apps[0].app_context():
+            self.assertEqual(cache.get_cached(('students', 1)), 1)
+        with apps[1].app_context():
+            self.assertIsNone(cache.get_cached(('students', 1)))
+            self.assertEqual(cache.get_stats(), {'hits': 0, 'misses': 1, 'size': 0})
+
+
+if __name__ == '__main__':
+    unittest.main()
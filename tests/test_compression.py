@@ -0,0 +1,247 @@
+import unittest
+import gzip
+import json
+import zlib
+import testing.postgresql
+from parameterized import parameterized
+from starlette.testclient import TestClient
+from app.config import Configuration
+
+postgresql = testing.postgresql.Postgresql(port=7654)
+Configuration.SQLALCHEMY_DATABASE_URI = postgresql.url()
+
+from app.application import create_app, db
+from app.asgi import create_asgi_app
+from app.cache import item_cache
+from app.compression import STREAM_FLUSH_SIZE, GzipCompressor, get_encoding, iter_compressed
+from app.models import StudentModel, GroupModel
+
+app = create_app(Configuration)
+
+
+def create_test_groups(count=1):
+    for num in range(1, count + 1):
+        group = GroupModel(f'aa-{str(num).zfill(2)}')
+        db.session.add(group)
+    db.session.commit()
+
+
+def create_test_students(count=1):
+    StudentModel.post_items([{'group_id': 1, 'first_name': f'first_name_{num}', 'last_name': f'last_name_{num}'}
+                             for num in range(1, count + 1)])
+
+
+class TestCompressorCase(unittest.TestCase):
+    config = {'COMPRESSION_ENCODINGS': ['zstd', 'br', 'gzip']}
+
+    @parameterized.expand([
+        ('gzip, deflate', 'gzip'),
+        ('deflate;q=1, gzip;q=0.5', 'gzip'),
+        ('*', 'gzip'),
+        ('gzip;q=0', None),
+        ('deflate', None),
+        (None, None),
+    ])
+    def test_get_encoding(self, accept_encoding, encoding):
+        self.assertEqual(get_encoding(accept_encoding, self.config), encoding)
+
+    def test_get_encoding_disabled(self):
+        self.assertIsNone(get_encoding('gzip', {'COMPRESSION_ENCODINGS': []}))
+
+    def test_iter_compressed(self):
+        chunks = [json.dumps({'id': num, 'name': f'name_{num}'}).encode('utf-8') + b'\n' for num in range(10000)]
+
+        compressed_chunks = list(iter_compressed(iter(chunks), GzipCompressor(6)))
+
+        self.assertGreater(len(compressed_chunks), 2)
+        self.assertEqual(gzip.decompress(b''.join(compressed_chunks)), b''.join(chunks))
+
+    def test_flushed_chunks_are_decompressed(self):
+        """data of every flushed chunk is decompressed before the end of the stream."""
+        compressor = GzipCompressor(6)
+        decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        data = b'x' * STREAM_FLUSH_SIZE
+
+        self.assertEqual(decompressor.decompress(compressor.compress(data)), data)
+
+    def test_iter_compressed_closes_chunks(self):
+        closed = []
+
+        def iter_chunks():
+            try:
+                yield b'a'
+                yield b'b'
+            finally:
+                closed.append(True)
+
+        compressed_chunks = iter_compressed(iter_chunks(), GzipCompressor(6))
+        next(compressed_chunks)
+        compressed_chunks.close()
+
+        self.assertEqual(closed, [True])
+
+
+class TestResponseCompressionCase(unittest.TestCase):
+
+    def setUp(self):
+        """clear all data from test database after previous test."""
+        self.app_context = app.app_context()
+        self.app_context.push()
+        self.app = app.test_client()
+        db.session.commit()
+        db.drop_all()
+        db.create_all()
+        db.session.commit()
+        db.session.remove()
+        item_cache.clear()
+        create_test_groups(1)
+        create_test_students(50)
+
+    def tearDown(self):
+        app.config['COMPRESSION_ENCODINGS'] = Configuration.COMPRESSION_ENCODINGS
+        app.config['COMPRESSION_MIN_SIZE'] = Configuration.COMPRESSION_MIN_SIZE
+        self.app_context.pop()
+
+    def test_compressed_list(self):
+        answer = self.app.get('/students/', headers={'Accept-Encoding': 'gzip'})
+        plain_answer = self.app.get('/students/')
+
+        self.assertEqual(answer.headers['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', answer.vary)
+        self.assertEqual(int(answer.headers['Content-Length']), len(answer.data))
+        self.assertLess(len(answer.data), len(plain_answer.data))
+        self.assertEqual(gzip.decompress(answer.data), plain_answer.data)
+        self.assertNotIn('Content-Encoding', plain_answer.headers)
+        self.assertIn('Accept-Encoding', plain_answer.vary)
+
+    def test_small_item_not_compressed(self):
+        answer = self.app.get('/students/1/', headers={'Accept-Encoding': 'gzip'})
+
+        self.assertNotIn('Content-Encoding', answer.headers)
+        self.assertEqual(json.loads(answer.data.decode("utf-8"))['first_name'], 'first_name_1')
+
+    def test_min_size(self):
+        app.config['COMPRESSION_MIN_SIZE'] = 0
+
+        answer = self.app.get('/students/1/', headers={'Accept-Encoding': 'gzip'})
+
+        self.assertEqual(answer.headers['Content-Encoding'], 'gzip')
+        self.assertEqual(json.loads(gzip.decompress(answer.data))['first_name'], 'first_name_1')
+
+    @parameterized.expand([('identity',), ('gzip;q=0',), ('br',)])
+    def test_not_accepted_encoding(self, accept_encoding):
+        answer = self.app.get('/students/', headers={'Accept-Encoding': accept_encoding})
+
+        self.assertNotIn('Content-Encoding', answer.headers)
+        self.assertEqual(len(json.loads(answer.data.decode("utf-8"))), 50)
+
+    def test_disabled(self):
+        app.config['COMPRESSION_ENCODINGS'] = []
+
+        answer = self.app.get('/students/', headers={'Accept-Encoding': 'gzip'})
+
+        self.assertNotIn('Content-Encoding', answer.headers)
+
+    def test_not_modified_not_compressed(self):
+        etag = self.app.get('/students/').headers['ETag']
+
+        answer = self.app.get('/students/', headers={'Accept-Encoding': 'gzip', 'If-None-Match': etag})
+
+        self.assertEqual(answer.status_code, 304)
+        self.assertNotIn('Content-Encoding', answer.headers)
+
+    def test_compressed_etag_has_encoding(self):
+        answer = self.app.get('/students/', headers={'Accept-Encoding': 'gzip'})
+        plain_answer = self.app.get('/students/')
+
+        self.assertEqual(answer.headers['ETag'], plain_answer.headers['ETag'][:-1] + '-gzip"')
+        for etag in (answer.headers['ETag'], plain_answer.headers['ETag']):
+            not_modified_answer = self.app.get('/students/', headers={'If-None-Match': etag})
+            self.assertEqual(not_modified_answer.status_code, 304)
+
+    def test_if_match_compressed_item_etag(self):
+        # ids of 300 students make the group bigger than `COMPRESSION_MIN_SIZE`
+        create_test_students(250)
+        answer = self.app.get('/groups/1/', headers={'Accept-Encoding': 'gzip'})
+        self.assertEqual(answer.headers['Content-Encoding'], 'gzip')
+
+        put_answer = self.app.put('/groups/1/', data={'name': 'bb-01'}, headers={'If-Match': answer.headers['ETag']})
+
+        self.assertEqual(put_answer.status_code, 200)
+        self.assertEqual(GroupModel.query.first().name, 'bb-01')
+
+    def test_compressed_stream(self):
+        answer = self.app.get('/students/?after=10',
+                              headers={'Accept': 'application/x-ndjson', 'Accept-Encoding': 'gzip'})
+
+        self.assertEqual(answer.headers['Content-Encoding'], 'gzip')
+        self.assertTrue(answer.is_streamed)
+        lines = gzip.decompress(answer.data).decode('utf-8').splitlines()
+        self.assertEqual([json.loads(line)['id'] for line in lines], list(range(11, 51)))
+
+
+class TestAsgiCompressionCase(unittest.TestCase):
+
+    def setUp(self):
+        """clear all data from test database after previous test."""
+        self.app_context = app.app_context()
+        self.app_context.push()
+        db.session.commit()
+        db.drop_all()
+        db.create_all()
+        db.session.commit()
+        db.session.remove()
+        item_cache.clear()
+        create_test_groups(1)
+        create_test_students(50)
+        self.client = TestClient(create_asgi_app(Configuration))
+        self.client.__enter__()
+
+    def tearDown(self):
+        self.client.__exit__(None, None, None)
+        self.app_context.pop()
+
+    def test_compressed_list(self):
+        answer = self.client.get('/students', headers={'Accept-Encoding': 'gzip'})
+
+        self.assertEqual(answer.headers['Content-Encoding'], 'gzip')
+        self.assertEqual(answer.headers['Vary'], 'Accept, Accept-Encoding')
+        self.assertEqual(len(answer.json()), 50)
+
+    def test_compressed_etag_has_encoding(self):
+        answer = self.client.get('/students', headers={'Accept-Encoding': 'gzip'})
+        plain_answer = self.client.get('/students', headers={'Accept-Encoding': 'identity'})
+
+        self.assertEqual(answer.headers['ETag'], plain_answer.headers['ETag'][:-1] + '-gzip"')
+        for etag in (answer.headers['ETag'], plain_answer.headers['ETag']):
+            not_modified_answer = self.client.get('/students', headers={'If-None-Match': etag})
+            self.assertEqual(not_modified_answer.status_code, 304)
+
+    def test_small_item_not_compressed(self):
+        answer = self.client.get('/students/1', headers={'Accept-Encoding': 'gzip'})
+
+        self.assertNotIn('Content-Encoding', answer.headers)
+        self.assertEqual(answer.json()['first_name'], 'first_name_1')
+
+    def test_compressed_stream(self):
+        self.client.app.state.config['STREAM_BATCH_SIZE'] = 7
+
+        answer = self.client.get('/students?after=10',
+                                 headers={'Accept': 'application/x-ndjson', 'Accept-Encoding': 'gzip'})
+
+        self.assertEqual(answer.headers['Content-Encoding'], 'gzip')
+        self.assertNotIn('Content-Length', answer.headers)
+        self.assertEqual([json.loads(line)['id'] for line in answer.text.splitlines()], list(range(11, 51)))
+
+    @parameterized.expand([(0, 'gzip'), (1024, None)])
+    def test_flask_response(self, min_size, content_encoding):
+        self.client.app.state.config['COMPRESSION_MIN_SIZE'] = min_size
+
+        answer = self.client.post('/groups/', data={'name': 'bb-01'}, headers={'Accept-Encoding': 'gzip'})
+
+        self.assertEqual(answer.headers.get('Content-Encoding'), content_encoding)
+        self.assertEqual(answer.headers['Vary'], 'Accept-Encoding')
+        self.assertEqual(answer.status_code, 200)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,188 @@
+import unittest
+import warnings
+from unittest import mock
+import testing.postgresql
+from sqlalchemy import select
+from app.config import Configuration
+
+postgresql = testing.postgresql.Postgresql(port=7654)
+Configuration.SQLALCHEMY_DATABASE_URI = postgresql.url()
+
+from app.application import create_app, db
+from app.cache import item_cache
+from app.metrics import Histogram, RepeatedQueriesWarning, request_metrics, get_statement_shape, query_budget, \
+    start_request_measuring
+from app.models import GroupModel
+
+app = create_app(Configuration)
+
+
+def create_test_groups(count=1):
+    for num in range(1, count + 1):
+        group = GroupModel(f'aa-{str(num).zfill(2)}')
+        db.session.add(group)
+    db.session.commit()
+
+
+class TestHistogramCase(unittest.TestCase):
+
+    def test_render(self):
+        histogram = Histogram('test_seconds', 'Test histogram.', (0.1, 1))
+
+        histogram.observe((('route', '/a'),), 0.1)
+        histogram.observe((('route', '/a'),), 0.5)
+        histogram.observe((('route', '/a'),), 2)
+
+        self.assertEqual(histogram.render(), [
+            '# HELP test_seconds Test histogram.',
+            '# TYPE test_seconds histogram',
+            'test_seconds_bucket{route="/a",le="0.1"} 1',
+            'test_seconds_bucket{route="/a",le="1"} 2',
+            'test_seconds_bucket{route="/a",le="+Inf"} 3',
+            'test_seconds_sum{route="/a"} 2.6',
+            'test_seconds_count{route="/a"} 3',
+        ])
+        self.assertEqual(histogram.get_count((('route', '/a'),)), 3)
+
+
+class TestRequestMetricsCase(unittest.TestCase):
+
+    def setUp(self):
+        """clear all data from test database after previous test."""
+        self.app_context = app.app_context()
+        self.app_context.push()
+        self.app = app.test_client()
+        db.session.commit()
+        db.drop_all()
+        db.create_all()
+        db.session.commit()
+        db.session.remove()
+        item_cache.clear()
+
+    def tearDown(self):
+        app.config['QUERY_COUNT_HEADER'] = False
+        app.config['DETECT_REPEATED_QUERIES'] = False
+        self.app_context.pop()
+
+    def test_query_count_header(self):
+        create_test_groups(2)
+        app.config['QUERY_COUNT_HEADER'] = True
+
+        answer = self.app.get('/groups/')
+
+        # table versions and the list query
+        self.assertEqual(answer.headers['X-Query-Count'], '2')
+
+    def test_no_query_count_header_by_default(self):
+        answer = self.app.get('/groups/')
+
+        self.assertNotIn('X-Query-Count', answer.headers)
+
+    def test_request_metrics(self):
+        labels = (('route', '/groups/<int:item_id>/'), ('method', 'GET'))
+        count = request_metrics.request_duration.get_count(labels)
+
+        self.app.get('/groups/1/')
+
+        self.assertEqual(request_metrics.request_duration.get_count(labels), count + 1)
+        self.assertEqual(request_metrics.sql_statements.get_count(labels), count + 1)
+        self.assertEqual(request_metrics.db_duration.get_count(labels), count + 1)
+
+    def test_request_metrics_of_other_app(self):
+        labels = (('route', '/groups/<int:item_id>/'), ('method', 'GET'))
+        count = request_metrics.request_duration.get_count(labels)
+        other_app = create_app(Configuration)
+
+        other_app.test_client().get('/groups/1/')
+
+        self.assertEqual(request_metrics.request_duration.get_count(labels), count)
+        self.assertEqual(request_metrics.get_state(other_app).request_duration.get_count(labels), 1)
+
+    def test_failed_request_metrics(self):
+        labels = (('route', '/groups/'), ('method', 'GET'))
+        count = request_metrics.request_duration.get_count(labels)
+
+        with mock.patch.object(GroupModel, 'get_version_tables_names', side_effect=RuntimeError):
+            answer = self.app.get('/groups/')
+            # after_request functions are not called, if the exception is propagated.
+            app.config['PROPAGATE_EXCEPTIONS'] = True
+            try:
+                with self.assertRaises(RuntimeError):
+                    self.app.get('/groups/')
+            finally:
+                app.config['PROPAGATE_EXCEPTIONS'] = None
+
+        self.assertEqual(answer.status_code, 500)
+        self.assertEqual(request_metrics.request_duration.get_count(labels), count + 2)
+        self.assertEqual(request_metrics.sql_statements.get_count(labels), count + 2)
+
+    def test_metrics_resource(self):
+        self.app.get('/groups/')
+
+        answer = self.app.get('/metrics')
+        text = answer.data.decode("utf-8")
+
+        self.assertTrue(answer.headers['Content-Type'].startswith('text/plain; version=0.0.4'))
+        self.assertIn('# TYPE http_request_duration_seconds histogram', text)
+        self.assertIn('http_request_sql_statements_count{route="/groups/",method="GET"}', text)
+        self.assertIn('http_request_db_duration_seconds_sum{route="/groups/",method="GET"}', text)
+
+    def test_repeated_queries_warning(self):
+        app.config['DETECT_REPEATED_QUERIES'] = True
+        create_test_groups(2)
+
+        with app.test_request_context('/groups/'):
+            start_request_measuring()
+            for group_id in (1, 2):
+                db.session.execute(select(GroupModel.__table__).where(GroupModel.id == group_id)).all()
+
+            with self.assertWarnsRegex(RepeatedQueriesWarning, 'executed 2 statements of the same shape'):
+                request_metrics.finish_request_measuring()
+
+    def test_no_repeated_queries_warning(self):
+        app.config['DETECT_REPEATED_QUERIES'] = True
+        create_test_groups(2)
+
+        with warnings.catch_warnings():
+            warnings.simplefilter('error', RepeatedQueriesWarning)
+            answer = self.app.get('/groups/1/')
+
+        self.assertEqual(answer.status_code, 200)
+
+
+class TestQueryBudgetCase(unittest.TestCase):
+
+    def setUp(self):
+        self.app_context = app.app_context()
+        self.app_context.push()
+
+    def tearDown(self):
+        self.app_context.pop()
+
+    def test_within_budget(self):
+        with query_budget(1) as statements:
+            db.session.execute(select(1))
+
+        self.assertEqual(len(statements), 1)
+
+    def test_over_budget(self):
+        with self.assertRaisesRegex(AssertionError, '2 SQL statements executed, budget is 1'):
+            with query_budget(1):
+                db.session.execute(select(1))
+                db.session.execute(select(2))
+
+    def test_decorator(self):
+        @query_budget(0)
+        def run_query():
+            db.session.execute(select(1))
+
+        with self.assertRaises(AssertionError):
+            run_query()
+
+    def test_statement_shape(self):
+        self.assertEqual(get_statement_shape('SELECT * FROM students\nWHERE id IN (%(id_1_1)s, %(id_1_2)s) LIMIT 10'),
+                         'SELECT * FROM students WHERE id IN (?) LIMIT ?')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,58 @@
+import unittest
+from sqlalchemy import create_engine
+from sqlalchemy.exc import TimeoutError
+from app.pool import InstrumentedQueuePool
+
+
+def create_test_engine(pool_size=1, max_overflow=0):
+    return create_engine('sqlite://', poolclass=InstrumentedQueuePool, pool_size=pool_size,
+                         max_overflow=max_overflow, pool_timeout=0.1)
+
+
+class TestInstrumentedQueuePoolCase(unittest.TestCase):
+
+    def test_checkouts(self):
+        engine = create_test_engine(pool_size=2)
+
+        with engine.connect():
+            with engine.connect():
+                stats = engine.pool.get_stats()
+
+        self.assertEqual(stats['checked_out'], 2)
+        self.assertEqual(stats['checkouts'], 2)
+        self.assertEqual(engine.pool.get_stats()['checked_out'], 0)
+        self.assertEqual(engine.pool.get_stats()['checked_in'], 2)
+
+    def test_overflow(self):
+        engine = create_test_engine(pool_size=1, max_overflow=1)
+
+        with engine.connect():
+            with engine.connect():
+                stats = engine.pool.get_stats()
+
+        self.assertEqual(stats['overflow'], 1)
+        self.assertEqual(stats['max_overflow'], 1)
+
+    def test_timeouts(self):
+        engine = create_test_engine(pool_size=1)
+
+        with engine.connect():
+            with self.assertRaises(TimeoutError):
+                engine.connect()
+
+        stats = engine.pool.get_stats()
+        self.assertEqual(stats['timeouts'], 1)
+        self.assertGreaterEqual(stats['wait_time_max'], 0.1)
+        self.assertGreaterEqual(stats['wait_time_total'], stats['wait_time_max'])
+
+    def test_recreate(self):
+        engine = create_test_engine()
+
+        engine.dispose()
+
+        self.assertIsInstance(engine.pool, InstrumentedQueuePool)
+        self.assertEqual(engine.pool.get_stats()['checkouts'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,193 @@
+import unittest
+import json
+from unittest import mock
+import testing.postgresql
+from parameterized import parameterized
+from sqlalchemy import create_engine, event, func, insert
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.engine import make_url
+from app.config import Configuration
+
+postgresql = testing.postgresql.Postgresql(port=7654)
+Configuration.SQLALCHEMY_DATABASE_URI = postgresql.url()
+
+from app.application import create_app, db
+from app.cache import item_cache
+from app.models import GroupModel, table_versions
+from app.replicas import replica_router
+
+app = create_app(Configuration)
+
+REPLICAS_NAMES = ['replica_1', 'replica_2']
+
+
+def get_replica_uri(database_name):
+    return str(make_url(postgresql.url()).set(database=database_name))
+
+
+def create_replicas_databases():
+    with create_engine(postgresql.url(), isolation_level='AUTOCOMMIT').connect() as connection:
+        for database_name in REPLICAS_NAMES:
+            connection.exec_driver_sql(f'DROP DATABASE IF EXISTS {database_name}')
+            connection.exec_driver_sql(f'CREATE DATABASE {database_name}')
+
+
+def fill_replica(database_name, group_name, version):
+    """create tables in the replica database with one group and `version` of groups
+    table."""
+    engine = create_engine(get_replica_uri(database_name))
+    db.metadata.create_all(engine)
+    with engine.begin() as connection:
+        connection.execute(insert(GroupModel.__table__).values(id=1, name=group_name))
+        connection.execute(insert(table_versions).values(table_name='groups', version=version,
+                                                         updated_at=func.now()))
+    engine.dispose()
+
+
+def configure_replicas(uris):
+    replica_router.get_state(app).init_app(mock.Mock(config={**app.config, 'REPLICA_DATABASE_URIS': uris}))
+
+
+class TestReplicaRoutingCase(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        create_replicas_databases()
+
+    def setUp(self):
+        """clear all data from test database after previous test."""
+        self.app_context = app.app_context()
+        self.app_context.push()
+        self.app = app.test_client()
+        db.session.commit()
+        db.drop_all()
+        db.create_all()
+        db.session.commit()
+        db.session.remove()
+        item_cache.clear()
+        create_replicas_databases()
+        GroupModel.post_item(name='aa-01')
+
+    def tearDown(self):
+        configure_replicas([])
+        db.session.remove()
+        self.app_context.pop()
+
+    def test_read_from_replica(self):
+        fill_replica('replica_1', 'rr-01', 1)
+        configure_replicas([get_replica_uri('replica_1')])
+
+        self.assertEqual(GroupModel.get_item_params_dict(1)['name'], 'rr-01')
+        self.assertEqual(GroupModel.get_all_items_params_dict()[0]['name'], 'rr-01')
+        self.assertEqual(next(GroupModel.iter_all_items_params_dict(10))['name'], 'rr-01')
+
+    def test_read_from_replica_after_other_app_is_created(self):
+        fill_replica('replica_1', 'rr-01', 1)
+        configure_replicas([get_replica_uri('replica_1')])
+
+        other_app = create_app(Configuration)
+
+        self.assertEqual(replica_router.get_state(other_app).replicas, [])
+        self.assertEqual(GroupModel.get_item_params_dict(1)['name'], 'rr-01')
+        self.assertEqual(replica_router.get_stats()[0]['failures'], 0)
+
+    def test_read_from_primary_if_replica_is_lagging(self):
+        fill_replica('replica_1', 'rr-01', 0)
+        configure_replicas([get_replica_uri('replica_1')])
+
+        self.assertEqual(GroupModel.get_item_params_dict(1)['name'], 'aa-01')
+
+    def test_read_your_writes(self):
+        fill_replica('replica_1', 'rr-01', 1)
+        configure_replicas([get_replica_uri('replica_1')])
+
+        GroupModel.get_item(1).put_params(name='bb-01')
+
+        self.assertEqual(GroupModel.get_item_params_dict(1)['name'], 'bb-01')
+
+    def test_round_robin(self):
+        fill_replica('replica_1', 'rr-01', 1)
+        fill_replica('replica_2', 'rr-02', 1)
+        configure_replicas([get_replica_uri(database_name) for database_name in REPLICAS_NAMES])
+
+        names = [GroupModel.get_item_params_dict(1)['name'] for _ in range(4)]
+
+        self.assertEqual(sorted(names), ['rr-01', 'rr-01', 'rr-02', 'rr-02'])
+        self.assertNotEqual(names[0], names[1])
+
+    def test_skip_failed_replica(self):
+        fill_replica('replica_2', 'rr-02', 1)
+        failed_uri = str(make_url(postgresql.url()).set(port=1))
+        configure_replicas([failed_uri, get_replica_uri('replica_2')])
+
+        names = [GroupModel.get_item_params_dict(1)['name'] for _ in range(2)]
+
+        self.assertEqual(names, ['rr-02', 'rr-02'])
+        stats = replica_router.get_stats()
+        self.assertEqual([replica_stats['down'] for replica_stats in stats], [True, False])
+        self.assertEqual(stats[0]['failures'], 1)
+
+    def test_read_from_primary_if_all_replicas_failed(self):
+        configure_replicas([str(make_url(postgresql.url()).set(port=1))])
+
+        self.assertEqual(GroupModel.get_item_params_dict(1)['name'], 'aa-01')
+
+    @parameterized.expand([(1,), (2,)])
+    def test_fall_back_if_replica_query_failed(self, failed_query):
+        """replica, which fails the versions or the data query on the established
+        connection, is marked down."""
+        fill_replica('replica_1', 'rr-01', 1)
+        configure_replicas([get_replica_uri('replica_1')])
+        replica = replica_router.replicas[0]
+        connect = replica.engine.connect
+
+        def connect_failing():
+            connection = connect()
+            execute, statements = connection.execute, []
+
+            def execute_failing(statement, *args, **kwargs):
+                statements.append(statement)
+                if len(statements) == failed_query:
+                    raise OperationalError(str(statement), {}, Exception('server closed the connection'))
+                return execute(statement, *args, **kwargs)
+
+            connection.execute = execute_failing
+            return connection
+
+        with mock.patch.object(replica.engine, 'connect', connect_failing):
+            self.assertEqual(GroupModel.get_item_params_dict(1)['name'], 'aa-01')
+
+        stats = replica_router.get_stats()
+        self.assertEqual((stats[0]['down'], stats[0]['failures']), (True, 1))
+
+    def test_list_resource_reads_primary_versions_once(self):
+        fill_replica('replica_1', 'rr-01', 1)
+        configure_replicas([get_replica_uri('replica_1')])
+        statements = []
+
+        def before_cursor_execute(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        event.listen(db.engine, 'before_cursor_execute', before_cursor_execute)
+        try:
+            answer = self.app.get('/groups/')
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', before_cursor_execute)
+
+        self.assertEqual(json.loads(answer.data.decode("utf-8"))[0]['name'], 'rr-01')
+        self.assertEqual(len(statements), 1)
+
+    def test_get_resource_from_replica(self):
+        fill_replica('replica_1', 'rr-01', 1)
+        configure_replicas([get_replica_uri('replica_1')])
+
+        answer = self.app.get('/groups/1/')
+        stats = json.loads(self.app.get('/pool-stats/').data.decode("utf-8"))
+
+        self.assertEqual(json.loads(answer.data.decode("utf-8"))['name'], 'rr-01')
+        self.assertEqual(len(stats['replicas']), 1)
+        self.assertGreaterEqual(stats['replicas'][0]['checkouts'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
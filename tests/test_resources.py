@@ -1,14 +1,35 @@
 import unittest
 import json
+from contextlib import contextmanager
 import testing.postgresql
+from sqlalchemy import update
 from parameterized import parameterized
 from app.config import Configuration
 
 postgresql = testing.postgresql.Postgresql(port=7654)
 Configuration.SQLALCHEMY_DATABASE_URI = postgresql.url()
 
-from app.application import app, db
-from app.models import StudentModel, GroupModel, CourseModel
+from app.application import create_app, db
+from app.cache import item_cache
+from app.metrics import query_budget
+from app.models import StudentModel, GroupModel, CourseModel, bump_tables_versions
+from app.schema import has_trigram_index
+
+app = create_app(Configuration)
+# queries of the tested code should filter by indexed columns
+app.config['CHECK_INDEXED_FILTERS'] = True
+
+
+@contextmanager
+def names_filters_check(*columns):
+    """check filters by the names `columns` only if their trigram indexes exist. they
+    are not created without the `pg_trgm` extension, and the filters scan the table."""
+    app.config['CHECK_INDEXED_FILTERS'] = all(has_trigram_index(db.session.connection(), column)
+                                              for column in columns)
+    try:
+        yield
+    finally:
+        app.config['CHECK_INDEXED_FILTERS'] = True
 
 
 def create_test_students(count=1):
@@ -39,16 +60,25 @@ def create_test_student_with_course():
     student = StudentModel.query.first()
     course = CourseModel.query.first()
     student.courses.append(course)
+    db.session.commit()
+
 
 class TestGetMethodCase(unittest.TestCase):
 
     def setUp(self):
         """clear all data from test database after previous test."""
+        self.app_context = app.app_context()
+        self.app_context.push()
         self.app = app.test_client()
         db.session.commit()
         db.drop_all()
         db.create_all()
         db.session.commit()
+        db.session.remove()
+        item_cache.clear()
+
+    def tearDown(self):
+        self.app_context.pop()
 
     @parameterized.expand([
         ('/students/1/',),
@@ -61,7 +91,8 @@ class TestGetMethodCase(unittest.TestCase):
     def test_without_data(self, route):
         """test GET methods. all resources should return '{}' if no data
          in database or such object not found"""
-        answer = self.app.get(route)
+        with query_budget(1):
+            answer = self.app.get(route)
 
         self.assertEqual(answer.data.decode("utf-8").strip(), '{}')
 
@@ -70,7 +101,8 @@ class TestGetMethodCase(unittest.TestCase):
         returned data should contain name of the group."""
         create_test_groups(1)
 
-        answer = self.app.get('/groups/1/')
+        with query_budget(1):
+            answer = self.app.get('/groups/1/')
         data = json.loads(answer.data.decode("utf-8"))
 
         self.assertEqual(data['name'], 'aa-01')
@@ -82,7 +114,8 @@ class TestGetMethodCase(unittest.TestCase):
         create_test_groups(1)
         create_test_students(1)
 
-        answer = self.app.get('/groups/1/')
+        with query_budget(1):
+            answer = self.app.get('/groups/1/')
         data = json.loads(answer.data.decode("utf-8"))
 
         self.assertEqual(data['students_ids'], [1])
@@ -94,7 +127,8 @@ class TestGetMethodCase(unittest.TestCase):
         create_test_groups(1)
         create_test_students(1)
 
-        answer = self.app.get('/students/1/')
+        with query_budget(1):
+            answer = self.app.get('/students/1/')
         data = json.loads(answer.data.decode("utf-8"))
 
         self.assertEqual(data['first_name'], 'first_name_1')
@@ -108,7 +142,8 @@ class TestGetMethodCase(unittest.TestCase):
         create_test_groups(1)
         create_test_student_with_course()
 
-        answer = self.app.get('/students/1/')
+        with query_budget(1):
+            answer = self.app.get('/students/1/')
         data = json.loads(answer.data.decode("utf-8"))
 
         self.assertEqual(data['courses_ids'], [1])
@@ -119,7 +154,8 @@ class TestGetMethodCase(unittest.TestCase):
         """
         create_test_courses(1)
 
-        answer = self.app.get('/courses/1/')
+        with query_budget(1):
+            answer = self.app.get('/courses/1/')
         data = json.loads(answer.data.decode("utf-8"))
 
         self.assertEqual(data['name'], 'test_name_1')
@@ -133,7 +169,8 @@ class TestGetMethodCase(unittest.TestCase):
         create_test_groups(1)
         create_test_student_with_course()
 
-        answer = self.app.get('/courses/1/')
+        with query_budget(1):
+            answer = self.app.get('/courses/1/')
         data = json.loads(answer.data.decode("utf-8"))
 
         self.assertEqual(data['students_ids'], [1])
@@ -142,7 +179,8 @@ class TestGetMethodCase(unittest.TestCase):
         create_test_groups(1)
         create_test_students(2)
 
-        answer = self.app.get('/students/')
+        with query_budget(2):
+            answer = self.app.get('/students/')
         data = json.loads(answer.data.decode("utf-8"))
 
         self.assertEqual(len(data), 2)
@@ -156,7 +194,8 @@ class TestGetMethodCase(unittest.TestCase):
     def test_courses_list(self):
         create_test_courses(2)
 
-        answer = self.app.get('/courses/')
+        with query_budget(2):
+            answer = self.app.get('/courses/')
         data = json.loads(answer.data.decode("utf-8"))
 
         self.assertEqual(len(data), 2)
@@ -170,7 +209,8 @@ class TestGetMethodCase(unittest.TestCase):
     def test_groups_list(self):
         create_test_groups(2)
 
-        answer = self.app.get('/groups/')
+        with query_budget(2):
+            answer = self.app.get('/groups/')
         data = json.loads(answer.data.decode("utf-8"))
 
         self.assertEqual(len(data), 2)
@@ -179,22 +219,357 @@ class TestGetMethodCase(unittest.TestCase):
         self.assertEqual(data[1]['id'], 2)
         self.assertEqual(data[1]['name'], 'aa-02')
 
+    @parameterized.expand([
+        ('/students/',),
+        ('/courses/',),
+        ('/groups/',),
+    ])
+    def test_list_single_query(self, route):
+        """list resources should run one query independently of rows count."""
+        create_test_groups(20)
+        create_test_students(20)
+        create_test_courses(20)
+
+        with query_budget(2) as statements:
+            answer = self.app.get(route)
+
+        self.assertEqual(len(json.loads(answer.data.decode("utf-8"))), 20)
+        self.assertEqual(len([statement for statement in statements if 'table_versions' not in statement]), 1)
+
+    def test_list_relation_ids(self):
+        create_test_groups(2)
+        create_test_students(2)
+        create_test_courses(2)
+        student = StudentModel.query.first()
+        student.courses.extend(CourseModel.query.all())
+        db.session.commit()
+
+        students = json.loads(self.app.get('/students/').data.decode("utf-8"))
+        groups = json.loads(self.app.get('/groups/').data.decode("utf-8"))
+        courses = json.loads(self.app.get('/courses/').data.decode("utf-8"))
+
+        self.assertEqual(students, [
+            {'id': 1, 'group_id': 1, 'first_name': 'first_name_1', 'last_name': 'last_name_1', 'version': 1,
+             'courses_ids': [1, 2]},
+            {'id': 2, 'group_id': 1, 'first_name': 'first_name_2', 'last_name': 'last_name_2', 'version': 1,
+             'courses_ids': []},
+        ])
+        self.assertEqual(groups, [{'id': 1, 'name': 'aa-01', 'version': 1, 'students_ids': [1, 2]},
+                                  {'id': 2, 'name': 'aa-02', 'version': 1, 'students_ids': []}])
+        self.assertEqual([course['students_ids'] for course in courses], [[1], [1]])
+
+    def test_list_pagination(self):
+        create_test_groups(5)
+
+        with query_budget(2):
+            answer = self.app.get('/groups/?limit=2')
+        data = json.loads(answer.data.decode("utf-8"))
+
+        self.assertEqual([group['id'] for group in data], [1, 2])
+        self.assertEqual(answer.headers['X-Next-Cursor'], '2')
+        self.assertIn('after=2', answer.headers['Link'])
+
+        answer = self.app.get('/groups/?limit=2&after=4')
+        data = json.loads(answer.data.decode("utf-8"))
+
+        self.assertEqual([group['id'] for group in data], [5])
+        self.assertNotIn('X-Next-Cursor', answer.headers)
+        self.assertNotIn('Link', answer.headers)
+
+    def test_list_pagination_follow_cursor(self):
+        create_test_groups(1)
+        create_test_students(7)
+
+        ids = []
+        route = '/students/?limit=3'
+        while route:
+            answer = self.app.get(route)
+            ids.extend(student['id'] for student in json.loads(answer.data.decode("utf-8")))
+            route = answer.headers.get('X-Next-Cursor') and f'/students/?limit=3&after={answer.headers["X-Next-Cursor"]}'
+
+        self.assertEqual(ids, list(range(1, 8)))
+
+    def test_list_pagination_page_size_cap(self):
+        create_test_groups(5)
+        app.config['LIST_PAGE_SIZE_MAX'] = 3
+        try:
+            answer = self.app.get('/groups/?limit=100')
+            after_answer = self.app.get('/groups/?after=1')
+            plain_answer = self.app.get('/groups/')
+        finally:
+            app.config['LIST_PAGE_SIZE_MAX'] = Configuration.LIST_PAGE_SIZE_MAX
+
+        self.assertEqual(len(json.loads(answer.data.decode("utf-8"))), 3)
+        self.assertEqual([group['id'] for group in json.loads(after_answer.data.decode("utf-8"))], [2, 3, 4])
+        self.assertEqual([group['id'] for group in json.loads(plain_answer.data.decode("utf-8"))], [1, 2, 3])
+        self.assertEqual(plain_answer.headers.get('X-Next-Cursor'), '3')
+
+    @parameterized.expand([
+        ('/groups/?limit=0',),
+        ('/groups/?limit=abc',),
+        ('/groups/?after=-1',),
+        ('/groups/?limit=\u00b2',),
+        ('/groups/?after=\u00b2',),
+    ])
+    def test_list_pagination_wrong_params(self, route):
+        create_test_groups(1)
+
+        answer = self.app.get(route)
+
+        self.assertIn('error during operation: ', answer.data.decode("utf-8"))
+
+    @parameterized.expand([
+        ('/students/',),
+        ('/courses/',),
+        ('/groups/',),
+    ])
+    def test_list_ndjson_stream(self, route):
+        create_test_groups(5)
+        create_test_students(5)
+        create_test_courses(5)
+        create_test_student_with_course()
+        db.session.commit()
+        app.config['STREAM_BATCH_SIZE'] = 2
+        try:
+            with query_budget(2):
+                answer = self.app.get(route, headers={'Accept': 'application/x-ndjson'})
+        finally:
+            app.config['STREAM_BATCH_SIZE'] = Configuration.STREAM_BATCH_SIZE
+
+        self.assertEqual(answer.mimetype, 'application/x-ndjson')
+        lines = answer.data.decode("utf-8").splitlines()
+        self.assertEqual([json.loads(line) for line in lines],
+                         json.loads(self.app.get(route).data.decode("utf-8")))
+
+    def test_list_ndjson_stream_after(self):
+        create_test_groups(5)
+
+        answer = self.app.get('/groups/?after=3', headers={'Accept': 'application/x-ndjson'})
+
+        lines = answer.data.decode("utf-8").splitlines()
+        self.assertEqual([json.loads(line)['id'] for line in lines], [4, 5])
+
+    def test_list_filter_by_group_and_course(self):
+        create_test_groups(2)
+        create_test_courses(2)
+        StudentModel.post_items([{'group_id': num % 2 + 1, 'first_name': f'first_name_{num}', 'last_name': 'Smith'}
+                                 for num in range(1, 7)])
+        self.app.post('/enrollments/', json=[{'student_id': student_id, 'course_id': 1} for student_id in (1, 2, 3)])
+
+        with query_budget(2):
+            group_answer = self.app.get('/students/?group_id=2')
+        course_answer = self.app.get('/students/?group_id=2&course_id=1')
+
+        self.assertEqual([student['id'] for student in json.loads(group_answer.data.decode("utf-8"))], [1, 3, 5])
+        # all courses of the filtered students are returned
+        self.assertEqual([(student['id'], student['courses_ids'])
+                          for student in json.loads(course_answer.data.decode("utf-8"))], [(1, [1]), (3, [1])])
+
+    def test_list_filter_by_name(self):
+        for name in ('Mathematics', 'applied math', 'Art', 'math_100%'):
+            CourseModel.post_item(name=name, description='description')
+
+        with names_filters_check(CourseModel.__table__.c.name):
+            prefix_answer = self.app.get('/courses/?name_prefix=MATH')
+            search_answer = self.app.get('/courses/?search=Math')
+            escaped_answer = self.app.get('/courses/?search=0%25')
+
+        self.assertEqual([course['name'] for course in json.loads(prefix_answer.data.decode("utf-8"))],
+                         ['Mathematics', 'math_100%'])
+        self.assertEqual([course['name'] for course in json.loads(search_answer.data.decode("utf-8"))],
+                         ['Mathematics', 'applied math', 'math_100%'])
+        self.assertEqual([course['name'] for course in json.loads(escaped_answer.data.decode("utf-8"))],
+                         ['math_100%'])
+
+    def test_list_filter_students_names(self):
+        create_test_groups(1)
+        StudentModel.post_item(group_id=1, first_name='Liam', last_name='Williams')
+        StudentModel.post_item(group_id=1, first_name='William', last_name='Brown')
+        StudentModel.post_item(group_id=1, first_name='Noah', last_name='Smith')
+
+        with names_filters_check(StudentModel.__table__.c.first_name, StudentModel.__table__.c.last_name):
+            answer = self.app.get('/students/?search=william')
+
+        self.assertEqual([student['id'] for student in json.loads(answer.data.decode("utf-8"))], [1, 2])
+
+    def test_list_filter_with_pagination(self):
+        create_test_groups(2)
+        create_test_students(5)
+        StudentModel.post_items([{'group_id': 2, 'first_name': f'first_name_{num}', 'last_name': 'Smith'}
+                                 for num in range(5)])
+
+        ids = []
+        route = '/students/?group_id=1&limit=2'
+        while route:
+            answer = self.app.get(route)
+            ids.extend(student['id'] for student in json.loads(answer.data.decode("utf-8")))
+            route = answer.headers.get('Link', '')[1:].split('>')[0]
+        stream_answer = self.app.get('/students/?group_id=2&after=7', headers={'Accept': 'application/x-ndjson'})
+
+        self.assertEqual(ids, [1, 2, 3, 4, 5])
+        self.assertEqual([json.loads(line)['id'] for line in stream_answer.data.decode("utf-8").splitlines()],
+                         [8, 9, 10])
+
+    def test_item_fields(self):
+        create_test_groups(1)
+        create_test_student_with_course()
+
+        with query_budget(1) as statements:
+            answer = self.app.get('/students/1/?fields=first_name,last_name')
+
+        self.assertEqual(json.loads(answer.data.decode("utf-8")),
+                         {'id': 1, 'first_name': 'first_name_1', 'last_name': 'last_name_1'})
+        self.assertFalse([statement for statement in statements if 'students_courses_relation' in statement
+                          and 'table_versions' not in statement])
+
+    @parameterized.expand([
+        ('/students/1/', '-version.1'),
+        ('/students/1/?fields=first_name', '-version.1'),
+        ('/students/2/', ''),
+    ])
+    def test_item_single_query(self, route, etag_suffix):
+        create_test_groups(1)
+        create_test_student_with_course()
+
+        with query_budget(1):
+            answer = self.app.get(route)
+        with query_budget(1):
+            cached_answer = self.app.get(route)
+
+        self.assertEqual(answer.data, cached_answer.data)
+        self.assertEqual(answer.headers['ETag'], cached_answer.headers['ETag'])
+        self.assertEqual(answer.headers['ETag'], self.app.get('/students/').headers['ETag'][:-1] + etag_suffix + '"')
+
+    def test_item_fields_from_cache(self):
+        create_test_groups(1)
+        create_test_student_with_course()
+        self.app.get('/students/1/')
+
+        with query_budget(1):
+            answer = self.app.get('/students/1/?fields=courses_ids')
+
+        self.assertEqual(json.loads(answer.data.decode("utf-8")), {'id': 1, 'courses_ids': [1]})
+
+    def test_list_fields(self):
+        create_test_groups(2)
+        create_test_students(3)
+
+        with query_budget(2) as statements:
+            answer = self.app.get('/groups/?fields=name')
+        students_answer = self.app.get('/students/?fields=group_id,courses_ids&limit=2')
+        stream_answer = self.app.get('/groups/?fields=students_ids', headers={'Accept': 'application/x-ndjson'})
+
+        self.assertEqual(json.loads(answer.data.decode("utf-8")), [{'id': 1, 'name': 'aa-01'}, {'id': 2, 'name': 'aa-02'}])
+        self.assertFalse([statement for statement in statements if 'array_agg' in statement])
+        self.assertEqual(json.loads(students_answer.data.decode("utf-8")),
+                         [{'id': 1, 'group_id': 1, 'courses_ids': []}, {'id': 2, 'group_id': 1, 'courses_ids': []}])
+        self.assertEqual(students_answer.headers['X-Next-Cursor'], '2')
+        self.assertIn('fields=group_id%2Ccourses_ids', students_answer.headers['Link'])
+        self.assertEqual([json.loads(line) for line in stream_answer.data.decode("utf-8").splitlines()],
+                         [{'id': 1, 'students_ids': [1, 2, 3]}, {'id': 2, 'students_ids': []}])
+
+    @parameterized.expand([
+        ('/students/?fields=first_name,age',),
+        ('/students/1/?fields=students_ids',),
+    ])
+    def test_unknown_fields(self, route):
+        answer = self.app.get(route)
+
+        self.assertIn('error during operation: unknown fields', answer.data.decode("utf-8"))
+
+    @parameterized.expand([
+        ('/students/?group_id=a',),
+        ('/students/?course_id=-1',),
+        ('/students/?group_id=\u00b2',),
+    ])
+    def test_list_filter_wrong_params(self, route):
+        answer = self.app.get(route)
+
+        self.assertIn('error during operation: ', answer.data.decode("utf-8"))
+
+    @parameterized.expand([
+        ('/students/?ids=3,1,9,1', {'items': [{'id': 1, 'first_name': 'first_name_1', 'last_name': 'last_name_1',
+                                               'group_id': 1, 'version': 1, 'courses_ids': [1]},
+                                              {'id': 3, 'first_name': 'first_name_3', 'last_name': 'last_name_3',
+                                               'group_id': 1, 'version': 1, 'courses_ids': []}],
+                                    'missing_ids': [9]}),
+        ('/groups/?ids=1,2', {'items': [{'id': 1, 'name': 'aa-01', 'version': 1, 'students_ids': [1, 2, 3]},
+                                        {'id': 2, 'name': 'aa-02', 'version': 1, 'students_ids': []}],
+                              'missing_ids': []}),
+        ('/courses/?ids=2&fields=students_ids', {'items': [], 'missing_ids': [2]}),
+        ('/students/?ids=1,2,3&search=_2&fields=first_name',
+         {'items': [{'id': 2, 'first_name': 'first_name_2'}], 'missing_ids': [1, 3]}),
+        ('/students/?ids=', {'items': [], 'missing_ids': []}),
+    ])
+    def test_list_batch(self, route, data):
+        create_test_groups(2)
+        create_test_students(3)
+        create_test_courses(1)
+        student = StudentModel.get_item(1)
+        student.courses.append(CourseModel.get_item(1))
+        db.session.commit()
+
+        with query_budget(2):
+            answer = self.app.get(route)
+
+        self.assertEqual(json.loads(answer.data.decode("utf-8")), data)
+
+    def test_list_batch_from_cache(self):
+        create_test_groups(1)
+        create_test_students(3)
+        self.app.get('/students/?ids=1,2')
+
+        with query_budget(1):
+            answer = self.app.get('/students/?ids=1,2')
+
+        self.assertEqual([item['id'] for item in json.loads(answer.data.decode("utf-8"))['items']], [1, 2])
+
+    @parameterized.expand([
+        ('/students/?ids=1,a', 'comma separated non-negative integers'),
+        ('/students/?ids=1,-2', 'comma separated non-negative integers'),
+        ('/students/?ids=1,\u00b2', 'comma separated non-negative integers'),
+        ('/groups/?ids=1&limit=2', 'can not be combined'),
+        ('/courses/?ids={}'.format(','.join(map(str, range(1002)))), 'not more than 1000 ids'),
+    ])
+    def test_list_batch_wrong_params(self, route, message):
+        answer = self.app.get(route)
+
+        self.assertIn(message, answer.data.decode("utf-8"))
+        self.assertIn('error during operation: ', answer.data.decode("utf-8"))
+
+    def test_pool_stats(self):
+        with query_budget(0):
+            answer = self.app.get('/pool-stats/')
+        stats = json.loads(answer.data.decode("utf-8"))
+
+        self.assertEqual(stats['size'], Configuration.SQLALCHEMY_ENGINE_OPTIONS['pool_size'])
+        self.assertGreaterEqual(stats['checkouts'], 1)
+        self.assertEqual(stats['timeouts'], 0)
+
 
 class TestPostMethodCase(unittest.TestCase):
 
     def setUp(self):
         """clear all data from test database after previous test."""
+        self.app_context = app.app_context()
+        self.app_context.push()
         self.app = app.test_client()
         db.session.commit()
         db.drop_all()
         db.create_all()
         db.session.commit()
+        db.session.remove()
+        item_cache.clear()
+
+    def tearDown(self):
+        self.app_context.pop()
 
     def test_student(self):
         create_test_groups()
-        self.app.post('/students/', data={'first_name': 'test_first_name',
-                      'last_name': 'test_last_name',
-                      'group_id': 1})
+        with query_budget(2):
+            self.app.post('/students/', data={'first_name': 'test_first_name',
+                          'last_name': 'test_last_name',
+                          'group_id': 1})
 
         students = StudentModel.query.all()
 
@@ -229,8 +604,9 @@ class TestPostMethodCase(unittest.TestCase):
         self.assertEqual(len(students), 0)
 
     def test_course(self):
-        self.app.post('/courses/', data={'name': 'test_name',
-                                         'description': 'test_description'})
+        with query_budget(2):
+            self.app.post('/courses/', data={'name': 'test_name',
+                                             'description': 'test_description'})
 
         courses = CourseModel.query.all()
 
@@ -249,7 +625,8 @@ class TestPostMethodCase(unittest.TestCase):
         self.assertEqual(len(courses), 0)
 
     def test_group(self):
-        self.app.post('/groups/', data={'name': 'aa-11'})
+        with query_budget(2):
+            self.app.post('/groups/', data={'name': 'aa-11'})
         groups = GroupModel.query.all()
 
         self.assertEqual(len(groups), 1)
@@ -274,21 +651,74 @@ class TestPostMethodCase(unittest.TestCase):
 
         self.assertEqual(len(groups), 0)
 
+    def test_students_bulk(self):
+        create_test_groups()
+        students = [{'first_name': f'first_name_{num}', 'last_name': f'last_name_{num}', 'group_id': 1}
+                    for num in range(5)]
+
+        with query_budget(2):
+            answer = self.app.post('/students/', json=students)
+
+        self.assertEqual(json.loads(answer.data.decode("utf-8")), [1, 2, 3, 4, 5])
+        self.assertEqual([student.first_name for student in StudentModel.query.order_by(StudentModel.id)],
+                         [student['first_name'] for student in students])
+
+    def test_groups_bulk_with_incorrect_name(self):
+        answer = self.app.post('/groups/', json=[{'name': 'aa-11'}, {'name': 'test_name'}, {}])
+
+        self.assertIn('error during operation: item 1: wrong group name format.; '
+                      'item 2: wrong group name format.', answer.data.decode("utf-8"))
+
+        self.assertEqual(len(GroupModel.query.all()), 0)
+
+    @parameterized.expand([
+        ('/groups/', [{'name': 5}], 'item 0: wrong group name format.'),
+        ('/courses/', [{'name': 'test_name', 'description': {'text': 'test_description'}}],
+         'item 0: `description` parameter has wrong type'),
+        ('/students/', [{'first_name': ['test_first_name'], 'last_name': 'test_last_name', 'group_id': 1}],
+         'item 0: `first_name` parameter has wrong type'),
+        ('/students/', [{'first_name': 'test_first_name', 'last_name': 'test_last_name', 'group_id': True}],
+         'item 0: `group_id` parameter has wrong type'),
+    ])
+    def test_bulk_with_wrong_types(self, route, items, message):
+        create_test_groups()
+
+        answer = self.app.post(route, json=items)
+
+        self.assertEqual(answer.status_code, 200)
+        self.assertIn('error during operation: ' + message, answer.data.decode("utf-8"))
+
+    def test_courses_bulk_single_transaction(self):
+        with query_budget(2) as statements:
+            self.app.post('/courses/', json=[{'name': f'test_name_{num}', 'description': 'test_description'}
+                                             for num in range(10)])
+
+        self.assertEqual(len(CourseModel.query.all()), 10)
+        self.assertEqual(len([statement for statement in statements if statement.startswith('INSERT INTO courses')]), 1)
+
 
 class TestPutMethodCase(unittest.TestCase):
     def setUp(self):
         """clear all data from test database after previous test."""
+        self.app_context = app.app_context()
+        self.app_context.push()
         self.app = app.test_client()
         db.session.commit()
         db.drop_all()
         db.create_all()
         db.session.commit()
+        db.session.remove()
+        item_cache.clear()
+
+    def tearDown(self):
+        self.app_context.pop()
 
     def test_student(self):
         create_test_groups()
         create_test_students(1)
 
-        self.app.put('/students/1/', data={'first_name': 'changed_first_name'})
+        with query_budget(2):
+            self.app.put('/students/1/', data={'first_name': 'changed_first_name'})
 
         student = StudentModel.query.first()
 
@@ -300,9 +730,10 @@ class TestPutMethodCase(unittest.TestCase):
         create_test_groups(2)
         create_test_students(1)
 
-        self.app.put('/students/1/', data={'first_name': 'changed_first_name',
-                                           'last_name': 'changed_last_name',
-                                           'group_id': 2})
+        with query_budget(2):
+            self.app.put('/students/1/', data={'first_name': 'changed_first_name',
+                                               'last_name': 'changed_last_name',
+                                               'group_id': 2})
 
         student = StudentModel.query.first()
 
@@ -326,7 +757,8 @@ class TestPutMethodCase(unittest.TestCase):
         create_test_groups()
         create_test_students(1)
 
-        answer = self.app.put('/students/100/', data={'group_id': 2})
+        with query_budget(1):
+            answer = self.app.put('/students/100/', data={'group_id': 2})
 
         self.assertIn('item with id 100 not exist in students model.', answer.data.decode("utf-8"))
 
@@ -337,7 +769,8 @@ class TestPutMethodCase(unittest.TestCase):
     def test_group(self):
         create_test_groups(1)
 
-        self.app.put('/groups/1/', data={'name': 'aa-99'})
+        with query_budget(2):
+            self.app.put('/groups/1/', data={'name': 'aa-99'})
 
         group = GroupModel.query.first()
 
@@ -357,7 +790,8 @@ class TestPutMethodCase(unittest.TestCase):
     def test_group_with_wrong_id(self):
         create_test_groups(1)
 
-        answer = self.app.put('/groups/100/', data={'name': 'test_name'})
+        with query_budget(1):
+            answer = self.app.put('/groups/100/', data={'name': 'test_name'})
 
         self.assertIn('item with id 100 not exist in groups model.', answer.data.decode("utf-8"))
 
@@ -368,7 +802,8 @@ class TestPutMethodCase(unittest.TestCase):
     def test_courses(self):
         create_test_courses(1)
 
-        self.app.put('/courses/1/', data={'name': 'changed_name'})
+        with query_budget(2):
+            self.app.put('/courses/1/', data={'name': 'changed_name'})
 
         course = CourseModel.query.first()
 
@@ -378,7 +813,8 @@ class TestPutMethodCase(unittest.TestCase):
     def test_courses_with_few_changes(self):
         create_test_courses(1)
 
-        self.app.put('/courses/1/', data={'name': 'changed_name', 'description': 'changed_description'})
+        with query_budget(2):
+            self.app.put('/courses/1/', data={'name': 'changed_name', 'description': 'changed_description'})
 
         course = CourseModel.query.first()
 
@@ -388,7 +824,8 @@ class TestPutMethodCase(unittest.TestCase):
     def test_courses_with_wrong_id(self):
         create_test_courses(1)
 
-        answer = self.app.put('/courses/100/', data={'name': 'changed_name'})
+        with query_budget(1):
+            answer = self.app.put('/courses/100/', data={'name': 'changed_name'})
 
         self.assertIn('item with id 100 not exist in courses model.', answer.data.decode("utf-8"))
 
@@ -396,29 +833,165 @@ class TestPutMethodCase(unittest.TestCase):
 
         self.assertEqual(course.name, 'test_name_1')
 
+    def test_version(self):
+        create_test_groups(1)
+
+        self.app.put('/groups/1/', data={'name': 'bb-01'})
+        self.app.put('/groups/1/', data={'name': 'cc-01'})
+
+        self.assertEqual(json.loads(self.app.get('/groups/1/').data.decode("utf-8"))['version'], 3)
+
+    @parameterized.expand([
+        ('"1"',),
+        ('"3", "1"',),
+        ('*',),
+    ])
+    def test_if_match(self, if_match):
+        create_test_groups(1)
+        self.app.get('/groups/1/')
+
+        with query_budget(2):
+            answer = self.app.put('/groups/1/', data={'name': 'bb-01'}, headers={'If-Match': if_match})
+
+        self.assertEqual(answer.status_code, 200)
+        self.assertEqual(json.loads(self.app.get('/groups/1/').data.decode("utf-8")),
+                         {'id': 1, 'name': 'bb-01', 'version': 2, 'students_ids': []})
+
+    @parameterized.expand([
+        ('"2"',),
+        ('W/"1"',),
+    ])
+    def test_if_match_conflict(self, if_match):
+        create_test_groups(1)
+
+        with query_budget(1):
+            answer = self.app.put('/groups/1/', data={'name': 'bb-01'}, headers={'If-Match': if_match})
+
+        self.assertEqual(answer.status_code, 412)
+        self.assertIn('error during operation: item 1 of groups table was changed',
+                      answer.data.decode("utf-8"))
+        group = GroupModel.query.first()
+        self.assertEqual((group.name, group.version), ('aa-01', 1))
+
+    def test_if_match_lost_update(self):
+        create_test_groups(1)
+        etag = '"{}"'.format(json.loads(self.app.get('/groups/1/').data.decode("utf-8"))['version'])
+
+        first_answer = self.app.put('/groups/1/', data={'name': 'bb-01'}, headers={'If-Match': etag})
+        second_answer = self.app.put('/groups/1/', data={'name': 'cc-01'}, headers={'If-Match': etag})
+
+        self.assertEqual((first_answer.status_code, second_answer.status_code), (200, 412))
+        self.assertEqual(GroupModel.query.first().name, 'bb-01')
+
+    def test_if_match_item_etag(self):
+        create_test_groups(1)
+        etag = self.app.get('/groups/1/').headers['ETag']
+
+        first_answer = self.app.put('/groups/1/', data={'name': 'bb-01'}, headers={'If-Match': etag})
+        second_answer = self.app.put('/groups/1/', data={'name': 'cc-01'}, headers={'If-Match': etag})
+        new_etag = self.app.get('/groups/1/').headers['ETag']
+
+        self.assertEqual((first_answer.status_code, second_answer.status_code), (200, 412))
+        self.assertEqual(GroupModel.query.first().name, 'bb-01')
+        self.assertTrue(new_etag.endswith('-version.2"'))
+        self.assertEqual(self.app.put('/groups/1/', data={'name': 'cc-01'}, headers={'If-Match': new_etag}).status_code,
+                         200)
+
+    @parameterized.expand([
+        ({},),
+        ({'Accept-Encoding': 'gzip'},),
+    ])
+    def test_if_match_item_etag_round_trip(self, headers):
+        create_test_groups(1)
+        app.config['COMPRESSION_MIN_SIZE'] = 0
+        try:
+            answer = self.app.get('/groups/1/', headers=headers)
+        finally:
+            app.config['COMPRESSION_MIN_SIZE'] = Configuration.COMPRESSION_MIN_SIZE
+
+        put_answer = self.app.put('/groups/1/', data={'name': 'bb-01'}, headers={'If-Match': answer.headers['ETag']})
+
+        self.assertEqual(answer.headers.get('Content-Encoding'), headers.get('Accept-Encoding'))
+        self.assertEqual(put_answer.status_code, 200)
+        self.assertEqual(GroupModel.query.first().name, 'bb-01')
+
+    def test_if_match_etag_of_other_resource(self):
+        create_test_groups(1)
+        create_test_students(1)
+        etag = self.app.get('/students/1/').headers['ETag']
+
+        answer = self.app.put('/groups/1/', data={'name': 'bb-01'}, headers={'If-Match': etag})
+
+        self.assertTrue(etag.endswith('-version.1"'))
+        self.assertEqual(answer.status_code, 412)
+        self.assertEqual(GroupModel.query.first().name, 'aa-01')
+
+    @parameterized.expand([
+        ('"a"',),
+        ('"groups.1"',),
+    ])
+    def test_if_match_not_item_etag(self, if_match):
+        create_test_groups(1)
+
+        answer = self.app.put('/groups/1/', data={'name': 'bb-01'}, headers={'If-Match': if_match})
+
+        self.assertEqual(answer.status_code, 412)
+        self.assertEqual(GroupModel.query.first().name, 'aa-01')
+
+    @parameterized.expand([
+        ('"1"', {'name': 'bb-01'}),
+        ('*', {'name': 'bb-01'}),
+        ('"1"', {'name': 'test_name'}),
+    ])
+    def test_if_match_with_wrong_id(self, if_match, params):
+        create_test_groups(1)
+
+        with query_budget(1):
+            answer = self.app.put('/groups/100/', data=params, headers={'If-Match': if_match})
+
+        self.assertEqual(answer.status_code, 412)
+        self.assertIn('item with id 100 not exist in groups model.', answer.data.decode("utf-8"))
+
+    def test_student_group_cache(self):
+        create_test_groups(2)
+        create_test_students(1)
+        self.app.get('/groups/1/')
+        self.app.get('/groups/2/')
+
+        self.app.put('/students/1/', data={'group_id': 2}, headers={'If-Match': '"1"'})
+
+        self.assertEqual(json.loads(self.app.get('/groups/1/').data.decode("utf-8"))['students_ids'], [])
+        self.assertEqual(json.loads(self.app.get('/groups/2/').data.decode("utf-8"))['students_ids'], [1])
+
 
 class TestDeleteMethodCase(unittest.TestCase):
     def setUp(self):
         """clear all data from test database after previous test."""
+        self.app_context = app.app_context()
+        self.app_context.push()
         db.session.commit()
         self.app = app.test_client()
         db.drop_all()
         db.create_all()
         db.session.commit()
+        db.session.remove()
+        item_cache.clear()
+
+    def tearDown(self):
+        self.app_context.pop()
 
     @parameterized.expand([
-        (StudentModel, 'students'),
-        (CourseModel, 'courses'),
-        (GroupModel, 'groups'),
+        (StudentModel, 'students', 6),
+        (CourseModel, 'courses', 6),
+        (GroupModel, 'groups', 5),
     ])
-    def test_models_delete_method(self, model, table_name):
+    def test_models_delete_method(self, model, table_name, max_statements):
         create_test_groups(2)
         create_test_students(2)
         create_test_courses(2)
 
-        self.app.delete(f'/{table_name}/2/')
-
-        print(model.delete_item)
+        with query_budget(max_statements):
+            self.app.delete(f'/{table_name}/2/')
 
         items = model.query.all()
 
@@ -436,7 +1009,8 @@ class TestDeleteMethodCase(unittest.TestCase):
         create_test_students(1)
         create_test_courses(1)
 
-        answer = self.app.delete(f'/{table_name}/100/')
+        with query_budget(2):
+            answer = self.app.delete(f'/{table_name}/100/')
 
         self.assertIn(f'item 100 was not found in {table_name} table.', answer.data.decode("utf-8"))
 
@@ -448,7 +1022,8 @@ class TestDeleteMethodCase(unittest.TestCase):
         create_test_groups(1)
         create_test_students(2)
 
-        answer = self.app.delete('/groups/1/')
+        with query_budget(2):
+            answer = self.app.delete('/groups/1/')
 
         self.assertIn('error during operation: cannot delete the group with students. Student ids: 1, 2',
                       answer.data.decode("utf-8"))
@@ -461,7 +1036,8 @@ class TestDeleteMethodCase(unittest.TestCase):
         create_test_groups(1)
         create_test_student_with_course()
 
-        self.app.delete('/students/1/')
+        with query_budget(6):
+            self.app.delete('/students/1/')
 
         self.assertFalse(StudentModel.query.all())
         self.assertFalse(CourseModel.query.first().students)
@@ -470,11 +1046,305 @@ class TestDeleteMethodCase(unittest.TestCase):
         create_test_groups(1)
         create_test_student_with_course()
 
-        self.app.delete('/courses/1/')
+        with query_budget(6):
+            self.app.delete('/courses/1/')
 
         self.assertFalse(CourseModel.query.all())
         self.assertFalse(StudentModel.query.first().courses)
 
 
+class TestConditionalGetCase(unittest.TestCase):
+    def setUp(self):
+        """clear all data from test database after previous test."""
+        self.app_context = app.app_context()
+        self.app_context.push()
+        self.app = app.test_client()
+        db.session.commit()
+        db.drop_all()
+        db.create_all()
+        db.session.commit()
+        db.session.remove()
+        item_cache.clear()
+
+    def tearDown(self):
+        self.app_context.pop()
+
+    @parameterized.expand([
+        ('/students/1/',),
+        ('/courses/1/',),
+        ('/groups/1/',),
+        ('/students/',),
+        ('/courses/',),
+        ('/groups/',),
+    ])
+    def test_not_modified(self, route):
+        self.app.post('/groups/', data={'name': 'aa-01'})
+        self.app.post('/students/', data={'first_name': 'first_name', 'last_name': 'last_name', 'group_id': 1})
+        self.app.post('/courses/', data={'name': 'test_name', 'description': 'test_description'})
+
+        etag = self.app.get(route).headers['ETag']
+        with query_budget(1) as statements:
+            answer = self.app.get(route, headers={'If-None-Match': etag})
+
+        self.assertEqual(answer.status_code, 304)
+        self.assertEqual(answer.data, b'')
+        self.assertEqual(answer.headers['ETag'], etag)
+        self.assertEqual(len(statements), 1)
+        self.assertIn('table_versions', statements[0])
+
+    def test_modified_by_put(self):
+        self.app.post('/groups/', data={'name': 'aa-01'})
+        etag = self.app.get('/groups/1/').headers['ETag']
+
+        self.app.put('/groups/1/', data={'name': 'aa-02'})
+        answer = self.app.get('/groups/1/', headers={'If-None-Match': etag})
+
+        self.assertEqual(answer.status_code, 200)
+        self.assertNotEqual(answer.headers['ETag'], etag)
+        self.assertEqual(json.loads(answer.data.decode("utf-8"))['name'], 'aa-02')
+
+    def test_modified_by_related_table(self):
+        self.app.post('/groups/', data={'name': 'aa-01'})
+        self.app.post('/courses/', data={'name': 'test_name', 'description': 'test_description'})
+        etag = self.app.get('/groups/').headers['ETag']
+        courses_etag = self.app.get('/courses/').headers['ETag']
+
+        self.app.post('/students/', data={'first_name': 'first_name', 'last_name': 'last_name', 'group_id': 1})
+        self.app.post('/enrollments/', json=[{'student_id': 1, 'course_id': 1}])
+
+        self.assertEqual(self.app.get('/groups/', headers={'If-None-Match': etag}).status_code, 200)
+        self.assertEqual(self.app.get('/courses/', headers={'If-None-Match': courses_etag}).status_code, 200)
+
+    def test_modified_by_delete(self):
+        self.app.post('/courses/', data={'name': 'test_name', 'description': 'test_description'})
+        etag = self.app.get('/courses/1/').headers['ETag']
+
+        self.app.delete('/courses/1/')
+
+        self.assertEqual(self.app.get('/courses/1/', headers={'If-None-Match': etag}).status_code, 200)
+
+    def test_not_modified_since(self):
+        self.app.post('/groups/', data={'name': 'aa-01'})
+        last_modified = self.app.get('/groups/1/').headers['Last-Modified']
+
+        answer = self.app.get('/groups/1/', headers={'If-Modified-Since': last_modified})
+
+        self.assertEqual(answer.status_code, 304)
+
+
+class TestItemCacheCase(unittest.TestCase):
+    def setUp(self):
+        """clear all data from test database after previous test."""
+        self.app_context = app.app_context()
+        self.app_context.push()
+        self.app = app.test_client()
+        db.session.commit()
+        db.drop_all()
+        db.create_all()
+        db.session.commit()
+        db.session.remove()
+        item_cache.clear()
+
+    def tearDown(self):
+        self.app_context.pop()
+
+    def get_json(self, route):
+        return json.loads(self.app.get(route).data.decode("utf-8"))
+
+    def test_cached_item(self):
+        create_test_groups(1)
+        create_test_students(1)
+
+        self.get_json('/students/1/')
+        with query_budget(1) as statements:
+            data = self.get_json('/students/1/')
+
+        self.assertEqual(data['first_name'], 'first_name_1')
+        self.assertEqual([statement for statement in statements if 'table_versions' not in statement], [])
+        self.assertEqual(self.get_json('/cache-stats/'), {'hits': 1, 'misses': 1, 'size': 1})
+
+    def test_cached_item_after_write_of_other_process(self):
+        """the item, changed without eviction from this process cache, is read again."""
+        create_test_groups(1)
+        create_test_students(1)
+        etag = self.app.get('/students/1/').headers['ETag']
+
+        db.session.execute(update(StudentModel.__table__).where(StudentModel.id == 1).values(first_name='changed'))
+        bump_tables_versions('students')
+        db.session.commit()
+
+        with query_budget(2):
+            answer = self.app.get('/students/1/', headers={'If-None-Match': etag})
+
+        self.assertEqual(answer.status_code, 200)
+        self.assertEqual(json.loads(answer.data.decode("utf-8"))['first_name'], 'changed')
+        self.assertEqual(answer.headers['ETag'], self.app.get('/students/').headers['ETag'][:-1] + '-version.1"')
+
+    def test_cached_page(self):
+        self.app.post('/groups/', json=[{'name': 'aa-01'}, {'name': 'aa-02'}])
+
+        self.get_json('/groups/?limit=1')
+        with query_budget(1) as statements:
+            answer = self.app.get('/groups/?limit=1')
+
+        self.assertEqual(json.loads(answer.data.decode("utf-8"))[0]['name'], 'aa-01')
+        self.assertEqual(answer.headers['X-Next-Cursor'], '1')
+        self.assertEqual([statement for statement in statements if 'table_versions' not in statement], [])
+
+    def test_page_after_write(self):
+        self.app.post('/groups/', data={'name': 'aa-01'})
+        self.get_json('/groups/?limit=1')
+
+        self.app.put('/groups/1/', data={'name': 'aa-02'})
+
+        self.assertEqual(self.get_json('/groups/?limit=1')[0]['name'], 'aa-02')
+
+    def test_put_invalidation(self):
+        create_test_groups(2)
+        create_test_students(1)
+        self.get_json('/students/1/')
+        self.get_json('/groups/1/')
+        self.get_json('/groups/2/')
+
+        self.app.put('/students/1/', data={'group_id': 2, 'first_name': 'changed_name'})
+
+        self.assertEqual(self.get_json('/students/1/')['first_name'], 'changed_name')
+        self.assertEqual(self.get_json('/groups/1/')['students_ids'], [])
+        self.assertEqual(self.get_json('/groups/2/')['students_ids'], [1])
+
+    def test_post_invalidation(self):
+        create_test_groups(1)
+        self.get_json('/groups/1/')
+
+        self.app.post('/students/', data={'first_name': 'first_name', 'last_name': 'last_name', 'group_id': 1})
+        self.app.post('/students/', json=[{'first_name': 'first_name', 'last_name': 'last_name', 'group_id': 1}])
+
+        self.assertEqual(self.get_json('/groups/1/')['students_ids'], [1, 2])
+
+    def test_delete_invalidation(self):
+        create_test_groups(1)
+        create_test_student_with_course()
+        db.session.commit()
+        self.get_json('/students/1/')
+        self.get_json('/groups/1/')
+        self.get_json('/courses/1/')
+
+        self.app.delete('/students/1/')
+
+        self.assertEqual(self.get_json('/students/1/'), {})
+        self.assertEqual(self.get_json('/groups/1/')['students_ids'], [])
+        self.assertEqual(self.get_json('/courses/1/')['students_ids'], [])
+
+    def test_enrollment_invalidation(self):
+        create_test_groups(1)
+        create_test_students(1)
+        create_test_courses(1)
+        self.get_json('/students/1/')
+        self.get_json('/courses/1/')
+
+        self.app.post('/enrollments/', json=[{'student_id': 1, 'course_id': 1}])
+
+        self.assertEqual(self.get_json('/students/1/')['courses_ids'], [1])
+        self.assertEqual(self.get_json('/courses/1/')['students_ids'], [1])
+
+        self.app.delete('/enrollments/', json=[{'student_id': 1, 'course_id': 1}])
+
+        self.assertEqual(self.get_json('/students/1/')['courses_ids'], [])
+        self.assertEqual(self.get_json('/courses/1/')['students_ids'], [])
+
+
+class TestEnrollmentCase(unittest.TestCase):
+    def setUp(self):
+        """clear all data from test database after previous test."""
+        self.app_context = app.app_context()
+        self.app_context.push()
+        self.app = app.test_client()
+        db.session.commit()
+        db.drop_all()
+        db.create_all()
+        db.session.commit()
+        db.session.remove()
+        item_cache.clear()
+
+    def tearDown(self):
+        self.app_context.pop()
+
+    def test_enroll(self):
+        create_test_groups(1)
+        create_test_students(2)
+        create_test_courses(2)
+        pairs = [{'student_id': 1, 'course_id': 1}, {'student_id': 1, 'course_id': 2},
+                 {'student_id': 2, 'course_id': 2}]
+
+        with query_budget(2) as statements:
+            answer = self.app.post('/enrollments/', json=pairs)
+
+        self.assertEqual(json.loads(answer.data.decode("utf-8")), {'enrolled': 3})
+        self.assertEqual(len([statement for statement in statements if 'table_versions' not in statement]), 1)
+        self.assertEqual([course.id for course in StudentModel.get_item(1).courses], [1, 2])
+        self.assertEqual([course.id for course in StudentModel.get_item(2).courses], [2])
+
+    def test_enroll_existing_pairs(self):
+        create_test_groups(1)
+        create_test_students(1)
+        create_test_courses(2)
+        with query_budget(2):
+            self.app.post('/enrollments/', json=[{'student_id': 1, 'course_id': 1}])
+
+        answer = self.app.post('/enrollments/', json=[{'student_id': 1, 'course_id': 1},
+                                                      {'student_id': 1, 'course_id': 2}])
+
+        self.assertEqual(json.loads(answer.data.decode("utf-8")), {'enrolled': 1})
+        self.assertEqual(len(StudentModel.get_item(1).courses), 2)
+
+    @parameterized.expand([
+        ([{'student_id': 1, 'course_id': 100}], 'incorrect data.'),
+        ([{'student_id': 1}], 'item 0: integer `student_id` and `course_id` expected.'),
+        ({'student_id': 1, 'course_id': 1}, 'json array of enrollments expected.'),
+        ([{'student_id': True, 'course_id': 1}], 'item 0: integer `student_id` and `course_id` expected.'),
+        ([{'student_id': 1, 'course_id': 2 ** 40}], 'item 0: integer `student_id` and `course_id` expected.'),
+    ])
+    def test_enroll_incorrect_data(self, pairs, message):
+        create_test_groups(1)
+        create_test_students(1)
+        create_test_courses(1)
+
+        answer = self.app.post('/enrollments/', json=pairs)
+
+        self.assertIn(f'error during operation: {message}', answer.data.decode("utf-8"))
+        self.assertFalse(StudentModel.get_item(1).courses)
+
+    @parameterized.expand([
+        ([{'student_id': 1, 'course_id': True}],),
+        ([{'student_id': -2 ** 40, 'course_id': 1}],),
+    ])
+    def test_unenroll_incorrect_data(self, pairs):
+        create_test_groups(1)
+        create_test_students(1)
+        create_test_courses(1)
+        self.app.post('/enrollments/', json=[{'student_id': 1, 'course_id': 1}])
+
+        answer = self.app.delete('/enrollments/', json=pairs)
+
+        self.assertIn('error during operation: item 0: integer `student_id` and `course_id` expected.',
+                      answer.data.decode("utf-8"))
+        self.assertEqual(len(StudentModel.get_item(1).courses), 1)
+
+    def test_unenroll(self):
+        create_test_groups(1)
+        create_test_students(2)
+        create_test_courses(2)
+        with query_budget(2):
+            self.app.post('/enrollments/', json=[{'student_id': 1, 'course_id': 1}, {'student_id': 1, 'course_id': 2},
+                                                 {'student_id': 2, 'course_id': 2}])
+
+        answer = self.app.delete('/enrollments/', json=[{'student_id': 1, 'course_id': 2},
+                                                        {'student_id': 2, 'course_id': 1}])
+
+        self.assertEqual(json.loads(answer.data.decode("utf-8")), {'unenrolled': 1})
+        self.assertEqual([course.id for course in StudentModel.get_item(1).courses], [1])
+        self.assertEqual([course.id for course in StudentModel.get_item(2).courses], [2])
+
+
 if __name__ == '__main__':
     unittest.main()
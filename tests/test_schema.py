@@ -0,0 +1,229 @@
+import unittest
+import os
+import re
+import tempfile
+import testing.postgresql
+from sqlalchemy import inspect, select, text, update
+from sqlalchemy.exc import IntegrityError
+from app.config import Configuration
+
+postgresql = testing.postgresql.Postgresql(port=7654)
+Configuration.SQLALCHEMY_DATABASE_URI = postgresql.url()
+
+from app.application import create_app, db
+from app.cache import item_cache
+from app.models import StudentModel, GroupModel, CourseModel, students_courses_relation, schema_migrations
+from app.schema import MIGRATIONS_PATH, UnindexedFilterError, apply_migrations, get_migrations, \
+    get_concurrent_indexes_names, get_statements, get_unindexed_filter_columns, has_trigram_index
+
+app = create_app(Configuration)
+app.config['CHECK_INDEXED_FILTERS'] = True
+
+LOOKUP_INDEXES = {
+    'students': {'students_group_id_idx'},
+    'students_courses_relation': {'students_courses_relation_course_id_idx'},
+}
+
+
+def get_indexes_names(table_name):
+    return {index['name'] for index in inspect(db.engine).get_indexes(table_name)}
+
+
+class TestMigrationsCase(unittest.TestCase):
+
+    def setUp(self):
+        """create tables without the lookup indexes, as in the databases, created before
+        the migrations."""
+        self.app_context = app.app_context()
+        self.app_context.push()
+        db.session.commit()
+        db.drop_all()
+        db.create_all()
+        for table_name, indexes_names in LOOKUP_INDEXES.items():
+            for index_name in indexes_names:
+                db.session.execute(f'DROP INDEX {index_name}')
+        db.session.commit()
+        db.session.remove()
+        item_cache.clear()
+
+    def tearDown(self):
+        db.session.remove()
+        self.app_context.pop()
+
+    def test_get_migrations(self):
+        migrations = get_migrations()
+
+        self.assertEqual(migrations[0][:2], (1, 'add_lookup_indexes'))
+        self.assertEqual([version for version, _, _ in migrations], sorted({version for version, _, _ in migrations}))
+
+    def test_apply_migrations(self):
+        applied_names = apply_migrations(db.engine)
+
+        self.assertEqual(applied_names[0], '0001_add_lookup_indexes')
+        for table_name, indexes_names in LOOKUP_INDEXES.items():
+            self.assertLessEqual(indexes_names, get_indexes_names(table_name))
+        versions = db.session.execute(select(schema_migrations.c.version)).scalars().all()
+        self.assertEqual(len(versions), len(get_migrations()))
+
+    def test_apply_migrations_once(self):
+        apply_migrations(db.engine)
+
+        self.assertEqual(apply_migrations(db.engine), [])
+
+    def test_apply_migrations_with_duplicate_enrollments(self):
+        """databases, created by the old `create_tables.sql`, have no unique constraint of
+        the enrollments, and the failed build of the unique index leaves it invalid."""
+        db.session.add(GroupModel('aa-01'))
+        db.session.add(CourseModel('math', 'description'))
+        db.session.add(StudentModel(1, 'first_name', 'last_name'))
+        db.session.flush()
+        db.session.execute(text('ALTER TABLE students_courses_relation '
+                                'DROP CONSTRAINT students_courses_relation_student_id_course_id_key, '
+                                'DROP CONSTRAINT students_courses_relation_pkey'))
+        db.session.execute(text('INSERT INTO students_courses_relation (student_id, course_id) '
+                                'VALUES (1, 1), (1, 1)'))
+        db.session.commit()
+        with db.engine.connect().execution_options(isolation_level='AUTOCOMMIT') as connection:
+            with self.assertRaises(IntegrityError):
+                connection.exec_driver_sql('CREATE UNIQUE INDEX CONCURRENTLY '
+                                           'students_courses_relation_student_id_course_id_key '
+                                           'ON students_courses_relation (student_id, course_id)')
+
+        apply_migrations(db.engine)
+
+        self.assertEqual(db.session.execute(select(students_courses_relation)).all(), [(1, 1)])
+        self.assertTrue(db.session.execute(text(
+            "SELECT indisvalid FROM pg_index "
+            "WHERE indexrelid = 'students_courses_relation_student_id_course_id_key'::regclass")).scalar())
+
+    def test_get_concurrent_indexes_names(self):
+        self.assertEqual(get_concurrent_indexes_names([
+            '-- comment\nCREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS a_idx ON a (b)',
+            'create index concurrently if not exists b_idx on b (c)',
+            'CREATE INDEX c_idx ON c (d)',
+        ]), ['a_idx', 'b_idx'])
+
+    def test_transaction_migration_rollback(self):
+        migrations_path = tempfile.mkdtemp()
+        with open(os.path.join(migrations_path, '0001_broken.sql'), 'w') as file:
+            file.write('CREATE INDEX students_first_name_idx ON students (first_name);\nSELECT * FROM wrong_table;')
+
+        with self.assertRaises(Exception):
+            apply_migrations(db.engine, migrations_path)
+
+        self.assertNotIn('students_first_name_idx', get_indexes_names('students'))
+        self.assertEqual(db.session.execute(select(schema_migrations)).all(), [])
+
+    def test_get_statements(self):
+        sql = '-- migrate: no-transaction\n-- comment\nSELECT 1;\n\nSELECT 2;\n'
+
+        self.assertEqual(get_statements(sql), ['-- migrate: no-transaction\n-- comment\nSELECT 1', 'SELECT 2'])
+
+    def test_init_db_command(self):
+        db.drop_all()
+
+        result = app.test_cli_runner().invoke(args=['init-db'])
+
+        self.assertEqual(result.exit_code, 0, result.output)
+        self.assertEqual(len(db.session.execute(select(schema_migrations)).all()), len(get_migrations()))
+
+    def test_migrate_command(self):
+        result = app.test_cli_runner().invoke(args=['migrate'])
+
+        self.assertEqual(result.exit_code, 0, result.output)
+        self.assertIn('applied 0001_add_lookup_indexes', result.output)
+
+
+class TestIndexesCase(unittest.TestCase):
+
+    def setUp(self):
+        self.app_context = app.app_context()
+        self.app_context.push()
+        db.session.commit()
+        db.drop_all()
+        db.create_all()
+        db.session.commit()
+        db.session.remove()
+
+    def tearDown(self):
+        db.session.remove()
+        self.app_context.pop()
+
+    def test_indexes_in_sql_files(self):
+        """indexes of the models are created by `create_tables.sql` and migrations."""
+        sql_path = os.path.dirname(MIGRATIONS_PATH)
+        with open(os.path.join(sql_path, 'create_tables.sql')) as file:
+            create_tables_sql = file.read()
+        migrations_sql = ''
+        for _, _, path in get_migrations():
+            with open(path) as file:
+                migrations_sql += file.read()
+
+        for table in db.metadata.sorted_tables:
+            for index in table.indexes:
+                self.assertIn(index.name, create_tables_sql)
+                self.assertRegex(migrations_sql, r'INDEX .*\b{}\b'.format(re.escape(index.name)))
+
+    def test_unindexed_filter_columns(self):
+        connection = db.session.connection()
+        self.assertEqual(get_unindexed_filter_columns(select(CourseModel).where(CourseModel.description == 'a'),
+                                                      connection), ['courses.description'])
+        self.assertEqual(get_unindexed_filter_columns(select(StudentModel).where(StudentModel.group_id == 1),
+                                                      connection), [])
+        self.assertEqual(get_unindexed_filter_columns(
+            select(students_courses_relation).where(students_courses_relation.c.course_id == 1), connection), [])
+        self.assertEqual(get_unindexed_filter_columns(
+            select(StudentModel).join(GroupModel).where(GroupModel.id == StudentModel.group_id), connection), [])
+        self.assertEqual(get_unindexed_filter_columns(
+            select(CourseModel).where(CourseModel.id == 1, CourseModel.description == 'a'), connection), [])
+
+    def test_unindexed_filter_columns_of_cte_and_subquery(self):
+        connection = db.session.connection()
+        courses = select(CourseModel.id).where(CourseModel.description == 'a')
+
+        self.assertEqual(get_unindexed_filter_columns(select(courses.cte('courses_cte')), connection),
+                         ['courses.description'])
+        self.assertEqual(get_unindexed_filter_columns(select(courses.subquery()), connection),
+                         ['courses.description'])
+        updated = update(CourseModel.__table__).where(CourseModel.__table__.c.description == 'a') \
+            .values(name='b').returning(CourseModel.__table__.c.id).cte('updated')
+        self.assertEqual(get_unindexed_filter_columns(select(updated), connection), ['courses.description'])
+        self.assertEqual(get_unindexed_filter_columns(
+            select(StudentModel).where(StudentModel.id.in_(select(students_courses_relation.c.student_id)
+                                                           .where(students_courses_relation.c.course_id == 1))),
+            connection), [])
+
+    def test_trigram_indexed_filter_columns(self):
+        connection = db.session.connection()
+        column = StudentModel.__table__.c.first_name
+        has_index = db.session.execute(text(
+            "SELECT count(*) FROM pg_indexes WHERE indexname = 'students_first_name_trgm_idx'")).scalar() == 1
+
+        self.assertEqual(has_trigram_index(connection, column), has_index)
+        self.assertEqual(get_unindexed_filter_columns(select(StudentModel).where(column.ilike('a%')), connection),
+                         [] if has_index else ['students.first_name'])
+        db.session.execute(text('DROP INDEX IF EXISTS students_first_name_trgm_idx'))
+        self.assertEqual(get_unindexed_filter_columns(select(StudentModel).where(column.ilike('a%')), connection),
+                         ['students.first_name'])
+
+    def test_unindexed_filter_error(self):
+        with self.assertRaisesRegex(UnindexedFilterError, 'courses.description'):
+            db.session.query(CourseModel).filter_by(description='math').all()
+
+    def test_unindexed_filter_error_of_core_read(self):
+        with self.assertRaisesRegex(UnindexedFilterError, 'courses.description'):
+            CourseModel.get_all_items_params_dict(filters=[CourseModel.__table__.c.description == 'math'])
+
+    def test_indexed_filter(self):
+        self.assertEqual(db.session.query(StudentModel).filter_by(group_id=1).all(), [])
+
+    def test_check_is_configured(self):
+        app.config['CHECK_INDEXED_FILTERS'] = False
+        try:
+            self.assertEqual(db.session.query(CourseModel).filter_by(description='math').all(), [])
+        finally:
+            app.config['CHECK_INDEXED_FILTERS'] = True
+
+
+if __name__ == '__main__':
+    unittest.main()
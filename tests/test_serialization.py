@@ -0,0 +1,98 @@
+import unittest
+import json
+from datetime import datetime
+from unittest import mock
+import testing.postgresql
+from parameterized import parameterized
+from app.config import Configuration
+
+postgresql = testing.postgresql.Postgresql(port=7654)
+Configuration.SQLALCHEMY_DATABASE_URI = postgresql.url()
+
+from app import serialization
+from app.application import create_app, db
+from app.cache import item_cache
+from app.models import GroupModel, StudentModel
+from app.serialization import dumps
+
+app = create_app(Configuration)
+
+
+class TestDumpsCase(unittest.TestCase):
+
+    @parameterized.expand([
+        ({'id': 1, 'name': 'aa-01', 'students_ids': [1, 2]},),
+        ([{'first_name': 'Zoë', 'last_name': 'O"Brien\n'}, None, True, 1.5],),
+        ('error during operation: wrong group name format.',),
+    ])
+    def test_same_as_standard_encoder(self, data):
+        with mock.patch.object(serialization, 'orjson', None):
+            standard_json = dumps(data)
+
+        self.assertEqual(dumps(data), standard_json)
+        self.assertEqual(json.loads(dumps(data)), data)
+
+    def test_compact_utf8(self):
+        self.assertEqual(dumps({'id': 1, 'name': 'Zoë'}), '{"id":1,"name":"Zoë"}'.encode('utf-8'))
+
+    def test_not_string_keys(self):
+        self.assertEqual(dumps({1: 'a'}), b'{"1":"a"}')
+
+    def test_not_serializable(self):
+        with self.assertRaises(TypeError):
+            dumps({'updated_at': datetime(2020, 1, 1)})
+
+
+class TestOutputJsonCase(unittest.TestCase):
+
+    def setUp(self):
+        """clear all data from test database after previous test."""
+        self.app_context = app.app_context()
+        self.app_context.push()
+        self.app = app.test_client()
+        db.session.commit()
+        db.drop_all()
+        db.create_all()
+        db.session.commit()
+        db.session.remove()
+        item_cache.clear()
+        GroupModel.post_item(name='aa-01')
+
+    def tearDown(self):
+        app.config.pop('RESTFUL_JSON', None)
+        self.app_context.pop()
+
+    def test_response(self):
+        answer = self.app.get('/groups/1/')
+
+        self.assertEqual(answer.data, b'{"id":1,"name":"aa-01","version":1,"students_ids":[]}\n')
+        self.assertEqual(answer.mimetype, 'application/json')
+
+    def test_without_orjson(self):
+        with mock.patch.object(serialization, 'orjson', None):
+            answer = self.app.get('/groups/')
+
+        self.assertEqual(answer.data, b'[{"id":1,"name":"aa-01","version":1,"students_ids":[]}]\n')
+
+    @parameterized.expand([('/groups/',), ('/groups/1/',), ('/students/',), ('/students/1/?fields=first_name',)])
+    def test_same_data_as_restful_output(self, url):
+        StudentModel.post_item(first_name='Zoë', last_name='O"Brien', group_id=1)
+        answer = self.app.get(url)
+        app.config['RESTFUL_JSON'] = {'separators': (', ', ': ')}
+
+        restful_answer = self.app.get(url)
+
+        self.assertIn(b', "', restful_answer.data)
+        self.assertEqual(json.loads(answer.data), json.loads(restful_answer.data))
+
+    def test_restful_json_settings(self):
+        app.config['RESTFUL_JSON'] = {'indent': 2}
+
+        answer = self.app.get('/groups/1/')
+
+        self.assertEqual(answer.data.decode("utf-8"),
+                         json.dumps({'id': 1, 'name': 'aa-01', 'version': 1, 'students_ids': []}, indent=2) + '\n')
+
+
+if __name__ == '__main__':
+    unittest.main()
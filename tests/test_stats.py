@@ -0,0 +1,168 @@
+import unittest
+import json
+import testing.postgresql
+from sqlalchemy import select
+from app.config import Configuration
+
+postgresql = testing.postgresql.Postgresql(port=7654)
+Configuration.SQLALCHEMY_DATABASE_URI = postgresql.url()
+
+from app.application import create_app, db
+from app.cache import item_cache
+from app.models import StudentModel, GroupModel, CourseModel, enroll_students, unenroll_students, refresh_stats, \
+    group_stats, course_stats, course_pair_stats
+from app.create_test_data import create_test_data
+
+app = create_app(Configuration)
+
+
+def create_test_groups(count=1):
+    for num in range(1, count + 1):
+        group = GroupModel(f'aa-{str(num).zfill(2)}')
+        db.session.add(group)
+    db.session.commit()
+
+
+def create_test_courses(count=1):
+    for num in range(1, count + 1):
+        course = CourseModel(f'test_name_{num}', f'test_description_{num}')
+        db.session.add(course)
+    db.session.commit()
+
+
+def get_stats_rows():
+    return {table.name: db.session.execute(select(table).order_by(*table.primary_key.columns)).all()
+            for table in (group_stats, course_stats, course_pair_stats)}
+
+
+def get_recounted_stats_rows():
+    """return rows of the summary tables, recounted from the data."""
+    refresh_stats()
+    rows = get_stats_rows()
+    db.session.rollback()
+    return rows
+
+
+class TestStatsCase(unittest.TestCase):
+
+    def setUp(self):
+        """clear all data from test database after previous test."""
+        self.app_context = app.app_context()
+        self.app_context.push()
+        self.app = app.test_client()
+        db.session.commit()
+        db.drop_all()
+        db.create_all()
+        db.session.commit()
+        db.session.remove()
+        item_cache.clear()
+
+    def tearDown(self):
+        db.session.remove()
+        self.app_context.pop()
+
+    def assertStatsConsistent(self):
+        rows = get_stats_rows()
+        db.session.commit()
+        self.assertEqual(rows, get_recounted_stats_rows())
+
+    def test_group_stats(self):
+        create_test_groups(2)
+        StudentModel.post_item(group_id=1, first_name='Liam', last_name='Smith')
+        StudentModel.post_items([{'group_id': 1, 'first_name': 'Noah', 'last_name': 'Brown'},
+                                 {'group_id': 2, 'first_name': 'Emma', 'last_name': 'Jones'},
+                                 {'group_id': None, 'first_name': 'Mia', 'last_name': 'Davis'}])
+
+        self.assertEqual(get_stats_rows()['group_stats'], [(1, 2), (2, 1)])
+        self.assertStatsConsistent()
+
+        StudentModel.get_item(1).put_params(group_id=2)
+        StudentModel.get_item(2).put_params(first_name='Oliver')
+
+        self.assertEqual(get_stats_rows()['group_stats'], [(1, 1), (2, 2)])
+
+        StudentModel.delete_item(2)
+
+        self.assertEqual(get_stats_rows()['group_stats'], [(2, 2)])
+        self.assertStatsConsistent()
+
+    def test_course_stats(self):
+        create_test_groups(1)
+        create_test_courses(3)
+        StudentModel.post_items([{'group_id': 1, 'first_name': f'first_name_{num}', 'last_name': 'Smith'}
+                                 for num in range(3)])
+
+        enroll_students([{'student_id': 1, 'course_id': 1}, {'student_id': 1, 'course_id': 2},
+                         {'student_id': 1, 'course_id': 3}, {'student_id': 2, 'course_id': 1}])
+        enroll_students([{'student_id': 2, 'course_id': 2}, {'student_id': 2, 'course_id': 1},
+                         {'student_id': 3, 'course_id': 3}])
+
+        rows = get_stats_rows()
+        self.assertEqual(rows['course_stats'], [(1, 2), (2, 2), (3, 2)])
+        self.assertEqual(rows['course_pair_stats'], [(1, 2, 2), (1, 3, 1), (2, 3, 1)])
+        self.assertStatsConsistent()
+
+        unenroll_students([{'student_id': 1, 'course_id': 1}, {'student_id': 1, 'course_id': 2}])
+
+        rows = get_stats_rows()
+        self.assertEqual(rows['course_stats'], [(1, 1), (2, 1), (3, 2)])
+        self.assertEqual(rows['course_pair_stats'], [(1, 2, 1)])
+        self.assertStatsConsistent()
+
+        StudentModel.delete_item(2)
+        CourseModel.delete_item(3)
+
+        self.assertEqual(get_stats_rows(), {'group_stats': [(1, 2)], 'course_stats': [], 'course_pair_stats': []})
+        self.assertStatsConsistent()
+
+    def test_create_test_data(self):
+        create_test_data(groups=5, students=300, courses=8, min_enrollments=1, max_enrollments=4, seed=1)
+
+        rows = get_stats_rows()
+        self.assertEqual(sum(count for _, count in rows['group_stats']), 300)
+        self.assertTrue(rows['course_pair_stats'])
+        self.assertStatsConsistent()
+
+        create_test_data(groups=2, students=10, courses=3, seed=2)
+
+        self.assertEqual(sum(count for _, count in get_stats_rows()['group_stats']), 10)
+        self.assertStatsConsistent()
+
+    def test_stats_resources(self):
+        create_test_groups(1)
+        create_test_courses(2)
+        self.app.post('/students/', data={'group_id': 1, 'first_name': 'Liam', 'last_name': 'Smith'})
+        self.app.post('/enrollments/', json=[{'student_id': 1, 'course_id': 1}, {'student_id': 1, 'course_id': 2}])
+
+        groups_answer = self.app.get('/stats/groups/')
+        courses_answer = self.app.get('/stats/courses/')
+        pairs_answer = self.app.get('/stats/co-enrollments/')
+
+        groups_data = json.loads(groups_answer.data.decode("utf-8"))
+        self.assertEqual(groups_data['items'], [{'group_id': 1, 'students_count': 1}])
+        self.assertIsNotNone(groups_data['updated_at'])
+        self.assertEqual(json.loads(courses_answer.data.decode("utf-8"))['items'],
+                         [{'course_id': 1, 'students_count': 1}, {'course_id': 2, 'students_count': 1}])
+        self.assertEqual(json.loads(pairs_answer.data.decode("utf-8"))['items'],
+                         [{'course_id': 1, 'other_course_id': 2, 'students_count': 1}])
+
+    def test_stats_resource_not_modified(self):
+        answer = self.app.get('/stats/courses/')
+
+        self.assertEqual(json.loads(answer.data.decode("utf-8")), {'updated_at': None, 'items': []})
+        not_modified_answer = self.app.get('/stats/courses/', headers={'If-None-Match': answer.headers['ETag']})
+        self.assertEqual(not_modified_answer.status_code, 304)
+
+        create_test_groups(1)
+        create_test_courses(1)
+        StudentModel.post_item(group_id=1, first_name='Liam', last_name='Smith')
+        enroll_students([{'student_id': 1, 'course_id': 1}])
+
+        modified_answer = self.app.get('/stats/courses/', headers={'If-None-Match': answer.headers['ETag']})
+        self.assertEqual(modified_answer.status_code, 200)
+        self.assertEqual(json.loads(modified_answer.data.decode("utf-8"))['items'],
+                         [{'course_id': 1, 'students_count': 1}])
+
+
+if __name__ == '__main__':
+    unittest.main()